@@ -0,0 +1,256 @@
+"""
+Tiered cache for Terms & Conditions analysis results
+Hot results live in an in-process LRU, and every result is also written to
+disk so that repeat analyses survive a server restart
+"""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_terms(terms_data: str) -> str:
+    """
+    Normalize a document so that cosmetic differences do not change its key
+
+    Args:
+        terms_data: Raw terms and conditions text
+
+    Returns:
+        Text with whitespace collapsed and outer whitespace removed
+    """
+    return _WHITESPACE_RE.sub(" ", terms_data).strip()
+
+
+def make_cache_key(terms_data: str, *parts: str) -> str:
+    """
+    Build a content-addressed cache key
+
+    Args:
+        terms_data: The terms and conditions text
+        *parts: Extra key components (model name, prompt version, ...)
+
+    Returns:
+        Hex SHA-256 digest of the parts and the normalized text
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\x00")
+    digest.update(normalize_terms(terms_data).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class MemoryTier:
+    """
+    In-process LRU with a TTL, an entry limit and a byte limit
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.bytes_used = 0
+        self.evictions = 0
+        # key -> (expires_at, size_in_bytes, value)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, _, value = entry
+        if expires_at < time.time():
+            self._remove(key)
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, size: int, expires_at: Optional[float] = None) -> None:
+        """Store a value until expires_at (default: ttl_seconds from now)"""
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+
+        if expires_at is None:
+            expires_at = time.time() + self.ttl_seconds
+        self._entries[key] = (expires_at, size, value)
+        self.bytes_used += size
+
+        while len(self._entries) > self.max_entries or self.bytes_used > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self.bytes_used -= size
+
+
+class DiskTier:
+    """
+    One JSON file per key, sharded by the first two hex characters
+    """
+
+    def __init__(self, directory: str, ttl_seconds: float):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self.get_entry(key)
+        return entry[0] if entry else None
+
+    def get_entry(self, key: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """The stored result and the time it expires at, or None"""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        expires_at = record.get("created_at", 0) + self.ttl_seconds
+        if expires_at < time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+        return record.get("result"), expires_at
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temp file and rename so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"created_at": time.time(), "result": value}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Analysis cache write error: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+class AnalysisCache:
+    """
+    Two-tier result cache: memory first, then disk
+
+    The memory tier holds results serialized, so every get() returns a new
+    copy that the caller may change without changing the cache. A disk hit
+    is promoted into memory only for the rest of its disk TTL.
+
+    Args:
+        max_entries: Maximum number of results kept in memory
+        max_bytes: Maximum serialized size of the results kept in memory
+        ttl_seconds: How long a result stays valid in either tier
+        disk_dir: Directory for the persistent tier, or None to disable it
+        persistent_tier: Object with get(key)/set(key, value) to use as the
+            persistent tier instead of JSON files (e.g. SQLiteAnalysisTier)
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        max_bytes: int = 32 * 1024 * 1024,
+        ttl_seconds: float = 24 * 60 * 60,
+        disk_dir: Optional[str] = None,
+        persistent_tier: Optional[Any] = None,
+    ):
+        self.memory = MemoryTier(max_entries, max_bytes, ttl_seconds)
+        if persistent_tier is not None:
+            self.disk = persistent_tier
+        else:
+            self.disk = DiskTier(disk_dir, ttl_seconds) if disk_dir else None
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a result, promoting disk hits into memory
+
+        Returns:
+            The cached result, or None on a miss
+        """
+        with self._lock:
+            serialized = self.memory.get(key)
+            if serialized is not None:
+                self.memory_hits += 1
+                return json.loads(serialized)
+
+        entry = self._disk_entry(key)
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at = entry
+            self.disk_hits += 1
+            serialized = json.dumps(value)
+            self.memory.set(key, serialized, len(serialized), expires_at)
+            return value
+
+    def _disk_entry(self, key: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """(result, expires_at) from the persistent tier"""
+        if not self.disk:
+            return None
+        if hasattr(self.disk, "get_entry"):
+            return self.disk.get_entry(key)
+        # A tier without expiry times: keep the promoted copy for a memory TTL
+        value = self.disk.get(key)
+        return (value, time.time() + self.memory.ttl_seconds) if value is not None else None
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        """Store a result in both tiers"""
+        serialized = json.dumps(value)
+        with self._lock:
+            self.memory.set(key, serialized, len(serialized))
+            self.stores += 1
+
+        if self.disk:
+            self.disk.set(key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and memory usage"""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "stores": self.stores,
+                "memory_entries": len(self.memory),
+                "memory_bytes": self.memory.bytes_used,
+                "evictions": self.memory.evictions,
+                "disk_enabled": self.disk is not None,
+                "disk_tier": type(self.disk).__name__ if self.disk else None,
+            }
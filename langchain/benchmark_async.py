@@ -0,0 +1,129 @@
+"""
+Compare the Flask server and the async (ASGI) server under concurrent load
+
+Start both servers first:
+    python langchain_server.py                                  (port 5000)
+    uvicorn langchain_server_async:app --port 8000              (port 8000)
+
+Then run:
+    python benchmark_async.py --requests 200 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from typing import Any, Dict, List
+
+import httpx
+
+SAMPLE_TERMS = """
+By using our service, you agree to mandatory arbitration for all disputes.
+We collect your personal information including name, email, and browsing history.
+This data may be shared with third-party advertisers.
+We reserve the right to modify these terms at any time without notice.
+Refunds are not available once a subscription period has started.
+"""
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def build_request(endpoint: str) -> Dict[str, Any]:
+    """
+    Build a request body for the given endpoint
+
+    A nonce is appended to the terms so analysis requests miss the cache and
+    actually exercise the upstream model call.
+    """
+    terms = f"{SAMPLE_TERMS}\nReference: {uuid.uuid4()}"
+    if endpoint == "/api/analyze":
+        return {"terms_data": terms}
+    if endpoint == "/api/chatbot":
+        return {"terms_data": terms, "message": "What data does this service collect?"}
+    return {"terms_data": terms, "question": "What data does this service collect?"}
+
+async def run_load(base_url: str, endpoint: str, total: int, concurrency: int, timeout: float) -> Dict[str, Any]:
+    """
+    Send `total` requests to one server with at most `concurrency` in flight
+
+    Returns:
+        Dictionary with throughput, latency percentiles and error count
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+
+        async def one_request() -> None:
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.post(endpoint, json=build_request(endpoint))
+                    if response.status_code != 200:
+                        errors += 1
+                        return
+                except httpx.HTTPError:
+                    errors += 1
+                    return
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one_request() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "url": base_url,
+        "requests": total,
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000 if latencies else 0.0,
+    }
+
+def print_result(name: str, result: Dict[str, Any]) -> None:
+    print(f"\n{name} ({result['url']})")
+    print(f"  Requests:   {result['requests']} ({result['errors']} errors)")
+    print(f"  Elapsed:    {result['elapsed_s']:.2f}s")
+    print(f"  Throughput: {result['throughput_rps']:.1f} req/s")
+    print(f"  Latency:    p50 {result['p50_ms']:.0f}ms | p95 {result['p95_ms']:.0f}ms | "
+          f"p99 {result['p99_ms']:.0f}ms | mean {result['mean_ms']:.0f}ms")
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Flask vs ASGI concurrency benchmark")
+    parser.add_argument("--flask-url", default="http://localhost:5000")
+    parser.add_argument("--asgi-url", default="http://localhost:8000")
+    parser.add_argument("--endpoint", default="/api/analyze",
+                        choices=["/api/analyze", "/api/chatbot", "/chat"])
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=25)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("⏱️  Flask vs ASGI benchmark")
+    print("=" * 60)
+    print(f"Endpoint: {args.endpoint} | Requests: {args.requests} | Concurrency: {args.concurrency}")
+
+    results = {}
+    for name, url in (("Flask", args.flask_url), ("ASGI", args.asgi_url)):
+        results[name] = await run_load(url, args.endpoint, args.requests, args.concurrency, args.timeout)
+        print_result(name, results[name])
+
+    flask_rps = results["Flask"]["throughput_rps"]
+    if flask_rps:
+        print(f"\nASGI/Flask throughput ratio: {results['ASGI']['throughput_rps'] / flask_rps:.2f}x")
+
+if __name__ == "__main__":
+    asyncio.run(main())
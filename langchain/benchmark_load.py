@@ -0,0 +1,567 @@
+"""
+Load-generation benchmark for the server endpoints
+
+Drives /api/analyze, /api/chatbot and /chat with a weighted endpoint mix,
+either closed-loop (--concurrency workers back to back) or open-loop
+(--rate arrivals per second, Poisson), with a mix of document sizes and
+multi-turn chatbot conversations. Reports throughput, error rate,
+p50/p95/p99 latency per endpoint, the server's memory growth and, from its
+/metrics, how analysis output was parsed (fallback rate), the model calls
+made and the tokens they generated, upstream retries and hedges, and saves
+a JSON report that later runs can be compared against.
+
+    python benchmark_load.py --duration 60 --concurrency 20
+    python benchmark_load.py --rate 5 --duration 120 --pid $(pgrep -f langchain_server.py)
+    python benchmark_load.py --mix analyze=1 --doc-mix large=1 --compare .benchmarks/baseline.json
+
+Run the server with LLM_BACKEND=fake (or replay) for reproducible numbers
+that measure the server rather than the upstream model.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+ENDPOINTS = {
+    "analyze": "/api/analyze",
+    "chatbot": "/api/chatbot",
+    "chat": "/chat",
+}
+
+# Target characters per document size class
+DOC_SIZES = {"small": 2000, "medium": 10000, "large": 40000}
+
+CLAUSES = [
+    "By using our service, you agree to mandatory arbitration for all disputes.",
+    "We collect your personal information including name, email, and browsing history.",
+    "This data may be shared with third-party advertisers and our partners.",
+    "We reserve the right to modify these terms at any time without notice.",
+    "Refunds are not available once a subscription period has started.",
+    "Subscriptions renew automatically unless cancelled before the renewal date.",
+    "You may cancel your subscription at any time from your account settings.",
+    "We use industry-standard encryption to protect your data in transit and at rest.",
+    "In no event shall the company be liable for any indirect or consequential damages.",
+    "You agree to indemnify and hold harmless the company from any claims arising from your use.",
+    "These terms are governed by the laws of the State of Delaware.",
+    "We may suspend or terminate your account for any reason or no reason.",
+    "You grant us a worldwide, royalty-free license to use content you upload.",
+    "You have the right to access, correct or delete the personal data we hold about you.",
+    "The service is provided as is and as available, without warranties of any kind.",
+]
+
+QUESTIONS = [
+    "Can I get a refund?",
+    "Do they sell my personal data?",
+    "Can they terminate my account without notice?",
+    "What happens if I have a dispute with the company?",
+    "How do I cancel my subscription?",
+    "Who is my data shared with?",
+    "Can they change these terms later?",
+]
+
+# Parse strategies (metrics.PARSE_STRATEGIES) that cost a second model call,
+# and those that recovered the output locally
+FALLBACK_STRATEGIES = ("fallback_regex", "line_parser", "placeholder")
+LOCAL_RECOVERY_STRATEGIES = ("repaired", "rules")
+
+_SAMPLE_RE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{[^}]*\})? (\S+)$')
+
+DEFAULT_REPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".benchmarks")
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def parse_mix(text: str, allowed: Dict[str, Any]) -> Dict[str, float]:
+    """Parse "a=0.5,b=0.5" into normalized weights"""
+    weights = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in allowed:
+            raise argparse.ArgumentTypeError(f"unknown name '{name}' (expected one of: {', '.join(allowed)})")
+        weights[name] = float(weight or 1)
+    total = sum(weights.values())
+    if total <= 0:
+        raise argparse.ArgumentTypeError("weights must add up to more than 0")
+    return {name: weight / total for name, weight in weights.items()}
+
+
+def parse_range(text: str) -> Tuple[int, int]:
+    """Parse "3" or "1-5" into an inclusive (low, high) range"""
+    low, _, high = text.partition("-")
+    return int(low), int(high or low)
+
+
+def choose(rng: random.Random, weights: Dict[str, float]) -> str:
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+class DocumentFactory:
+    """
+    Builds synthetic documents of a given size class
+
+    A fraction of documents (repeat_ratio) are reused from earlier requests so
+    the analysis cache sees a realistic share of hits; the rest carry a nonce
+    so they miss the cache and exercise the model call.
+    """
+
+    def __init__(self, rng: random.Random, size_mix: Dict[str, float], repeat_ratio: float):
+        self.rng = rng
+        self.size_mix = size_mix
+        self.repeat_ratio = repeat_ratio
+        self.sent: List[Tuple[str, str]] = []
+
+    def next(self) -> Tuple[str, str]:
+        """Returns (size class, document text)"""
+        if self.sent and self.rng.random() < self.repeat_ratio:
+            return self.rng.choice(self.sent)
+
+        size = choose(self.rng, self.size_mix)
+        sections = []
+        used = 0
+        number = 1
+        while used < DOC_SIZES[size]:
+            clause = self.rng.choice(CLAUSES)
+            section = f"{number}. {clause} This applies to all users of the service."
+            sections.append(section)
+            used += len(section) + 1
+            number += 1
+        sections.append(f"Reference: {uuid.uuid4()}")
+
+        document = (size, "\n".join(sections))
+        self.sent.append(document)
+        return document
+
+
+class MemorySampler:
+    """Samples the server process's resident memory from /proc while the run lasts"""
+
+    def __init__(self, pid: Optional[int], interval: float = 0.5):
+        self.pid = pid
+        self.interval = interval
+        self.samples: List[Tuple[float, int]] = []
+
+    def rss_bytes(self) -> Optional[int]:
+        if self.pid is None:
+            return None
+        try:
+            with open(f"/proc/{self.pid}/status", "r") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            return None
+        return None
+
+    async def run(self, stop: asyncio.Event) -> None:
+        started = time.perf_counter()
+        while not stop.is_set():
+            rss = self.rss_bytes()
+            if rss is not None:
+                self.samples.append((time.perf_counter() - started, rss))
+            try:
+                await asyncio.wait_for(stop.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+        rss = self.rss_bytes()
+        if rss is not None:
+            self.samples.append((time.perf_counter() - started, rss))
+
+    def summary(self) -> Optional[Dict[str, float]]:
+        if not self.samples:
+            return None
+        values = [rss for _, rss in self.samples]
+        return {
+            "pid": self.pid,
+            "start_mb": values[0] / 1024 / 1024,
+            "end_mb": values[-1] / 1024 / 1024,
+            "peak_mb": max(values) / 1024 / 1024,
+            "growth_mb": (values[-1] - values[0]) / 1024 / 1024,
+            "samples": len(values),
+        }
+
+
+class LoadRun:
+    """
+    One benchmark run against a server
+
+    Args:
+        args: Parsed command-line arguments
+    """
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.documents = DocumentFactory(self.rng, args.doc_mix, args.repeat_ratio)
+        self.records: List[Dict[str, Any]] = []
+        self.sessions = 0
+
+    async def request(self, client: httpx.AsyncClient, name: str, body: Dict[str, Any],
+                      size: str) -> Optional[Dict[str, Any]]:
+        start = time.perf_counter()
+        record = {"endpoint": name, "size": size, "ok": False, "status": None}
+        data = None
+        try:
+            response = await client.post(ENDPOINTS[name], json=body)
+            record["status"] = response.status_code
+            record["ok"] = response.status_code == 200
+            if record["ok"]:
+                data = response.json()
+        except httpx.HTTPError as e:
+            record["status"] = type(e).__name__
+        record["latency_s"] = time.perf_counter() - start
+        self.records.append(record)
+        return data
+
+    async def session(self, client: httpx.AsyncClient) -> None:
+        """One arrival: an analysis, a one-shot /chat question or a chatbot conversation"""
+        self.sessions += 1
+        name = choose(self.rng, self.args.mix)
+        size, terms = self.documents.next()
+
+        if name == "analyze":
+            await self.request(client, name, {"terms_data": terms}, size)
+        elif name == "chat":
+            await self.request(client, name, {"terms_data": terms, "question": self.rng.choice(QUESTIONS)}, size)
+        else:
+            conversation_id = str(uuid.uuid4())
+            for _ in range(self.rng.randint(*self.args.turns)):
+                data = await self.request(client, name, {
+                    "terms_data": terms,
+                    "message": self.rng.choice(QUESTIONS),
+                    "conversation_id": conversation_id,
+                }, size)
+                if data is None:
+                    break
+
+    async def closed_loop(self, client: httpx.AsyncClient, deadline: float) -> None:
+        budget = [self.args.sessions]
+
+        async def worker() -> None:
+            while time.perf_counter() < deadline and budget[0] != 0:
+                budget[0] -= 1
+                await self.session(client)
+
+        await asyncio.gather(*(worker() for _ in range(self.args.concurrency)))
+
+    async def open_loop(self, client: httpx.AsyncClient, deadline: float) -> None:
+        # Poisson arrivals; at most --concurrency sessions in flight, later arrivals queue
+        semaphore = asyncio.Semaphore(self.args.concurrency)
+        tasks = []
+        launched = 0
+
+        async def bounded() -> None:
+            async with semaphore:
+                await self.session(client)
+
+        while time.perf_counter() < deadline and launched != self.args.sessions:
+            tasks.append(asyncio.ensure_future(bounded()))
+            launched += 1
+            await asyncio.sleep(self.rng.expovariate(self.args.rate))
+        await asyncio.gather(*tasks)
+
+    async def run(self) -> Dict[str, Any]:
+        args = self.args
+        sampler = MemorySampler(args.pid)
+        stop = asyncio.Event()
+        sampler_task = asyncio.ensure_future(sampler.run(stop))
+
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+            metrics_before = await scrape_metrics(client)
+            started = time.perf_counter()
+            deadline = started + args.duration if args.duration else float("inf")
+            if args.rate:
+                await self.open_loop(client, deadline)
+            else:
+                await self.closed_loop(client, deadline)
+            elapsed = time.perf_counter() - started
+            metrics_after = await scrape_metrics(client)
+
+        stop.set()
+        await sampler_task
+        return self.report(elapsed, sampler.summary(), analysis_stats(metrics_before, metrics_after))
+
+    def report(self, elapsed: float, memory: Optional[Dict[str, float]],
+               analysis: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        by_endpoint = {
+            name: latency_stats([r for r in self.records if r["endpoint"] == name], elapsed)
+            for name in ENDPOINTS
+            if any(r["endpoint"] == name for r in self.records)
+        }
+        by_size = {
+            size: latency_stats([r for r in self.records if r["size"] == size], elapsed)
+            for size in DOC_SIZES
+            if any(r["size"] == size for r in self.records)
+        }
+        config = dict(vars(self.args))
+        config.pop("compare", None)
+        return {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_commit": git_commit(),
+            "config": config,
+            "elapsed_s": elapsed,
+            "sessions": self.sessions,
+            "overall": latency_stats(self.records, elapsed),
+            "endpoints": by_endpoint,
+            "doc_sizes": by_size,
+            "memory": memory,
+            "analysis": analysis,
+        }
+
+
+async def scrape_metrics(client: httpx.AsyncClient) -> Optional[Dict[str, float]]:
+    """
+    Samples from the server's /metrics
+
+    Returns:
+        Series ('name{labels}') -> value, or None if the server has no /metrics
+    """
+    try:
+        response = await client.get("/metrics")
+    except httpx.HTTPError:
+        return None
+    if response.status_code != 200:
+        return None
+
+    samples = {}
+    for line in response.text.splitlines():
+        match = _SAMPLE_RE.match(line)
+        if match:
+            try:
+                samples[match.group(1) + (match.group(2) or "")] = float(match.group(3))
+            except ValueError:
+                continue
+    return samples
+
+
+def analysis_stats(before: Optional[Dict[str, float]], after: Optional[Dict[str, float]]) -> Optional[Dict[str, Any]]:
+    """Parse strategies and model calls during the run, from two /metrics scrapes"""
+    if before is None or after is None:
+        return None
+
+    def delta(series: str) -> float:
+        return after.get(series, 0.0) - before.get(series, 0.0)
+
+    def total(name: str) -> float:
+        return sum(delta(series) for series in after if series.split("{")[0] == name)
+
+    prefix = 'analysis_parse_results_total{strategy="'
+    results = {
+        series[len(prefix):-2]: int(delta(series))
+        for series in after if series.startswith(prefix)
+    }
+    parsed = sum(results.values())
+    llm_calls = total("llm_request_duration_seconds_count")
+    output_tokens = sum(delta(series) for series in after
+                        if series.startswith("llm_tokens_total{") and 'direction="output"' in series)
+    routed = total("model_routing_decisions_total")
+    escalated = sum(delta(series) for series in after
+                    if series.startswith("model_routing_decisions_total{") and 'tier="large"' in series)
+
+    def upstream(event: str) -> int:
+        return int(sum(delta(series) for series in after
+                       if series.startswith("llm_upstream_events_total{") and f'event="{event}"' in series))
+
+    return {
+        "parse_results": results,
+        "fallback_rate": sum(results.get(s, 0) for s in FALLBACK_STRATEGIES) / parsed if parsed else 0.0,
+        "local_recovery_rate": sum(results.get(s, 0) for s in LOCAL_RECOVERY_STRATEGIES) / parsed if parsed else 0.0,
+        "llm_calls": int(llm_calls),
+        "llm_mean_ms": total("llm_request_duration_seconds_sum") / llm_calls * 1000 if llm_calls else 0.0,
+        "llm_output_tokens": int(output_tokens),
+        "output_tokens_per_analysis": output_tokens / parsed if parsed else 0.0,
+        "routed_calls": int(routed),
+        "escalation_rate": escalated / routed if routed else 0.0,
+        "upstream_retries": upstream("retry"),
+        "upstream_hedges": upstream("hedge"),
+        "upstream_hedge_wins": upstream("hedge_won"),
+        "upstream_deadline_exceeded": upstream("deadline_exceeded"),
+        "upstream_circuit_rejected": upstream("circuit_rejected"),
+    }
+
+
+def latency_stats(records: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+    """Throughput, error rate and latency percentiles of a set of request records"""
+    latencies = [r["latency_s"] for r in records if r["ok"]]
+    errors = [r for r in records if not r["ok"]]
+    statuses: Dict[str, int] = {}
+    for r in errors:
+        statuses[str(r["status"])] = statuses.get(str(r["status"]), 0) + 1
+    return {
+        "requests": len(records),
+        "errors": len(errors),
+        "error_rate": len(errors) / len(records) if records else 0.0,
+        "error_statuses": statuses,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000 if latencies else 0.0,
+        "max_ms": max(latencies) * 1000 if latencies else 0.0,
+    }
+
+
+def git_commit() -> Optional[str]:
+    """Commit the benchmark ran against, when run from a git checkout"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, timeout=5, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def print_stats(name: str, stats: Dict[str, Any]) -> None:
+    print(f"  {name:<9} {stats['requests']:>6} req | {stats['throughput_rps']:7.1f} req/s | "
+          f"err {stats['error_rate'] * 100:5.1f}% | p50 {stats['p50_ms']:7.0f}ms | "
+          f"p95 {stats['p95_ms']:7.0f}ms | p99 {stats['p99_ms']:7.0f}ms")
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"\nElapsed: {report['elapsed_s']:.1f}s | Sessions: {report['sessions']}")
+    print("\nBy endpoint")
+    print_stats("overall", report["overall"])
+    for name, stats in report["endpoints"].items():
+        print_stats(name, stats)
+    print("\nBy document size")
+    for name, stats in report["doc_sizes"].items():
+        print_stats(name, stats)
+
+    memory = report["memory"]
+    if memory:
+        print(f"\nServer memory (pid {memory['pid']}): {memory['start_mb']:.1f} MB -> "
+              f"{memory['end_mb']:.1f} MB (peak {memory['peak_mb']:.1f} MB, "
+              f"growth {memory['growth_mb']:+.1f} MB)")
+    else:
+        print("\nServer memory: not sampled (pass --pid of the server process)")
+
+    analysis = report.get("analysis")
+    if analysis:
+        results = ", ".join(f"{name} {count}" for name, count in analysis["parse_results"].items() if count)
+        print(f"\nAnalysis output: {results or 'none'}")
+        print(f"  fallback calls {analysis['fallback_rate'] * 100:.1f}% | "
+              f"local recovery {analysis['local_recovery_rate'] * 100:.1f}% | "
+              f"model calls {analysis['llm_calls']} (mean {analysis['llm_mean_ms']:.0f}ms) | "
+              f"output tokens/analysis {analysis.get('output_tokens_per_analysis', 0):.0f}")
+        if analysis.get("routed_calls"):
+            print(f"  routed calls {analysis['routed_calls']} | "
+                  f"escalated to the large model {analysis['escalation_rate'] * 100:.1f}%")
+        if analysis.get("upstream_retries") or analysis.get("upstream_hedges"):
+            print(f"  upstream retries {analysis['upstream_retries']} | hedges {analysis['upstream_hedges']} "
+                  f"(won {analysis['upstream_hedge_wins']}) | deadline misses "
+                  f"{analysis['upstream_deadline_exceeded']} | rejected by open circuit "
+                  f"{analysis['upstream_circuit_rejected']}")
+
+
+def print_comparison(report: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """Print the change of the headline numbers against an earlier report"""
+    print(f"\nCompared with {baseline.get('timestamp')} (commit {baseline.get('git_commit')})")
+    for section in ["overall"] + [f"endpoints.{name}" for name in report["endpoints"]]:
+        current = lookup(report, section)
+        previous = lookup(baseline, section)
+        if not current or not previous:
+            continue
+        changes = []
+        for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "error_rate"):
+            before, after = previous[key], current[key]
+            delta = f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+            changes.append(f"{key} {before:.2f} -> {after:.2f} ({delta})")
+        print(f"  {section}: " + " | ".join(changes))
+
+    if report.get("analysis") and baseline.get("analysis"):
+        before, after = baseline["analysis"], report["analysis"]
+        print(f"  analysis: fallback_rate {before['fallback_rate']:.3f} -> {after['fallback_rate']:.3f} | "
+              f"llm_calls {before['llm_calls']} -> {after['llm_calls']} | "
+              f"llm_mean_ms {before['llm_mean_ms']:.0f} -> {after['llm_mean_ms']:.0f} | "
+              f"output_tokens_per_analysis {before.get('output_tokens_per_analysis', 0):.0f} -> "
+              f"{after.get('output_tokens_per_analysis', 0):.0f} | "
+              f"escalation_rate {before.get('escalation_rate', 0):.3f} -> {after.get('escalation_rate', 0):.3f}")
+
+    if report.get("memory") and baseline.get("memory"):
+        print(f"  memory growth: {baseline['memory']['growth_mb']:+.1f} MB -> "
+              f"{report['memory']['growth_mb']:+.1f} MB")
+
+
+def lookup(report: Dict[str, Any], path: str) -> Optional[Dict[str, Any]]:
+    value: Any = report
+    for key in path.split("."):
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+
+def save_report(report: Dict[str, Any], path: Optional[str]) -> str:
+    if not path:
+        os.makedirs(DEFAULT_REPORT_DIR, exist_ok=True)
+        path = os.path.join(DEFAULT_REPORT_DIR, f"load_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Server load-generation benchmark")
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--mix", type=lambda text: parse_mix(text, ENDPOINTS),
+                        default="analyze=0.5,chatbot=0.3,chat=0.2",
+                        help="Endpoint weights, e.g. analyze=0.5,chatbot=0.3,chat=0.2")
+    parser.add_argument("--doc-mix", type=lambda text: parse_mix(text, DOC_SIZES),
+                        default="small=0.6,medium=0.3,large=0.1",
+                        help="Document size weights (small ~2k, medium ~10k, large ~40k chars)")
+    parser.add_argument("--turns", type=parse_range, default="1-5",
+                        help="Messages per chatbot conversation, e.g. 3 or 1-5")
+    parser.add_argument("--repeat-ratio", type=float, default=0.2,
+                        help="Fraction of documents reused from earlier requests (cache hits)")
+    parser.add_argument("--concurrency", type=int, default=10, help="Maximum sessions in flight")
+    parser.add_argument("--rate", type=float, default=0.0,
+                        help="Open-loop arrivals per second (0 = closed loop at --concurrency)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run (0 = until --sessions)")
+    parser.add_argument("--sessions", type=int, default=-1, help="Stop after this many sessions (-1 = no limit)")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--pid", type=int, default=None, help="Server process ID for memory sampling")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Report path (default: .benchmarks/load_<time>.json)")
+    parser.add_argument("--compare", default=None, help="Earlier report to compare against")
+    args = parser.parse_args()
+
+    if not args.duration and args.sessions < 0:
+        parser.error("set --duration or --sessions")
+
+    print("=" * 60)
+    print("📈 Server load benchmark")
+    print("=" * 60)
+    print(f"URL: {args.url} | Concurrency: {args.concurrency} | "
+          f"{'Rate: %.1f/s' % args.rate if args.rate else 'Closed loop'} | "
+          f"Duration: {args.duration or '-'}s | Sessions: {args.sessions if args.sessions >= 0 else '-'}")
+
+    report = asyncio.run(LoadRun(args).run())
+    print_report(report)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            print_comparison(report, json.load(f))
+
+    print(f"\nReport saved to {save_report(report, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark server startup
+
+Starts fresh interpreters that import each module, and one that also warms
+up the model clients and serves a first analysis, then reports the median
+seconds of each phase over --runs runs. Runs on the fake backend (with no
+simulated latency) unless --backend is given.
+
+    python benchmark_startup.py --runs 5
+    python benchmark_startup.py --output .benchmarks/startup.json
+    python benchmark_startup.py --compare .benchmarks/startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, List
+
+MODULES = ["langchain_server", "langchain_server_async", "llm"]
+
+IMPORT_SCRIPT = """
+import time
+started = time.perf_counter()
+import {module}
+print(time.perf_counter() - started)
+"""
+
+# Import, warm-up and a first (uncached) analysis, as a booting server sees them
+BOOT_SCRIPT = """
+import json, time
+started = time.perf_counter()
+import langchain_server as server
+imported = time.perf_counter()
+server.warm_up_models()
+warmed = time.perf_counter()
+server.analyze_terms_and_conditions("You agree to binding arbitration. We may share your data with partners.")
+print(json.dumps({"import_s": imported - started, "warmup_s": warmed - imported,
+                  "first_analysis_s": time.perf_counter() - warmed}))
+"""
+
+
+def run_script(script: str, backend: str) -> str:
+    """Run a script in a new interpreter and return the last line it printed"""
+    env = dict(os.environ, LLM_BACKEND=backend, ANALYSIS_CACHE_DIR="", STORAGE_BACKEND="memory")
+    # The fake model answers at once, so the first analysis shows the server's own cold-path cost
+    env.setdefault("FAKE_LLM_LATENCY", "0")
+    env.setdefault("FAKE_LLM_TOKENS_PER_SECOND", "0")
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result.stdout.strip().splitlines()[-1]
+
+
+def measure(runs: int, backend: str) -> Dict[str, float]:
+    """
+    Median seconds of each startup phase
+
+    Returns:
+        Dictionary of "<module>_import_s" per module, and the import, warm-up
+        and first-analysis seconds of a booting Flask server
+    """
+    samples: Dict[str, List[float]] = {}
+    for _ in range(runs):
+        for module in MODULES:
+            seconds = float(run_script(IMPORT_SCRIPT.format(module=module), backend))
+            samples.setdefault(f"{module}_import_s", []).append(seconds)
+        for phase, seconds in json.loads(run_script(BOOT_SCRIPT, backend)).items():
+            samples.setdefault(f"boot_{phase}", []).append(seconds)
+    return {name: statistics.median(values) for name, values in samples.items()}
+
+
+def print_result(result: Dict[str, float], baseline: Dict[str, Any] = None) -> None:
+    for name, seconds in result.items():
+        line = f"  {name:<32} {seconds * 1000:8.0f}ms"
+        if baseline and baseline.get(name):
+            line += f"  ({(seconds - baseline[name]) / baseline[name] * 100:+.1f}%)"
+        print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Server startup benchmark")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--backend", default="fake", help="LLM_BACKEND for the runs")
+    parser.add_argument("--output", default=None, help="Save the result as JSON")
+    parser.add_argument("--compare", default=None, help="Earlier result to compare against")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    result = measure(args.runs, args.backend)
+    print(f"Startup ({args.backend} backend, median of {args.runs} runs)")
+    print_result(result, baseline)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResult saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
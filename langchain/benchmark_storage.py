@@ -0,0 +1,126 @@
+"""
+Benchmark the conversation storage backends
+
+Writes --messages messages (as question/answer exchanges) into each backend,
+then times random history reads, and reports writes/sec and read latency.
+
+    python benchmark_storage.py --messages 1000000 --batch 500
+    python benchmark_storage.py --backend sqlite --path /tmp/bench.db
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from conversation_store import ConversationStore
+from sqlite_store import SQLiteConversationStore, SQLiteDatabase
+
+USER_MESSAGE = "Can they share my personal data with advertisers?"
+ASSISTANT_MESSAGE = (
+    "Yes. Section 4 allows sharing your name, email and browsing history with "
+    "third-party advertisers, and there is no opt-out described in the terms."
+)
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def make_store(backend: str, path: str, conversations: int) -> Any:
+    if backend == "sqlite":
+        return SQLiteConversationStore(SQLiteDatabase(path), idle_ttl_seconds=24 * 60 * 60)
+    return ConversationStore(
+        max_conversations=conversations,
+        max_bytes=16 * 1024 * 1024 * 1024,
+        idle_ttl_seconds=24 * 60 * 60,
+    )
+
+def run_backend(backend: str, path: str, messages: int, conversations: int,
+                batch: int, reads: int) -> Dict[str, Any]:
+    """
+    Fill one backend and time writes and reads
+
+    Returns:
+        Dictionary with write throughput and read latency percentiles
+    """
+    store = make_store(backend, path, conversations)
+    exchanges = messages // 2
+    ids = [f"conv-{i}" for i in range(conversations)]
+
+    started = time.perf_counter()
+    pending = []
+    for i in range(exchanges):
+        pending.append((ids[i % conversations], USER_MESSAGE, ASSISTANT_MESSAGE))
+        if len(pending) >= batch:
+            write_batch(store, pending)
+            pending = []
+    if pending:
+        write_batch(store, pending)
+    write_elapsed = time.perf_counter() - started
+
+    latencies = []
+    for _ in range(reads):
+        conversation_id = random.choice(ids)
+        start = time.perf_counter()
+        store.get_history(conversation_id)
+        latencies.append(time.perf_counter() - start)
+
+    return {
+        "backend": backend,
+        "messages": exchanges * 2,
+        "write_elapsed_s": write_elapsed,
+        "writes_per_s": exchanges * 2 / write_elapsed if write_elapsed else 0.0,
+        "read_p50_ms": percentile(latencies, 50) * 1000,
+        "read_p95_ms": percentile(latencies, 95) * 1000,
+        "read_p99_ms": percentile(latencies, 99) * 1000,
+        "stats": store.stats(),
+    }
+
+def write_batch(store: Any, exchanges: List[tuple]) -> None:
+    # The SQLite store commits a whole batch in one transaction
+    if hasattr(store, "append_exchanges"):
+        store.append_exchanges(exchanges)
+        return
+    for exchange in exchanges:
+        store.append_exchange(*exchange)
+
+def print_result(result: Dict[str, Any]) -> None:
+    print(f"\n{result['backend']}")
+    print(f"  Messages:  {result['messages']} in {result['write_elapsed_s']:.2f}s "
+          f"({result['writes_per_s']:.0f} writes/s)")
+    print(f"  Reads:     p50 {result['read_p50_ms']:.3f}ms | p95 {result['read_p95_ms']:.3f}ms | "
+          f"p99 {result['read_p99_ms']:.3f}ms")
+    print(f"  Stored:    {result['stats']['conversations']} conversations, "
+          f"{result['stats']['bytes_used'] / 1024 / 1024:.1f} MB")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Conversation storage benchmark")
+    parser.add_argument("--backend", choices=["memory", "sqlite", "both"], default="both")
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--conversations", type=int, default=10000)
+    parser.add_argument("--batch", type=int, default=500,
+                        help="Exchanges per write transaction (SQLite)")
+    parser.add_argument("--reads", type=int, default=10000)
+    parser.add_argument("--path", default=None, help="SQLite file (default: a temp file)")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("💾 Conversation storage benchmark")
+    print("=" * 60)
+    print(f"Messages: {args.messages} | Conversations: {args.conversations} | Batch: {args.batch}")
+
+    backends = ["memory", "sqlite"] if args.backend == "both" else [args.backend]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = args.path or os.path.join(tmp_dir, "benchmark.db")
+        for backend in backends:
+            print_result(run_backend(backend, path, args.messages, args.conversations,
+                                     args.batch, args.reads))
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,6 @@
 Check available NVIDIA models for your API key
 """
 
-from langchain_nvidia_ai_endpoints import ChatNVIDIA
 import os
 from dotenv import load_dotenv
 
@@ -12,6 +11,9 @@ if not os.getenv("NVIDIA_API_KEY"):
     print("Please set NVIDIA_API_KEY environment variable")
     exit(1)
 
+# Imported after the key check, so a missing key is reported without loading the client
+from langchain_nvidia_ai_endpoints import ChatNVIDIA
+
 print("Checking available models...\n")
 
 # Try to get available models
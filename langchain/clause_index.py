@@ -0,0 +1,184 @@
+"""
+Per-document BM25 index over clauses
+Built once per document, then each chatbot question pulls its top-k matching
+clauses into the prompt instead of the first N characters. Postings are
+stored as NumPy arrays (one contiguous run of clause IDs and precomputed
+BM25 weights per term), so a query is a handful of vectorized adds.
+"""
+
+import re
+from collections import Counter
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from clause_salience import MIN_CLAUSE_CHARS, split_clauses
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Common words (and question filler) that carry no retrieval signal
+STOPWORDS = frozenset("""
+a about above after all also an and any are as at be been being by can could
+did do does explain for from get got had has have how i if in into is it its
+know let me mean might my no not of on or our shall should so such tell than
+that the their them then there these they this those to under until up upon
+us was we were what when where which while who whom why will with would you
+your
+""".split())
+
+# Rough per-term cost of the vocabulary dict, used for memory accounting
+VOCAB_ENTRY_BYTES = 100
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase word tokens with stopwords removed
+
+    A light suffix strip lets "refunds"/"refund" and "terminated"/"terminate"
+    match each other.
+    """
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS or len(token) < 2:
+            continue
+        if len(token) > 4:
+            if token.endswith("ing"):
+                token = token[:-3]
+            elif token.endswith("ed"):
+                token = token[:-2]
+            elif token.endswith("es"):
+                token = token[:-2]
+            elif token.endswith("s") and not token.endswith("ss"):
+                token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class ClauseIndex:
+    """
+    BM25 index over the clauses of one document
+
+    Args:
+        clauses: Clauses in document order (see split_clauses)
+        k1: BM25 term-frequency saturation
+        b: BM25 length normalization
+    """
+
+    def __init__(self, clauses: List[str], k1: float = 1.5, b: float = 0.75):
+        self.clauses = clauses
+        self.vocabulary: Dict[str, int] = {}
+
+        clause_ids: List[int] = []
+        term_ids: List[int] = []
+        frequencies: List[int] = []
+        lengths = np.zeros(len(clauses), dtype=np.float32)
+
+        for clause_id, clause in enumerate(clauses):
+            counts = Counter(tokenize(clause))
+            lengths[clause_id] = sum(counts.values())
+            for term, count in counts.items():
+                term_id = self.vocabulary.setdefault(term, len(self.vocabulary))
+                clause_ids.append(clause_id)
+                term_ids.append(term_id)
+                frequencies.append(count)
+
+        terms = np.asarray(term_ids, dtype=np.int32)
+        docs = np.asarray(clause_ids, dtype=np.int32)
+        tf = np.asarray(frequencies, dtype=np.float32)
+
+        n = max(len(clauses), 1)
+        df = np.bincount(terms, minlength=len(self.vocabulary)).astype(np.float32)
+        idf = np.log1p((n - df + 0.5) / (df + 0.5))
+        average_length = float(lengths.mean()) if len(clauses) else 0.0
+        norm = k1 * (1 - b + b * lengths[docs] / (average_length or 1.0))
+        weights = idf[terms] * tf * (k1 + 1) / (tf + norm)
+
+        # Group postings by term so each term's clauses are one contiguous slice
+        order = np.argsort(terms, kind="stable")
+        self._clause_ids = docs[order]
+        self._weights = weights[order].astype(np.float32)
+        self._offsets = np.concatenate(([0], np.cumsum(df))).astype(np.int64)
+
+    @classmethod
+    def from_text(cls, text: str) -> "ClauseIndex":
+        """
+        Split a document into clauses and index them
+
+        Navigation-like lines (short, no sentence punctuation) and repeated
+        clauses are left out.
+        """
+        clauses = []
+        seen = set()
+        for clause in split_clauses(text):
+            if len(clause) < MIN_CLAUSE_CHARS and not clause.rstrip().endswith((".", ";", ":")):
+                continue
+            if clause in seen:
+                continue
+            seen.add(clause)
+            clauses.append(clause)
+        return cls(clauses)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory used by the index (arrays plus vocabulary)"""
+        return (
+            self._clause_ids.nbytes + self._weights.nbytes + self._offsets.nbytes
+            + len(self.vocabulary) * VOCAB_ENTRY_BYTES
+            + sum(len(clause) for clause in self.clauses)
+        )
+
+    def search(self, query: str, k: int = 8) -> List[Tuple[int, float]]:
+        """
+        Top-k clauses for a query
+
+        Args:
+            query: Free-text question
+            k: Maximum number of clauses to return
+
+        Returns:
+            List of (clause position, score), best first. Clauses sharing no
+            terms with the query are never returned.
+        """
+        scores = np.zeros(len(self.clauses), dtype=np.float32)
+        matched = False
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self._offsets[term_id], self._offsets[term_id + 1]
+            scores[self._clause_ids[start:end]] += self._weights[start:end]
+            matched = True
+
+        if not matched:
+            return []
+
+        if k < len(scores):
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(i), float(scores[i])) for i in top if scores[i] > 0]
+
+    def select(self, query: str, budget_chars: int, k: int = 8) -> str:
+        """
+        Pack the best-matching clauses into a character budget
+
+        Args:
+            query: Free-text question
+            budget_chars: Maximum number of characters to return
+            k: Maximum number of clauses to consider
+
+        Returns:
+            Selected clauses joined in document order, or "" if nothing matched
+        """
+        selected = []
+        used = 0
+        for position, _ in self.search(query, k):
+            cost = len(self.clauses[position]) + 1
+            if used + cost > budget_chars:
+                continue
+            selected.append(position)
+            used += cost
+
+        selected.sort()
+        return "\n".join(self.clauses[position] for position in selected)
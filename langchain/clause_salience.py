@@ -0,0 +1,140 @@
+"""
+Pre-LLM clause salience scoring
+Splits a document into clauses, ranks them by legal-risk signals and packs
+the highest-value clauses into a prompt budget, so the model sees the
+arbitration and data-sharing sections instead of the page's navigation links
+"""
+
+import re
+from typing import List, Tuple
+
+# (signal name, weight, pattern). A clause scores the sum of the weights of
+# the distinct signals it matches.
+RISK_SIGNALS = [
+    ("arbitration", 5, r"arbitrat|class[- ]action|jury trial|waive\w* (?:your|the) right|dispute resolution"),
+    ("data_sale", 5, r"\bsell\w*\b.{0,40}\b(?:data|information)|sale of (?:your )?(?:personal )?(?:data|information)"),
+    ("third_party_sharing", 4, r"third[- ]part|share\w*\b.{0,60}\b(?:data|information)|advertis|sub-?processor|affiliates?"),
+    ("liability", 4, r"liab(?:le|ility)|indemn|warrant|\bas is\b|consequential|damages"),
+    ("refunds", 4, r"refund|non-?refundable|chargeback|money back"),
+    ("billing", 3, r"\bfees?\b|billing|auto-?renew|subscription|charge[sd]?\b|price"),
+    ("unilateral_changes", 4, r"(?:modify|change|amend|update)\w*\b.{0,40}\b(?:terms|agreement|policy)|at any time|without (?:prior )?notice|sole discretion"),
+    ("termination", 3, r"terminat|suspen|cancel"),
+    ("governing_law", 3, r"governing law|governed by|jurisdiction|courts? of"),
+    ("data_collection", 3, r"collect\w*|personal (?:data|information)|cookies?|track\w*|retain\w*|retention|biometric|location data"),
+    ("content_license", 3, r"licen[cs]e|intellectual property|royalty|perpetual|irrevocable"),
+    ("user_rights", 2, r"right to (?:access|delete|erasure|object|opt)|opt[- ]out|gdpr|ccpa|data protection"),
+    ("security", 2, r"secur\w*|encrypt|breach"),
+]
+
+# Patterns are lowercase and matched against lowercased clauses, which is
+# several times faster than re.IGNORECASE
+_COMPILED_SIGNALS = [(name, weight, re.compile(pattern)) for name, weight, pattern in RISK_SIGNALS]
+
+_LINE_RE = re.compile(r"\n+")
+_SENTENCE_RE = re.compile(r"(?<=[.!?;])\s+")
+
+# Lines shorter than this with no sentence punctuation are treated as
+# navigation/menu text and never selected
+MIN_CLAUSE_CHARS = 40
+
+# Paragraphs longer than this are split into sentence groups
+MAX_CLAUSE_CHARS = 600
+
+
+def split_clauses(text: str) -> List[str]:
+    """
+    Split a document into clauses in document order
+
+    Each non-empty line is a clause; long paragraphs are further split into
+    groups of sentences no longer than MAX_CLAUSE_CHARS.
+
+    Args:
+        text: The document
+
+    Returns:
+        List of clause strings
+    """
+    clauses: List[str] = []
+    for line in _LINE_RE.split(text):
+        line = line.strip()
+        if not line:
+            continue
+        if len(line) <= MAX_CLAUSE_CHARS:
+            clauses.append(line)
+            continue
+
+        current = ""
+        for sentence in _SENTENCE_RE.split(line):
+            if current and len(current) + 1 + len(sentence) > MAX_CLAUSE_CHARS:
+                clauses.append(current)
+                current = sentence
+            else:
+                current = f"{current} {sentence}" if current else sentence
+        if current:
+            clauses.append(current)
+    return clauses
+
+
+def score_clause(clause: str) -> int:
+    """
+    Score a clause by the legal-risk signals it contains
+
+    Args:
+        clause: One clause of text
+
+    Returns:
+        Salience score (0 for navigation-like or signal-free text)
+    """
+    if len(clause) < MIN_CLAUSE_CHARS and not clause.rstrip().endswith((".", ";", ":")):
+        return 0
+    lowered = clause.lower()
+    return sum(weight for _, weight, pattern in _COMPILED_SIGNALS if pattern.search(lowered))
+
+
+def rank_clauses(text: str) -> List[Tuple[int, int, str]]:
+    """
+    Score every clause of a document
+
+    Returns:
+        List of (score, position, clause) in document order
+    """
+    return [(score_clause(clause), i, clause) for i, clause in enumerate(split_clauses(text))]
+
+
+def select_salient_text(text: str, budget_chars: int) -> str:
+    """
+    Pack the highest-value clauses into a character budget
+
+    Documents that already fit are returned unchanged. Otherwise clauses are
+    taken greedily by descending score (earlier clauses win ties) while they
+    fit, and the selection is joined back in document order. If nothing
+    scores, the first budget_chars characters are returned as before.
+
+    Args:
+        text: The document
+        budget_chars: Maximum number of characters to return
+
+    Returns:
+        Selected text, at most budget_chars long
+    """
+    if len(text) <= budget_chars:
+        return text
+
+    ranked = [entry for entry in rank_clauses(text) if entry[0] > 0]
+    if not ranked:
+        return text[:budget_chars]
+
+    selected = []
+    used = 0
+    for score, position, clause in sorted(ranked, key=lambda entry: (-entry[0], entry[1])):
+        cost = len(clause) + 1
+        if used + cost > budget_chars:
+            continue
+        selected.append((position, clause))
+        used += cost
+
+    if not selected:
+        return text[:budget_chars]
+
+    selected.sort()
+    return "\n".join(clause for _, clause in selected)
@@ -0,0 +1,163 @@
+"""
+Token-budgeted conversation memory
+Recent turns are replayed verbatim within a token budget; older turns are
+folded into a running summary by a background worker, off the request path,
+so the prompt size of a chat turn stays bounded however long the
+conversation runs.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Set, Tuple
+
+# Rough characters per token for English text; avoids a tokenizer dependency
+CHARS_PER_TOKEN = 4
+
+# Messages sent to the summarizer are truncated to this many characters each
+SUMMARIZER_MESSAGE_CHARS = 1500
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of a piece of text"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def recent_messages(history: List[Dict[str, str]], budget_tokens: int) -> List[Dict[str, str]]:
+    """
+    Newest messages that fit in a token budget, in chronological order
+
+    The newest message is always kept, truncated to the budget if needed.
+
+    Args:
+        history: Messages as dicts with 'role' and 'content'
+        budget_tokens: Token budget for the replayed messages
+
+    Returns:
+        The suffix of history that fits the budget
+    """
+    selected: List[Dict[str, str]] = []
+    used = 0
+    for message in reversed(history):
+        cost = estimate_tokens(message["content"])
+        if used + cost > budget_tokens:
+            if not selected:
+                max_chars = budget_tokens * CHARS_PER_TOKEN
+                selected.append({"role": message["role"], "content": message["content"][-max_chars:]})
+            break
+        selected.append(message)
+        used += cost
+    selected.reverse()
+    return selected
+
+
+def format_transcript(messages: List[Dict[str, str]]) -> str:
+    """Render messages as 'User: ...' / 'Assistant: ...' lines for the summarizer"""
+    lines = []
+    for message in messages:
+        speaker = "User" if message["role"] == "user" else "Assistant"
+        content = message["content"]
+        if len(content) > SUMMARIZER_MESSAGE_CHARS:
+            content = content[:SUMMARIZER_MESSAGE_CHARS] + "..."
+        lines.append(f"{speaker}: {content}")
+    return "\n".join(lines)
+
+
+class ConversationSummarizer:
+    """
+    Background worker that folds older turns into a conversation's summary
+
+    A conversation is scheduled when its unsummarized messages exceed
+    trigger_tokens (or near the store's max_messages cap). The worker then
+    summarizes everything except the newest keep_tokens of messages and
+    calls store.fold(), so consecutive turns do not each trigger a fold.
+
+    Args:
+        store: ConversationStore or SQLiteConversationStore
+        summarize: Function (current summary, messages) -> new summary
+        trigger_tokens: Unsummarized tokens that trigger a fold
+        keep_tokens: Tokens of recent messages left verbatim after a fold
+        max_workers: Concurrent background summarizations
+    """
+
+    def __init__(self, store: Any, summarize: Callable[[str, List[Dict[str, str]]], str],
+                 trigger_tokens: int = 1000, keep_tokens: int = 500, max_workers: int = 2):
+        self.store = store
+        self.summarize = summarize
+        self.trigger_tokens = trigger_tokens
+        self.keep_tokens = keep_tokens
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="summarizer")
+        self._lock = threading.Lock()
+        self._in_flight: Set[str] = set()
+        self.scheduled = 0
+        self.completed = 0
+        self.failed = 0
+
+    def maybe_schedule(self, conversation_id: str) -> bool:
+        """
+        Queue a background fold if the conversation has outgrown its budget
+
+        Returns:
+            True if a fold was queued
+        """
+        _, messages = self.store.get_memory(conversation_id)
+        if not self._needs_fold(messages):
+            return False
+
+        with self._lock:
+            if conversation_id in self._in_flight:
+                return False
+            self._in_flight.add(conversation_id)
+            self.scheduled += 1
+
+        self._executor.submit(self._fold, conversation_id)
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        """Background summarization counters"""
+        with self._lock:
+            return {
+                "scheduled": self.scheduled,
+                "completed": self.completed,
+                "failed": self.failed,
+                "in_flight": len(self._in_flight),
+            }
+
+    def _needs_fold(self, messages: List[Tuple[int, Dict[str, str]]]) -> bool:
+        max_messages = getattr(self.store, "max_messages", None)
+        if max_messages and len(messages) >= max_messages - 2:
+            return True
+        return sum(estimate_tokens(message["content"]) for _, message in messages) > self.trigger_tokens
+
+    def _split(self, messages: List[Tuple[int, Dict[str, str]]]) -> List[Tuple[int, Dict[str, str]]]:
+        # Everything older than the newest keep_tokens of messages (whole exchanges)
+        kept = 0
+        used = 0
+        for _, message in reversed(messages):
+            cost = estimate_tokens(message["content"])
+            if used + cost > self.keep_tokens:
+                break
+            used += cost
+            kept += 1
+        max_messages = getattr(self.store, "max_messages", None)
+        if max_messages:
+            # Leave room below the store's cap so trimming never drops unsummarized turns
+            kept = min(kept, max_messages // 2)
+        kept -= kept % 2
+        return messages[:len(messages) - kept]
+
+    def _fold(self, conversation_id: str) -> None:
+        try:
+            summary, messages = self.store.get_memory(conversation_id)
+            older = self._split(messages)
+            if older:
+                new_summary = self.summarize(summary, [message for _, message in older])
+                self.store.fold(conversation_id, new_summary, older[-1][0])
+            with self._lock:
+                self.completed += 1
+        except Exception as e:
+            print(f"Summarizer Error: {e}")
+            with self._lock:
+                self.failed += 1
+        finally:
+            with self._lock:
+                self._in_flight.discard(conversation_id)
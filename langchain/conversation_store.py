@@ -0,0 +1,253 @@
+"""
+Bounded in-memory conversation store
+Conversations are evicted after an idle TTL, in LRU order when there are too
+many, and in LRU order when the stored bytes exceed a cap. Messages are kept
+as compact (role code, UTF-8 bytes) pairs, zlib-compressed when large. Older
+turns can be folded into a running summary (see conversation_memory.py).
+"""
+
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+ROLE_CODES = {"user": 0, "assistant": 1}
+ROLE_NAMES = {code: role for role, code in ROLE_CODES.items()}
+
+# Role codes at or above this offset mark compressed content
+COMPRESSED = 2
+
+# Messages longer than this (in bytes) are compressed
+COMPRESS_MIN_BYTES = 512
+
+# Rough per-object overheads used for memory accounting
+MESSAGE_OVERHEAD_BYTES = 72
+CONVERSATION_OVERHEAD_BYTES = 240
+
+
+def pack_message(role: str, content: str) -> Tuple[int, bytes]:
+    data = content.encode("utf-8")
+    code = ROLE_CODES.get(role, 0)
+    if len(data) >= COMPRESS_MIN_BYTES:
+        compressed = zlib.compress(data, 6)
+        if len(compressed) < len(data):
+            return code + COMPRESSED, compressed
+    return code, data
+
+
+def unpack_message(message: Tuple[int, bytes]) -> Dict[str, str]:
+    code, data = message
+    if code >= COMPRESSED:
+        code -= COMPRESSED
+        data = zlib.decompress(data)
+    return {"role": ROLE_NAMES[code], "content": data.decode("utf-8")}
+
+
+def message_size(message: Tuple[int, bytes]) -> int:
+    return len(message[1]) + MESSAGE_OVERHEAD_BYTES
+
+
+class _Conversation:
+    __slots__ = ("messages", "size", "last_access", "summary", "offset")
+
+    def __init__(self):
+        self.messages: List[Tuple[int, bytes]] = []
+        self.size = CONVERSATION_OVERHEAD_BYTES
+        self.last_access = time.time()
+        self.summary = ""
+        # Sequence number of messages[0]; grows as old messages are dropped
+        self.offset = 0
+
+
+class ConversationStore:
+    """
+    Thread-safe conversation history with idle-TTL, LRU and byte-cap eviction
+
+    Args:
+        max_conversations: Maximum number of conversations kept
+        max_bytes: Cap on the (approximate) bytes used by all conversations
+        idle_ttl_seconds: Conversations untouched for this long are dropped
+        max_messages: Messages kept per conversation (oldest dropped first)
+    """
+
+    def __init__(
+        self,
+        max_conversations: int = 10000,
+        max_bytes: int = 64 * 1024 * 1024,
+        idle_ttl_seconds: float = 60 * 60,
+        max_messages: int = 20,
+    ):
+        self.max_conversations = max_conversations
+        self.max_bytes = max_bytes
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_messages = max_messages
+        self.bytes_used = 0
+        self.evictions = {"idle": 0, "lru": 0, "bytes": 0}
+        self._conversations: "OrderedDict[str, _Conversation]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, conversation_id: str) -> bool:
+        with self._lock:
+            self._expire_idle()
+            return conversation_id in self._conversations
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._conversations)
+
+    def get_history(self, conversation_id: str) -> List[Dict[str, str]]:
+        """
+        Get a conversation's messages as {"role", "content"} dicts
+
+        Returns:
+            The messages in order, or an empty list for unknown IDs
+        """
+        with self._lock:
+            self._expire_idle()
+            conversation = self._conversations.get(conversation_id)
+            if conversation is None:
+                return []
+            self._touch(conversation_id, conversation)
+            messages = list(conversation.messages)
+        return [unpack_message(message) for message in messages]
+
+    def get_memory(self, conversation_id: str) -> Tuple[str, List[Tuple[int, Dict[str, str]]]]:
+        """
+        Get a conversation's running summary and its not-yet-summarized messages
+
+        Returns:
+            Tuple of (summary, [(sequence number, message dict), ...]); the
+            summary is "" and the list empty for unknown IDs
+        """
+        with self._lock:
+            self._expire_idle()
+            conversation = self._conversations.get(conversation_id)
+            if conversation is None:
+                return "", []
+            self._touch(conversation_id, conversation)
+            summary = conversation.summary
+            offset = conversation.offset
+            messages = list(conversation.messages)
+        return summary, [(offset + i, unpack_message(message)) for i, message in enumerate(messages)]
+
+    def fold(self, conversation_id: str, summary: str, through_sequence: int) -> bool:
+        """
+        Replace the summary and drop the messages it now covers
+
+        Args:
+            conversation_id: Conversation to update
+            summary: New running summary
+            through_sequence: Sequence number of the last summarized message
+
+        Returns:
+            True if the conversation still exists
+        """
+        with self._lock:
+            conversation = self._conversations.get(conversation_id)
+            if conversation is None:
+                return False
+
+            dropped = max(0, min(through_sequence + 1 - conversation.offset, len(conversation.messages)))
+            for message in conversation.messages[:dropped]:
+                conversation.size -= message_size(message)
+                self.bytes_used -= message_size(message)
+            del conversation.messages[:dropped]
+            conversation.offset += dropped
+
+            delta = len(summary.encode("utf-8")) - len(conversation.summary.encode("utf-8"))
+            conversation.summary = summary
+            conversation.size += delta
+            self.bytes_used += delta
+            return True
+
+    def append_exchange(self, conversation_id: str, user_message: str, assistant_response: str) -> None:
+        """
+        Append a question/answer pair, creating the conversation if needed
+        """
+        packed = [pack_message("user", user_message), pack_message("assistant", assistant_response)]
+
+        with self._lock:
+            self._expire_idle()
+            conversation = self._conversations.get(conversation_id)
+            if conversation is None:
+                conversation = _Conversation()
+                self._conversations[conversation_id] = conversation
+                self.bytes_used += conversation.size
+
+            for message in packed:
+                conversation.messages.append(message)
+                conversation.size += message_size(message)
+                self.bytes_used += message_size(message)
+
+            # Keep only the most recent messages
+            while len(conversation.messages) > self.max_messages:
+                dropped = conversation.messages.pop(0)
+                conversation.offset += 1
+                conversation.size -= message_size(dropped)
+                self.bytes_used -= message_size(dropped)
+
+            self._touch(conversation_id, conversation)
+            self._enforce_limits(keep=conversation_id)
+
+    def delete(self, conversation_id: str) -> bool:
+        """
+        Remove a conversation
+
+        Returns:
+            True if the conversation existed
+        """
+        with self._lock:
+            return self._remove(conversation_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """Entry counts, bytes in use and eviction counters"""
+        with self._lock:
+            self._expire_idle()
+            return {
+                "conversations": len(self._conversations),
+                "messages": sum(len(c.messages) for c in self._conversations.values()),
+                "bytes_used": self.bytes_used,
+                "max_bytes": self.max_bytes,
+                "evictions": dict(self.evictions),
+            }
+
+    # ------------------------------------------------------------------
+    # Internal helpers (call with the lock held)
+    # ------------------------------------------------------------------
+
+    def _touch(self, conversation_id: str, conversation: _Conversation) -> None:
+        conversation.last_access = time.time()
+        self._conversations.move_to_end(conversation_id)
+
+    def _remove(self, conversation_id: str) -> bool:
+        conversation = self._conversations.pop(conversation_id, None)
+        if conversation is None:
+            return False
+        self.bytes_used -= conversation.size
+        return True
+
+    def _expire_idle(self) -> None:
+        # Entries are in access order, so idle ones are at the front
+        cutoff = time.time() - self.idle_ttl_seconds
+        while self._conversations:
+            oldest_id, oldest = next(iter(self._conversations.items()))
+            if oldest.last_access >= cutoff:
+                break
+            self._remove(oldest_id)
+            self.evictions["idle"] += 1
+
+    def _enforce_limits(self, keep: str) -> None:
+        while len(self._conversations) > self.max_conversations:
+            oldest_id = next(iter(self._conversations))
+            if oldest_id == keep:
+                break
+            self._remove(oldest_id)
+            self.evictions["lru"] += 1
+
+        while self.bytes_used > self.max_bytes and len(self._conversations) > 1:
+            oldest_id = next(iter(self._conversations))
+            if oldest_id == keep:
+                break
+            self._remove(oldest_id)
+            self.evictions["bytes"] += 1
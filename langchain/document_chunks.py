@@ -0,0 +1,173 @@
+"""
+Split long documents into chunks for map-reduce analysis and merge the
+per-chunk findings back into a single result
+"""
+
+import re
+from typing import Any, Dict, List
+
+# Higher rank wins when two findings describe the same issue
+FLAG_RANK = {"critical": 3, "warning": 2, "good": 1}
+
+_PARAGRAPH_RE = re.compile(r"\n\s*\n|\n")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+# Words that carry no meaning when comparing finding titles
+_STOPWORDS = {
+    "a", "an", "and", "the", "of", "to", "for", "in", "on", "by", "with",
+    "is", "are", "be", "or", "your", "user", "users", "policy", "clause",
+    "terms", "term",
+}
+
+
+def _split_long_block(block: str, chunk_size: int) -> List[str]:
+    """Split a block that is longer than chunk_size by sentences, then hard cut"""
+    pieces: List[str] = []
+    current = ""
+    for sentence in _SENTENCE_RE.split(block):
+        while len(sentence) > chunk_size:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(sentence[:chunk_size])
+            sentence = sentence[chunk_size:]
+        if current and len(current) + 1 + len(sentence) > chunk_size:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_into_chunks(text: str, chunk_size: int = 2000, max_chunks: int = 8) -> List[str]:
+    """
+    Split text into chunks on paragraph boundaries
+
+    Args:
+        text: The document to split
+        chunk_size: Target maximum characters per chunk
+        max_chunks: Upper bound on the number of chunks; the chunk size is
+            raised for very long documents so the bound holds
+
+    Returns:
+        List of chunks in document order
+    """
+    text = text.strip()
+    if not text:
+        return []
+
+    # Keep the number of upstream calls bounded for very long documents
+    chunk_size = max(chunk_size, -(-len(text) // max_chunks))
+
+    blocks = [b.strip() for b in _PARAGRAPH_RE.split(text) if b.strip()]
+
+    chunks: List[str] = []
+    current = ""
+    for block in blocks:
+        if len(block) > chunk_size:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.extend(_split_long_block(block, chunk_size))
+            continue
+
+        if current and len(current) + 1 + len(block) > chunk_size:
+            chunks.append(current)
+            current = block
+        else:
+            current = f"{current}\n{block}" if current else block
+
+    if current:
+        chunks.append(current)
+
+    # Sentence splitting can overshoot max_chunks slightly; fold the tail back in
+    while len(chunks) > max_chunks:
+        tail = chunks.pop()
+        chunks[-1] = f"{chunks[-1]}\n{tail}"
+
+    return chunks
+
+
+def _title_tokens(finding: Dict[str, Any]) -> set:
+    words = _WORD_RE.findall(str(finding.get("title", "")).lower())
+    return {w for w in words if w not in _STOPWORDS}
+
+
+def _is_duplicate(a: Dict[str, Any], b: Dict[str, Any], threshold: float) -> bool:
+    """Two findings are duplicates if they share a category and most title words"""
+    if a.get("category") != b.get("category"):
+        return False
+    tokens_a, tokens_b = _title_tokens(a), _title_tokens(b)
+    if not tokens_a or not tokens_b:
+        return False
+    overlap = len(tokens_a & tokens_b) / len(tokens_a | tokens_b)
+    return overlap >= threshold
+
+
+def merge_findings(findings: List[Dict[str, Any]], max_findings: int = 10,
+                   similarity: float = 0.5) -> List[Dict[str, Any]]:
+    """
+    Deduplicate findings from several chunks
+
+    When two findings describe the same issue the more severe flag wins and
+    the longer description is kept. The result is capped at max_findings,
+    keeping the most severe findings and preserving document order otherwise.
+
+    Args:
+        findings: Findings in document order
+        max_findings: Maximum number of findings to return
+        similarity: Title-word Jaccard similarity treated as a duplicate
+
+    Returns:
+        Deduplicated list of findings
+    """
+    merged: List[Dict[str, Any]] = []
+    for finding in findings:
+        for existing in merged:
+            if _is_duplicate(existing, finding, similarity):
+                if FLAG_RANK.get(finding.get("flag"), 0) > FLAG_RANK.get(existing.get("flag"), 0):
+                    existing["flag"] = finding["flag"]
+                if len(finding.get("description", "")) > len(existing.get("description", "")):
+                    existing["description"] = finding["description"]
+                break
+        else:
+            merged.append(dict(finding))
+
+    if len(merged) > max_findings:
+        ranked = sorted(range(len(merged)), key=lambda i: -FLAG_RANK.get(merged[i].get("flag"), 0))
+        keep = sorted(ranked[:max_findings])
+        merged = [merged[i] for i in keep]
+
+    return merged
+
+
+def merge_summaries(summaries: List[Any], max_chars: int = 500) -> str:
+    """
+    Combine chunk summaries by taking the first sentence of each
+
+    Args:
+        summaries: Per-chunk summaries in document order; None or non-string
+            values (e.g. "summary": null in a model's output) are tolerated
+        max_chars: Maximum length of the combined summary
+
+    Returns:
+        Combined summary
+    """
+    summaries = [str(summary or "") for summary in summaries]
+    sentences: List[str] = []
+    for summary in summaries:
+        first = _SENTENCE_RE.split(summary.strip(), maxsplit=1)[0].strip()
+        if first and first not in sentences:
+            sentences.append(first)
+
+    combined = ""
+    for sentence in sentences:
+        candidate = f"{combined} {sentence}".strip()
+        if len(candidate) > max_chars:
+            break
+        combined = candidate
+
+    return combined or (summaries[0][:max_chars] if summaries else "")
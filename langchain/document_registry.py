@@ -0,0 +1,235 @@
+"""
+Upload-once document registry
+Documents are registered once and referenced by a content-hash ID on later
+analyze and chat calls. Text is stored zlib-compressed and deduplicated:
+the same document registered from many conversations is kept once. Values
+derived from a document (the chatbot system prompt, its clause index) are
+cached alongside it and evicted with it.
+"""
+
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from analysis_cache import make_cache_key
+
+DOCUMENT_ID_PREFIX = "doc_"
+
+# Rough per-entry overhead used for memory accounting
+DOCUMENT_OVERHEAD_BYTES = 200
+
+
+def document_id_for(terms_data: str) -> str:
+    """
+    Content-hash ID for a document
+
+    Whitespace-only differences map to the same ID (see normalize_terms).
+    """
+    return DOCUMENT_ID_PREFIX + make_cache_key(terms_data)
+
+
+class _Document:
+    __slots__ = ("data", "chars", "derived", "derived_bytes")
+
+    def __init__(self, data: bytes, chars: int):
+        self.data = data
+        self.chars = chars
+        self.derived: Dict[str, Any] = {}
+        self.derived_bytes = 0
+
+    @property
+    def size(self) -> int:
+        return len(self.data) + self.derived_bytes + DOCUMENT_OVERHEAD_BYTES
+
+
+class DocumentRegistry:
+    """
+    Thread-safe LRU registry of compressed documents
+
+    Args:
+        max_documents: Maximum documents kept in memory
+        max_bytes: Cap on the compressed bytes (plus derived values) kept in memory
+        persistent_tier: Optional object with get(id) -> bytes and
+            set(id, bytes) so documents survive restarts and evictions
+            (e.g. SQLiteDocumentTier)
+    """
+
+    def __init__(self, max_documents: int = 1000, max_bytes: int = 64 * 1024 * 1024,
+                 persistent_tier: Optional[Any] = None):
+        self.max_documents = max_documents
+        self.max_bytes = max_bytes
+        self.persistent = persistent_tier
+        self.bytes_used = 0
+        self.registrations = 0
+        self.deduplicated = 0
+        self.evictions = 0
+        self.derived_hits = 0
+        self.derived_misses = 0
+        self._documents: "OrderedDict[str, _Document]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, document_id: str) -> bool:
+        return self._load(document_id) is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._documents)
+
+    def register(self, terms_data: str) -> Tuple[str, bool]:
+        """
+        Store a document, or find the copy already stored
+
+        Registering a stored document again refreshes its persistent copy,
+        so a document still in use does not expire for other workers.
+
+        Args:
+            terms_data: The terms and conditions text
+
+        Returns:
+            Tuple of (document ID, whether the document was newly stored)
+        """
+        document_id = document_id_for(terms_data)
+
+        with self._lock:
+            self.registrations += 1
+            document = self._documents.get(document_id)
+            if document is not None:
+                self._documents.move_to_end(document_id)
+                self.deduplicated += 1
+
+        if document is None:
+            document = self._load(document_id)
+            if document is not None:
+                with self._lock:
+                    self.deduplicated += 1
+
+        if document is not None:
+            if self.persistent:
+                # Restart the stored copy's TTL, which the other workers read
+                self.persistent.set(document_id, document.data)
+            return document_id, False
+
+        data = zlib.compress(terms_data.encode("utf-8"), 6)
+        with self._lock:
+            self._insert(document_id, _Document(data, len(terms_data)))
+        if self.persistent:
+            self.persistent.set(document_id, data)
+        return document_id, True
+
+    def get(self, document_id: str) -> Optional[str]:
+        """
+        Get a registered document's text
+
+        Returns:
+            The text, or None if the ID is unknown (or has been evicted)
+        """
+        document = self._load(document_id)
+        if document is None:
+            return None
+        return zlib.decompress(document.data).decode("utf-8")
+
+    def info(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """Size information for a registered document, or None if unknown"""
+        document = self._load(document_id)
+        if document is None:
+            return None
+        return {
+            "document_id": document_id,
+            "chars": document.chars,
+            "stored_bytes": len(document.data),
+        }
+
+    def derived(self, document_id: str, name: str, build: Callable[[], Any]) -> Any:
+        """
+        Get a value computed from a document, building it on first use
+
+        Args:
+            document_id: Registered document ID
+            name: Name of the derived value (e.g. "chat_system_prompt")
+            build: Function that computes the value
+
+        Returns:
+            The cached or freshly built value. Unknown IDs are not cached.
+            Values with an nbytes attribute count toward max_bytes.
+        """
+        with self._lock:
+            document = self._documents.get(document_id)
+            if document is not None and name in document.derived:
+                self.derived_hits += 1
+                return document.derived[name]
+            self.derived_misses += 1
+
+        value = build()
+
+        with self._lock:
+            document = self._documents.get(document_id)
+            if document is not None and name not in document.derived:
+                document.derived[name] = value
+                size = getattr(value, "nbytes", 0)
+                document.derived_bytes += size
+                self.bytes_used += size
+                self._enforce_limits(keep=document_id)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        """Document counts, compressed bytes in use and dedup counters"""
+        with self._lock:
+            chars = sum(d.chars for d in self._documents.values())
+            stored = sum(len(d.data) for d in self._documents.values())
+            return {
+                "documents": len(self._documents),
+                "chars": chars,
+                "bytes_used": self.bytes_used,
+                "compression_ratio": round(chars / stored, 2) if stored else 0.0,
+                "registrations": self.registrations,
+                "deduplicated": self.deduplicated,
+                "evictions": self.evictions,
+                "derived_hits": self.derived_hits,
+                "derived_misses": self.derived_misses,
+                "persistent": self.persistent is not None,
+            }
+
+    # ------------------------------------------------------------------
+    # Internal helpers
+    # ------------------------------------------------------------------
+
+    def _load(self, document_id: str) -> Optional[_Document]:
+        with self._lock:
+            document = self._documents.get(document_id)
+            if document is not None:
+                self._documents.move_to_end(document_id)
+                return document
+
+        if not self.persistent or not document_id.startswith(DOCUMENT_ID_PREFIX):
+            return None
+
+        # Promote documents registered by another worker or before a restart
+        data = self.persistent.get(document_id)
+        if data is None:
+            return None
+        document = _Document(data, len(zlib.decompress(data).decode("utf-8")))
+        with self._lock:
+            existing = self._documents.get(document_id)
+            if existing is not None:
+                return existing
+            self._insert(document_id, document)
+        return document
+
+    def _insert(self, document_id: str, document: _Document) -> None:
+        # Call with the lock held
+        self._documents[document_id] = document
+        self.bytes_used += document.size
+        self._enforce_limits(keep=document_id)
+
+    def _enforce_limits(self, keep: str) -> None:
+        # Call with the lock held
+        while len(self._documents) > 1 and (
+            len(self._documents) > self.max_documents or self.bytes_used > self.max_bytes
+        ):
+            oldest_id, oldest = next(iter(self._documents.items()))
+            if oldest_id == keep:
+                break
+            del self._documents[oldest_id]
+            self.bytes_used -= oldest.size
+            self.evictions += 1
@@ -0,0 +1,72 @@
+"""
+Gunicorn configuration: the production entry point for the Flask server
+
+Run from this directory (gunicorn reads ./gunicorn.conf.py by default):
+    gunicorn langchain_server:app
+
+The app is imported once in the master (preload) and forked into
+GUNICORN_WORKERS processes with GUNICORN_THREADS threads each, so the
+workers share the imported code instead of each importing it. Every worker
+then creates its own model clients and primes its upstream connection
+before it accepts requests. Workers are recycled after about
+GUNICORN_MAX_REQUESTS requests, finishing their in-flight requests first.
+
+Analysis results, conversations, documents and policy versions are kept in
+one SQLite file (STORAGE_BACKEND=sqlite is the default here) so that every
+worker sees them, and /metrics sums the metrics of all workers.
+"""
+
+import os
+import tempfile
+
+# Set before the app is imported: both are read at import time
+os.environ.setdefault("STORAGE_BACKEND", "sqlite")
+if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+    # Must start empty, so a new directory per server start (kept across reloads)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="terms-analysis-metrics-")
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("GUNICORN_WORKERS", str(os.cpu_count() or 1)))
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+preload_app = True
+
+# Recycle workers to bound memory growth; the jitter keeps them from restarting together
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "100"))
+
+# Chunked analyses and streamed answers can take minutes
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "300"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "60"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+
+def when_ready(server):
+    """Create the model clients in the master, so the workers inherit the imported model stack"""
+    import langchain_server
+
+    langchain_server.warm_up_models(ping=False)
+
+
+def pre_fork(server, worker):
+    """Close the master's SQLite connections; they must not be shared with the workers"""
+    import langchain_server
+
+    if langchain_server.sqlite_db is not None:
+        langchain_server.sqlite_db.close()
+
+
+def post_fork(server, worker):
+    """Give the worker its own model clients and upstream connection"""
+    import langchain_server
+    from model_clients import reset_clients
+
+    reset_clients()
+    if langchain_server.WARMUP_ENABLED:
+        langchain_server.warm_up_models()
+
+
+def child_exit(server, worker):
+    from metrics import mark_process_dead
+
+    mark_process_dead(worker.pid)
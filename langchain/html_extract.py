@@ -0,0 +1,236 @@
+"""
+Single-pass extraction of legal text from raw (optionally gzipped) HTML
+Boilerplate such as scripts, styles, navigation, headers and footers is
+dropped while the document is parsed, so memory stays proportional to the
+extracted text rather than the page
+"""
+
+import codecs
+import re
+import time
+import zlib
+from html.parser import HTMLParser
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Elements whose content is never legal text
+SKIP_TAGS = {
+    "script", "style", "noscript", "template", "svg", "canvas", "iframe",
+    "nav", "header", "footer", "aside", "form", "button", "select", "dialog",
+}
+
+# Elements that have no closing tag
+VOID_TAGS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link",
+    "meta", "param", "source", "track", "wbr",
+}
+
+# Elements that start a new line of text
+BLOCK_TAGS = {
+    "p", "div", "section", "article", "main", "li", "ul", "ol", "table",
+    "tr", "td", "th", "h1", "h2", "h3", "h4", "h5", "h6", "br", "hr",
+    "blockquote", "pre", "dd", "dt", "dl",
+}
+
+# SKIP_TAGS that are kept inside <main>/<article>, where they hold the
+# document's own title rather than the site's
+MAIN_CONTENT_TAGS = {"header"}
+
+# Landmark roles and class/id names that mark boilerplate containers.
+# Only banner-style cookie names match: "cookie-policy" is legal text.
+SKIP_ROLES = {"navigation", "banner", "contentinfo", "search", "menu", "menubar"}
+_BOILERPLATE_RE = re.compile(
+    r"(?:^|[\s_-])(nav|navbar|menu|footer|breadcrumbs?|sidebar|skip-link"
+    r"|cookies?[_-]?(?:banner|consent|notice|bar|popup))(?:$|[\s_-])",
+    re.IGNORECASE,
+)
+
+# Elements that usually wrap the main content of the page
+MAIN_TAGS = {"main", "article"}
+
+_SPACES_RE = re.compile(r"[ \t\r\f\v ]+")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+class ExtractionError(ValueError):
+    """Raised when the input cannot be decoded or exceeds the size limit"""
+
+
+class LegalTextExtractor(HTMLParser):
+    """
+    Incremental HTML-to-text extractor
+
+    Feed raw bytes with feed_bytes() as they arrive and call finish() to get
+    the extracted text. Gzip input is detected from its magic bytes.
+
+    Args:
+        max_html_bytes: Limit on decompressed input size (guards against
+            gzip bombs)
+        encoding: Text encoding of the HTML
+    """
+
+    def __init__(self, max_html_bytes: int = 5 * 1024 * 1024, encoding: str = "utf-8"):
+        super().__init__(convert_charrefs=True)
+        self.max_html_bytes = max_html_bytes
+        self.bytes_in = 0
+        self.html_bytes = 0
+        self.html_chars = 0
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        self._decompressor = None
+        self._sniffed = False
+        self._skip_stack: List[str] = []
+        self._main_depth = 0
+        self._parts: List[str] = []
+        self._main_parts: List[str] = []
+        self._started = time.perf_counter()
+
+    # ------------------------------------------------------------------
+    # Byte input
+    # ------------------------------------------------------------------
+
+    def feed_bytes(self, chunk: bytes) -> None:
+        """Decompress (if needed), decode and parse the next chunk of input"""
+        if not chunk:
+            return
+        self.bytes_in += len(chunk)
+
+        if not self._sniffed:
+            self._sniffed = True
+            if chunk[:2] == GZIP_MAGIC:
+                self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+        if self._decompressor is not None:
+            try:
+                # Cap the output so a small gzip body cannot expand without bound
+                chunk = self._decompressor.decompress(chunk, self.max_html_bytes - self.html_bytes + 1)
+            except zlib.error as e:
+                raise ExtractionError(f"Invalid gzip data: {e}")
+
+        self._feed_html_bytes(chunk)
+
+    def _feed_html_bytes(self, data: bytes) -> None:
+        self.html_bytes += len(data)
+        if self.html_bytes > self.max_html_bytes:
+            raise ExtractionError(f"HTML exceeds the {self.max_html_bytes} byte limit")
+
+        text = self._decoder.decode(data)
+        self.html_chars += len(text)
+        self.feed(text)
+
+    def finish(self) -> str:
+        """
+        Flush all buffered input and return the extracted text
+
+        The text inside <main>/<article> is preferred when the page has one
+        and it holds most of the visible text.
+        """
+        if self._decompressor is not None:
+            self._feed_html_bytes(self._decompressor.flush())
+        tail = self._decoder.decode(b"", final=True)
+        self.html_chars += len(tail)
+        self.feed(tail)
+        self.close()
+
+        full_text = self._clean(self._parts)
+        main_text = self._clean(self._main_parts)
+        if main_text and len(main_text) >= 0.3 * len(full_text):
+            return main_text
+        return full_text
+
+    @property
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._started) * 1000
+
+    # ------------------------------------------------------------------
+    # HTMLParser callbacks
+    # ------------------------------------------------------------------
+
+    def _is_boilerplate(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> bool:
+        if tag in SKIP_TAGS and not (tag in MAIN_CONTENT_TAGS and self._main_depth):
+            return True
+        for name, value in attrs:
+            if not value:
+                continue
+            if name == "role" and value.lower() in SKIP_ROLES:
+                return True
+            if name in ("class", "id") and _BOILERPLATE_RE.search(value):
+                return True
+            if name == "aria-hidden" and value.lower() == "true":
+                return True
+        return False
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if tag in VOID_TAGS:
+            if tag in BLOCK_TAGS and not self._skip_stack:
+                self._emit("\n")
+            return
+
+        if self._skip_stack or self._is_boilerplate(tag, attrs):
+            self._skip_stack.append(tag)
+            return
+
+        if tag in MAIN_TAGS:
+            self._main_depth += 1
+        if tag in BLOCK_TAGS:
+            self._emit("\n")
+
+    def handle_startendtag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if tag in BLOCK_TAGS and not self._skip_stack:
+            self._emit("\n")
+
+    def handle_endtag(self, tag: str) -> None:
+        if self._skip_stack:
+            # Tolerate unclosed children inside a skipped element
+            if tag in self._skip_stack:
+                while self._skip_stack and self._skip_stack.pop() != tag:
+                    pass
+            return
+
+        if tag in MAIN_TAGS and self._main_depth:
+            self._main_depth -= 1
+        if tag in BLOCK_TAGS:
+            self._emit("\n")
+
+    def handle_data(self, data: str) -> None:
+        if not self._skip_stack:
+            self._emit(data)
+
+    def _emit(self, text: str) -> None:
+        self._parts.append(text)
+        if self._main_depth:
+            self._main_parts.append(text)
+
+    @staticmethod
+    def _clean(parts: List[str]) -> str:
+        lines = (_SPACES_RE.sub(" ", line).strip() for line in "".join(parts).split("\n"))
+        return _BLANK_LINES_RE.sub("\n\n", "\n".join(lines)).strip()
+
+
+def extract_legal_text(chunks: Iterable[bytes], max_html_bytes: int = 5 * 1024 * 1024) -> Tuple[str, Dict[str, Any]]:
+    """
+    Extract legal text from an iterable of raw HTML byte chunks
+
+    Args:
+        chunks: Raw (or gzip-compressed) HTML bytes, e.g. a request stream
+        max_html_bytes: Limit on decompressed input size
+
+    Returns:
+        Tuple of (extracted text, extraction statistics)
+    """
+    extractor = LegalTextExtractor(max_html_bytes=max_html_bytes)
+    for chunk in chunks:
+        extractor.feed_bytes(chunk)
+    text = extractor.finish()
+    return text, extraction_stats(extractor, text)
+
+
+def extraction_stats(extractor: LegalTextExtractor, text: str) -> Dict[str, Any]:
+    """Before/after sizes and timing for one extraction"""
+    return {
+        "bytes_received": extractor.bytes_in,
+        "html_chars": extractor.html_chars,
+        "text_chars": len(text),
+        "reduction_percent": round(100 * (1 - len(text) / extractor.html_chars), 1) if extractor.html_chars else 0.0,
+        "extraction_ms": round(extractor.elapsed_ms, 2),
+    }
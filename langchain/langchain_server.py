@@ -3,17 +3,47 @@ Flask server for Terms & Conditions Analysis and Chatbot
 Uses NVIDIA's Nemotron model via LangChain
 """
 
-from flask import Flask, request, jsonify
+import time
+
+# Import time is measured from here (startup_stats)
+STARTUP_STARTED = time.perf_counter()
+
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
-from langchain_nvidia_ai_endpoints import ChatNVIDIA
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
 import os
+import re
 import json
 from dotenv import load_dotenv
-from typing import Dict, List, Any
+from typing import Dict, Iterator, List, Any, Optional, Tuple
 import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from analysis_cache import AnalysisCache, make_cache_key
+from clause_index import ClauseIndex
+from clause_salience import select_salient_text
+from document_chunks import merge_findings, merge_summaries, split_into_chunks
+from html_extract import ExtractionError, LegalTextExtractor, extraction_stats
+from metrics import (
+    CONTENT_TYPE_LATEST, HTTP_REQUEST_LATENCY, HTTP_REQUESTS_IN_FLIGHT, record_parse, record_route,
+    register_stats, render_metrics
+)
+from model_clients import LazyChatModel, client_stats, llm_backend, requires_api_key, warm_up
+from model_router import (
+    DEFAULT_SMALL_MODEL, LOW_CONFIDENCE_MARKER, analysis_rejection, chat_rejection, with_escalation_instruction
+)
+from rule_analyzer import detect_findings, summarize_findings
+from singleflight import SingleFlight
+from conversation_memory import ConversationSummarizer, format_transcript, recent_messages
+from conversation_store import ConversationStore
+from document_registry import DocumentRegistry
+from policy_versions import PolicyVersionStore, UpdatePlan
+from reasoning import ThinkFilter, reasoning_kwargs, strip_think
+from sqlite_store import (
+    SQLiteAnalysisTier, SQLiteConversationStore, SQLiteDatabase, SQLiteDocumentTier, SQLitePolicyTier
+)
+from stream_parser import IncrementalAnalysisParser
+from structured_output import analysis_response_format, repair_json
 
 # Load environment variables
 load_dotenv()
@@ -22,38 +52,365 @@ load_dotenv()
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend integration
 
-# Initialize the NVIDIA AI model
-llm = ChatNVIDIA(
-    model="nvidia/llama-3.3-nemotron-super-49b-v1.5",
-    api_key=os.getenv("NVIDIA_API_KEY"),
+MODEL_NAME = "nvidia/llama-3.3-nemotron-super-49b-v1.5"
+
+# Bump whenever the analysis prompts change so cached results are invalidated
+ANALYSIS_PROMPT_VERSION = "2"
+
+# Initialize the model (LLM_BACKEND=fake/record/replay for offline runs, see llm_backends.py).
+# The client is created on first use, or by warm_up() at boot (see model_clients.py)
+llm = LazyChatModel(
+    MODEL_NAME,
+    temperature=0.3,
+    top_p=0.9,
+    max_completion_tokens=4096,
+)
+
+# Tiered routing: chat answers, conversation summaries and first-pass analyses go
+# to a small model, escalated to MODEL_NAME when rejected (see model_router.py)
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "false").lower() in ("1", "true", "yes")
+SMALL_MODEL_NAME = os.getenv("SMALL_MODEL_NAME", DEFAULT_SMALL_MODEL)
+ROUTER_MIN_FINDINGS = int(os.getenv("ROUTER_MIN_FINDINGS", "3"))
+small_llm = LazyChatModel(
+    SMALL_MODEL_NAME,
     temperature=0.3,
     top_p=0.9,
     max_completion_tokens=4096,
+) if ROUTER_ENABLED else None
+
+# Create the model clients and prime the upstream connection at boot (WARMUP_PING:
+# one-token call per model); startup_stats records the seconds spent
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() in ("1", "true", "yes")
+WARMUP_PING = os.getenv("WARMUP_PING", "true").lower() in ("1", "true", "yes")
+startup_stats = {"import_seconds": 0.0, "warmup_seconds": 0.0}
+
+# Model part of the analysis cache key: routed results come from either tier
+ANALYSIS_MODEL_ID = f"{SMALL_MODEL_NAME}>{MODEL_NAME}" if ROUTER_ENABLED else MODEL_NAME
+
+# Storage backend for conversations and persisted analysis results:
+# "memory" (default, per process) or "sqlite" (survives restarts, shared by workers)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "memory")
+STORAGE_PATH = os.getenv(
+    "STORAGE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".data", "server.db")
+)
+CONVERSATION_IDLE_TTL = float(os.getenv("CONVERSATION_IDLE_TTL", str(60 * 60)))
+ANALYSIS_CACHE_TTL = float(os.getenv("ANALYSIS_CACHE_TTL", str(24 * 60 * 60)))
+
+sqlite_db = SQLiteDatabase(STORAGE_PATH) if STORAGE_BACKEND == "sqlite" else None
+
+# Store conversation history (bounded: idle TTL, LRU and byte-cap eviction)
+if sqlite_db is not None:
+    conversation_store = SQLiteConversationStore(
+        sqlite_db,
+        idle_ttl_seconds=CONVERSATION_IDLE_TTL,
+        max_messages=20,
+    )
+else:
+    conversation_store = ConversationStore(
+        max_conversations=int(os.getenv("CONVERSATION_MAX_ENTRIES", "10000")),
+        max_bytes=int(os.getenv("CONVERSATION_MAX_BYTES", str(64 * 1024 * 1024))),
+        idle_ttl_seconds=CONVERSATION_IDLE_TTL,
+        max_messages=20,  # Keep only last 20 messages (10 exchanges)
+    )
+
+# Chat memory: recent turns are replayed verbatim within a token budget and
+# older turns are folded into a running summary in the background
+MEMORY_HISTORY_TOKENS = int(os.getenv("MEMORY_HISTORY_TOKENS", "1000"))
+MEMORY_SUMMARY_ENABLED = os.getenv("MEMORY_SUMMARY_ENABLED", "true").lower() in ("1", "true", "yes")
+MEMORY_SUMMARY_CHARS = int(os.getenv("MEMORY_SUMMARY_CHARS", "1200"))
+conversation_summarizer = ConversationSummarizer(
+    conversation_store,
+    summarize=lambda summary, messages: summarize_conversation(summary, messages),
+    trigger_tokens=MEMORY_HISTORY_TOKENS,
+    keep_tokens=MEMORY_HISTORY_TOKENS // 2,
+)
+
+# Cache analysis results by document hash (set ANALYSIS_CACHE_DIR="" to disable the disk tier)
+analysis_cache = AnalysisCache(
+    max_entries=int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "512")),
+    max_bytes=int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+    ttl_seconds=ANALYSIS_CACHE_TTL,
+    disk_dir=os.getenv(
+        "ANALYSIS_CACHE_DIR",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), ".analysis_cache")
+    ) or None,
+    persistent_tier=SQLiteAnalysisTier(sqlite_db, ANALYSIS_CACHE_TTL) if sqlite_db is not None else None,
+)
+
+# Registered documents, referenced by content-hash ID instead of re-sending terms_data
+DOCUMENT_TTL = float(os.getenv("DOCUMENT_TTL", str(30 * 24 * 60 * 60)))
+document_registry = DocumentRegistry(
+    max_documents=int(os.getenv("DOCUMENT_MAX_ENTRIES", "1000")),
+    max_bytes=int(os.getenv("DOCUMENT_MAX_BYTES", str(64 * 1024 * 1024))),
+    persistent_tier=SQLiteDocumentTier(sqlite_db, DOCUMENT_TTL) if sqlite_db is not None else None,
+)
+
+# Clause hashes and per-segment findings of the last analyzed version of each URL
+POLICY_VERSION_TTL = float(os.getenv("POLICY_VERSION_TTL", str(30 * 24 * 60 * 60)))
+policy_versions = PolicyVersionStore(
+    max_urls=int(os.getenv("POLICY_VERSION_MAX_URLS", "1000")),
+    persistent_tier=SQLitePolicyTier(sqlite_db, POLICY_VERSION_TTL) if sqlite_db is not None else None,
 )
 
-# Store conversation history (in production, use Redis or database)
-conversation_store = {}
+# Coalesce concurrent analyses of the same document into one upstream call
+analysis_flight = SingleFlight()
+
+# Store sizes and counters exported on /metrics, read at scrape time
+stats_collector = register_stats({
+    "analysis_cache": lambda: analysis_cache.stats(),
+    "analysis_singleflight": lambda: analysis_flight.stats(),
+    "conversation_store": lambda: conversation_store.stats(),
+    "document_registry": lambda: document_registry.stats(),
+    "conversation_summarizer": lambda: conversation_summarizer.stats(),
+    "policy_versions": lambda: policy_versions.stats(),
+    "model_clients": client_stats,
+    "server_startup": lambda: startup_stats,
+})
+
+# Titles used by the placeholder results; these are never cached
+PLACEHOLDER_TITLES = {"Analysis Error", "Analysis Completed"}
+
+# Analysis modes: "single" reads the first 2000 characters in one call,
+# "chunked" analyzes the whole document in parallel chunks and merges the findings,
+# "fast" uses only the rule-based phrase scanner (no model call), and "hybrid"
+# answers with the rule result at once and refines it with the model in the background.
+# Incremental re-analysis is opt-in: "chunked" requests that also send a page
+# "url" re-analyze only the clauses that changed since that URL's last version.
+ANALYSIS_MODES = ("single", "chunked", "fast", "hybrid")
+ANALYSIS_MODE = os.getenv("ANALYSIS_MODE", "single")
+ANALYSIS_CHUNK_SIZE = int(os.getenv("ANALYSIS_CHUNK_SIZE", "2000"))
+ANALYSIS_MAX_CHUNKS = int(os.getenv("ANALYSIS_MAX_CHUNKS", "8"))
+ANALYSIS_MAX_CONCURRENCY = int(os.getenv("ANALYSIS_MAX_CONCURRENCY", "4"))
+ANALYSIS_MAX_FINDINGS = int(os.getenv("ANALYSIS_MAX_FINDINGS", "10"))
+
+# Batch analysis: documents per request, and the cap on the documents analyzed in parallel
+ANALYSIS_BATCH_MAX_DOCUMENTS = int(os.getenv("ANALYSIS_BATCH_MAX_DOCUMENTS", "20"))
+ANALYSIS_BATCH_MAX_CONCURRENCY = int(os.getenv("ANALYSIS_BATCH_MAX_CONCURRENCY", "8"))
+
+# Constrain the analysis output to the findings schema (response_format), and
+# recover malformed output locally instead of with a second, fallback model call
+STRUCTURED_OUTPUT_ENABLED = os.getenv("STRUCTURED_OUTPUT_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Model-side reasoning: "off" suppresses it where the model supports it (/no_think
+# on Nemotron), "on" requests it, "default" leaves the model's default
+REASONING_MODE = os.getenv("REASONING_MODE", "off")
+
+# Completion-token limit per kind of model call. Reasoning tokens count against
+# these limits, so raise them when running with REASONING_MODE=on.
+MAX_TOKENS = {
+    "analysis": int(os.getenv("MAX_TOKENS_ANALYSIS", "1536")),
+    "fallback": int(os.getenv("MAX_TOKENS_FALLBACK", "1024")),
+    "chat": int(os.getenv("MAX_TOKENS_CHAT", "1024")),
+    "summary": int(os.getenv("MAX_TOKENS_SUMMARY", "512")),
+}
+
+# Fill prompt budgets with the highest-risk clauses instead of the first N characters
+SALIENCE_ENABLED = os.getenv("SALIENCE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Chatbot context budget, and per-question clause retrieval for longer documents
+CHAT_CONTEXT_CHARS = int(os.getenv("CHAT_CONTEXT_CHARS", "3000"))
+RETRIEVAL_ENABLED = os.getenv("RETRIEVAL_ENABLED", "true").lower() in ("1", "true", "yes")
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "8"))
+
+# Raw HTML ingestion limits (decompressed size) and read size
+HTML_MAX_BYTES = int(os.getenv("HTML_MAX_BYTES", str(5 * 1024 * 1024)))
+HTML_READ_CHUNK = 64 * 1024
+
+# ============================================================================
+# MODEL CALLS
+# ============================================================================
+
+def call_options(kind: str) -> Dict[str, Any]:
+    """
+    Model call arguments for a kind of call (a key of MAX_TOKENS)
+    
+    Returns:
+        The completion-token limit, the reasoning switch and, for analysis
+        calls with structured output, the response schema
+    """
+    options = {"max_tokens": MAX_TOKENS[kind], **reasoning_kwargs(REASONING_MODE)}
+    if kind == "analysis" and STRUCTURED_OUTPUT_ENABLED:
+        options["response_format"] = analysis_response_format()
+    return options
+
+def warm_up_models(ping: bool = WARMUP_PING) -> None:
+    """Create the model clients before the first request (see WARMUP_ENABLED)"""
+    started = time.perf_counter()
+    for model, seconds in warm_up([llm, small_llm] if small_llm is not None else [llm], ping).items():
+        print(f"Warmed up {model} in {seconds * 1000:.0f}ms")
+    startup_stats["warmup_seconds"] = round(time.perf_counter() - started, 3)
+
+def visible_text(response: Any) -> str:
+    """Text of a model response without leaked <think> blocks"""
+    return strip_think(response.content).strip()
+
+def visible_stream(chunks: Iterator[Any]) -> Iterator[str]:
+    """Text of streamed model chunks without <think> blocks"""
+    think_filter = ThinkFilter()
+    for chunk in chunks:
+        text = think_filter.feed(chunk.content)
+        if text:
+            yield text
+    text = think_filter.flush()
+    if text:
+        yield text
+
+def small_model_analyses(messages: List[List[Any]], texts: List[str],
+                         max_concurrency: int, min_findings: int) -> List[Optional[Dict[str, Any]]]:
+    """
+    First-pass analyses on the small model
+    
+    Args:
+        messages: Analysis prompt per text
+        texts: The analyzed texts, checked against the rule scan
+        max_concurrency: Upstream calls in flight at once
+        min_findings: Fewest findings accepted (0 for chunks and segments)
+        
+    Returns:
+        Parsed result per text, None where it must be escalated to the large model
+    """
+    responses = small_llm.batch(
+        messages,
+        config={"max_concurrency": max_concurrency},
+        return_exceptions=True,
+        **call_options("analysis")
+    )
+    results = []
+    for response, text in zip(responses, texts):
+        if isinstance(response, Exception):
+            print(f"Small Model Error: {response}")
+            result, reason = None, "error"
+        else:
+            result = parse_analysis_response(visible_text(response))
+            reason = analysis_rejection(result, text, min_findings)
+        record_route("analysis", reason)
+        results.append(None if reason else result)
+    return results
+
+def chat_answer(messages: List[Any]) -> str:
+    """Chat answer from the small model, or from the large model if it was escalated"""
+    if small_llm is not None:
+        try:
+            answer = visible_text(small_llm.invoke(with_escalation_instruction(messages), **call_options("chat")))
+            reason = chat_rejection(answer)
+        except Exception as e:
+            print(f"Small Model Error: {e}")
+            reason = "error"
+        record_route("chat", reason)
+        if reason is None:
+            return answer
+    
+    return visible_text(llm.invoke(messages, **call_options("chat")))
+
+def stream_chat_answer(messages: List[Any]) -> Iterator[str]:
+    """
+    Streaming version of chat_answer
+    
+    The small model's first characters are held back until they show whether
+    the answer is the low-confidence marker; the rest streams as it arrives.
+    """
+    if small_llm is not None:
+        head = ""
+        stream = visible_stream(small_llm.stream(with_escalation_instruction(messages), **call_options("chat")))
+        try:
+            for text in stream:
+                head += text
+                # One character past the marker shows whether it is the whole word
+                if len(head.lstrip()) > len(LOW_CONFIDENCE_MARKER):
+                    break
+            reason = chat_rejection(head)
+        except Exception as e:
+            print(f"Small Model Error: {e}")
+            reason = "error"
+        record_route("chat", reason)
+        if reason is None:
+            yield head
+            yield from stream
+            return
+        stream.close()
+    
+    yield from visible_stream(llm.stream(messages, **call_options("chat")))
+
+# ============================================================================
+# DOCUMENT REGISTRY
+# ============================================================================
+
+def resolve_document(data: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Resolve the document a request refers to
+    
+    Requests carry either the full terms_data or a document_id returned by
+    POST /api/documents (or /api/analyze). Inline terms_data is registered,
+    so later calls can switch to the ID.
+    
+    Args:
+        data: Parsed request body
+        
+    Returns:
+        Tuple of (terms text, document ID). The text is None for an unknown
+        ID, and both are empty when the request has neither field.
+    """
+    document_id = data.get('document_id')
+    if document_id:
+        return document_registry.get(document_id), document_id
+    
+    terms_data = data.get('terms_data', '')
+    if not terms_data:
+        return '', None
+    
+    document_id, _ = document_registry.register(terms_data)
+    return terms_data, document_id
+
+def document_error(terms_data: Optional[str], document_id: Optional[str]) -> Optional[Tuple[str, int]]:
+    """
+    Validate the result of resolve_document
+    
+    Returns:
+        (error message, HTTP status) if the request has no usable document,
+        otherwise None
+    """
+    if terms_data is None:
+        return f"Unknown document_id: {document_id} (register it with POST /api/documents)", 404
+    if not terms_data:
+        return "terms_data or document_id is required", 400
+    return None
 
 # ============================================================================
 # WORKFLOW 1: ANALYZER
 # ============================================================================
 
-def analyze_terms_and_conditions(terms_data: str) -> Dict[str, Any]:
+def select_prompt_text(terms_data: str, max_chars: int) -> str:
     """
-    Analyze terms and conditions, generate flags and calculate score
+    Choose which part of the document goes into a prompt
     
     Args:
-        terms_data: The terms and conditions text to analyze
+        terms_data: The terms and conditions text
+        max_chars: Prompt budget in characters
         
     Returns:
-        Dictionary with score, summary, and items
+        The most relevant clauses within the budget (or the first max_chars
+        characters when salience selection is disabled)
     """
+    if SALIENCE_ENABLED:
+        return select_salient_text(terms_data, max_chars)
+    return terms_data[:max_chars]
+
+def build_analysis_messages(terms_data: str, max_chars: int = 2000) -> List[Any]:
+    """
+    Build the prompt for the JSON analysis call
     
-    # Step 1: Generate comprehensive analysis with flags
+    Args:
+        terms_data: The terms and conditions text to analyze
+        max_chars: Number of characters of the text to include
+        
+    Returns:
+        List of messages for the model
+    """
     analysis_prompt = f"""Analyze these terms and conditions. Provide ONLY the final JSON output. Do NOT include your thinking process, reasoning, or any text before or after the JSON.
 
 TERMS:
-{terms_data[:2000]}
+{select_prompt_text(terms_data, max_chars)}
 
 Output format (ONLY this, nothing else):
 {{
@@ -82,89 +439,167 @@ Categories:
 
 IMPORTANT: Output ONLY the JSON object. No markdown, no explanations, no thinking process, no notes."""
 
-    messages = [
+    return [
         SystemMessage(content="You are a JSON-only response bot. Output ONLY valid JSON. Never include reasoning, thinking, or explanations. Just the raw JSON object."),
         HumanMessage(content=analysis_prompt)
     ]
+
+def format_finding(finding: Any) -> Optional[Dict[str, Any]]:
+    """
+    Validate one finding from the model and format it as an item
     
-    try:
-        response = llm.invoke(messages)
-        response_text = response.content.strip()
+    Returns:
+        The item, or None if required fields are missing
+    """
+    if isinstance(finding, dict) and "title" in finding and "description" in finding and "flag" in finding:
+        return {
+            "title": finding["title"],
+            "description": finding["description"],
+            "flag": finding["flag"],
+            "category": finding.get("category", "general")
+        }
+    return None
+
+def parse_analysis_response(response_text: str) -> Optional[Dict[str, Any]]:
+    """
+    Parse the model's JSON analysis into a scored result
+    
+    Args:
+        response_text: Raw model output
         
-        print(f"Raw response: {response_text[:200]}...")  # Debug
+    Returns:
+        Dictionary with score, summary, and items, or None if the output
+        could not be parsed and the fallback analysis should be used
+    """
+    print(f"Raw response: {response_text[:200]}...")  # Debug
+    
+    # Try multiple parsing strategies
+    # Strategy 1: Direct parse
+    strategy = "direct"
+    raw_text = response_text
+    try:
+        analysis_data = json.loads(response_text)
+    except json.JSONDecodeError:
+        strategy = "code_fence"
+        # Strategy 2: Remove markdown code blocks
+        if "```" in response_text:
+            # Extract content between code blocks
+            json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', response_text, re.DOTALL)
+            if json_match:
+                response_text = json_match.group(1)
+            else:
+                # Try to find any JSON object
+                json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
+                if json_match:
+                    response_text = json_match.group(0)
         
-        # Try multiple parsing strategies
-        # Strategy 1: Direct parse
+        # Try parsing again
         try:
             analysis_data = json.loads(response_text)
         except json.JSONDecodeError:
-            # Strategy 2: Remove markdown code blocks
-            if "```" in response_text:
-                # Extract content between code blocks
-                import re
-                json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', response_text, re.DOTALL)
-                if json_match:
-                    response_text = json_match.group(1)
-                else:
-                    # Try to find any JSON object
-                    json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-                    if json_match:
-                        response_text = json_match.group(0)
-            
-            # Try parsing again
-            try:
-                analysis_data = json.loads(response_text)
-            except json.JSONDecodeError:
-                # Strategy 3: Use fallback structure
+            # Strategy 3: Repair locally (leading prose, trailing commas, output cut off mid-object)
+            strategy = "repaired"
+            analysis_data = repair_json(raw_text)
+            if analysis_data is None:
+                # Strategy 4: Use fallback structure
                 print(f"Could not parse JSON. Using fallback with text analysis.")
-                return fallback_analysis(terms_data, response_text)
-        
-        # Validate structure
-        if not isinstance(analysis_data, dict) or "findings" not in analysis_data:
-            print("Invalid structure. Using fallback.")
-            return fallback_analysis(terms_data, response_text)
-        
-        # Get summary
-        summary = analysis_data.get("summary", "Analysis of the provided terms and conditions.")
+                return None
+    
+    # Validate structure
+    if not isinstance(analysis_data, dict) or "findings" not in analysis_data:
+        print("Invalid structure. Using fallback.")
+        return None
+    
+    # Get summary
+    summary = analysis_data.get("summary", "Analysis of the provided terms and conditions.")
+    
+    # Get all findings
+    findings = analysis_data.get("findings", [])
+    
+    # Validate and format findings as items
+    items = [item for item in map(format_finding, findings) if item is not None]
+    if strategy == "repaired" and not items:
+        print("Repaired output has no complete findings. Using fallback.")
+        return None
+    
+    # Calculate score based on flags
+    score = calculate_score(items)
+    record_parse(strategy)
+    
+    return {
+        "score": score,
+        "summary": summary,
+        "items": items
+    }
+
+def analyze_terms_and_conditions(terms_data: str) -> Dict[str, Any]:
+    """
+    Analyze terms and conditions, generate flags and calculate score
+    
+    Args:
+        terms_data: The terms and conditions text to analyze
         
-        # Get all findings
-        findings = analysis_data.get("findings", [])
+    Returns:
+        Dictionary with score, summary, and items
+    """
+    
+    # Step 1: Generate comprehensive analysis with flags
+    messages = build_analysis_messages(terms_data)
+    
+    try:
+        if small_llm is not None:
+            result = small_model_analyses([messages], [terms_data], 1, ROUTER_MIN_FINDINGS)[0]
+            if result is not None:
+                return result
         
-        # Validate and format findings as items
-        items = []
-        for finding in findings:
-            if isinstance(finding, dict) and "title" in finding and "description" in finding and "flag" in finding:
-                items.append({
-                    "title": finding["title"],
-                    "description": finding["description"],
-                    "flag": finding["flag"],
-                    "category": finding.get("category", "general")
-                })
+        response = llm.invoke(messages, **call_options("analysis"))
+        response_text = visible_text(response)
         
-        # Calculate score based on flags
-        score = calculate_score(items)
+        result = parse_analysis_response(response_text)
+        if result is None:
+            return recover_analysis(terms_data, response_text)
         
-        return {
-            "score": score,
-            "summary": summary,
-            "items": items
-        }
+        return result
         
     except Exception as e:
         print(f"Analysis Error: {e}")
-        return fallback_analysis(terms_data, str(e))
+        return mark_degraded(recover_analysis(terms_data, str(e)))
 
-def fallback_analysis(terms_data: str, error_info: str = "") -> Dict[str, Any]:
+def mark_degraded(result: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Fallback analysis using simpler prompts when JSON parsing fails
+    Flag a result recovered after a failed model call
+    
+    Degraded results are returned but never cached, so the next request for
+    the document tries the model again (as analyze_texts_batched does by
+    leaving failed calls as None).
     """
-    print("Using fallback analysis method...")
+    return {**result, "degraded": True}
+
+def recover_analysis(terms_data: str, error_info: str = "") -> Dict[str, Any]:
+    """
+    Result for an analysis whose output could not be used
     
-    # Generate simpler, more structured analysis
+    With structured output this stays local: the rule-based scan of the
+    document, with no second model call. Otherwise the fallback prompt is sent.
+    """
+    if STRUCTURED_OUTPUT_ENABLED:
+        return local_analysis(terms_data)
+    return fallback_analysis(terms_data, error_info)
+
+def local_analysis(terms_data: str) -> Dict[str, Any]:
+    """Rule-based result standing in for unusable model output"""
+    print("Using rule-based analysis for unusable model output...")
+    record_parse("rules")
+    return rule_analysis(terms_data)
+
+def build_fallback_messages(terms_data: str, max_chars: int = 2000) -> List[Any]:
+    """
+    Build the simpler, line-oriented prompt used when JSON parsing fails
+    """
     simple_prompt = f"""Analyze these terms and conditions and provide ONLY the final analysis in a clear, structured format.
 
 TERMS:
-{terms_data[:2000]}
+{select_prompt_text(terms_data, max_chars)}
 
 Provide your analysis in this exact format:
 
@@ -187,118 +622,376 @@ CATEGORY: [privacy/payment/security/liability/usage/legal]
 
 Provide 3-5 findings. Be direct and concise. Do not include your thinking process or notes."""
 
-    try:
-        response = llm.invoke([
-            SystemMessage(content="You are a legal analyst. Provide only the final analysis, no internal reasoning or notes."),
-            HumanMessage(content=simple_prompt)
-        ])
-        
-        analysis_text = response.content.strip()
-        
-        # Parse structured format
-        items = []
-        summary = "Analysis of the provided terms and conditions."
-        
-        # Extract summary
-        summary_match = analysis_text.split("SUMMARY:")
-        if len(summary_match) > 1:
-            summary_text = summary_match[1].split("FINDING")[0].strip()
-            summary = summary_text[:500] if len(summary_text) > 500 else summary_text
-        
-        # Extract findings
-        import re
-        finding_pattern = r'FINDING \d+:\s*([^\n]+)\s*\n(.*?)\s*FLAG:\s*(critical|warning|good)\s*(?:CATEGORY:\s*([^\n]+))?'
-        findings = re.findall(finding_pattern, analysis_text, re.DOTALL | re.IGNORECASE)
+    return [
+        SystemMessage(content="You are a legal analyst. Provide only the final analysis, no internal reasoning or notes."),
+        HumanMessage(content=simple_prompt)
+    ]
+
+def parse_fallback_response(analysis_text: str) -> Dict[str, Any]:
+    """
+    Parse the structured-text fallback format into a scored result
+    
+    Args:
+        analysis_text: Raw model output in SUMMARY/FINDING/FLAG format
         
-        for title, content, flag, category in findings:
-            items.append({
-                "title": title.strip(),
-                "description": content.strip()[:500] if len(content.strip()) > 500 else content.strip(),
-                "flag": flag.lower(),
-                "category": category.strip().lower() if category else "general"
-            })
+    Returns:
+        Dictionary with score, summary, and items
+    """
+    # Parse structured format
+    items = []
+    summary = "Analysis of the provided terms and conditions."
+    
+    # Extract summary
+    summary_match = analysis_text.split("SUMMARY:")
+    if len(summary_match) > 1:
+        summary_text = summary_match[1].split("FINDING")[0].strip()
+        summary = summary_text[:500] if len(summary_text) > 500 else summary_text
+    
+    # Extract findings
+    finding_pattern = r'FINDING \d+:\s*([^\n]+)\s*\n(.*?)\s*FLAG:\s*(critical|warning|good)\s*(?:CATEGORY:\s*([^\n]+))?'
+    findings = re.findall(finding_pattern, analysis_text, re.DOTALL | re.IGNORECASE)
+    
+    for title, content, flag, category in findings:
+        items.append({
+            "title": title.strip(),
+            "description": content.strip()[:500] if len(content.strip()) > 500 else content.strip(),
+            "flag": flag.lower(),
+            "category": category.strip().lower() if category else "general"
+        })
+    
+    strategy = "fallback_regex"
+    
+    # If regex didn't work, try simple line-by-line parsing
+    if len(items) == 0:
+        print("Regex parsing failed, using simple parsing...")
+        strategy = "line_parser"
+        lines = analysis_text.split('\n')
+        current_title = None
+        current_content = []
+        current_flag = "warning"
+        current_category = "general"
         
-        # If regex didn't work, try simple line-by-line parsing
-        if len(items) == 0:
-            print("Regex parsing failed, using simple parsing...")
-            lines = analysis_text.split('\n')
-            current_title = None
-            current_content = []
-            current_flag = "warning"
-            current_category = "general"
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith("SUMMARY"):
+                continue
             
-            for line in lines:
-                line = line.strip()
-                if not line or line.startswith("SUMMARY"):
-                    continue
-                
-                if line.startswith("FINDING"):
-                    # Save previous finding
-                    if current_title:
-                        items.append({
-                            "title": current_title,
-                            "description": ' '.join(current_content)[:500],
-                            "flag": current_flag,
-                            "category": current_category
-                        })
-                    current_title = line.split(":", 1)[1].strip() if ":" in line else line
-                    current_content = []
+            if line.startswith("FINDING"):
+                # Save previous finding
+                if current_title:
+                    items.append({
+                        "title": current_title,
+                        "description": ' '.join(current_content)[:500],
+                        "flag": current_flag,
+                        "category": current_category
+                    })
+                current_title = line.split(":", 1)[1].strip() if ":" in line else line
+                current_content = []
+                current_flag = "warning"
+                current_category = "general"
+            elif line.startswith("FLAG:"):
+                flag_text = line.split(":", 1)[1].strip().lower()
+                if "critical" in flag_text:
+                    current_flag = "critical"
+                elif "good" in flag_text:
+                    current_flag = "good"
+                else:
                     current_flag = "warning"
-                    current_category = "general"
-                elif line.startswith("FLAG:"):
-                    flag_text = line.split(":", 1)[1].strip().lower()
-                    if "critical" in flag_text:
-                        current_flag = "critical"
-                    elif "good" in flag_text:
-                        current_flag = "good"
-                    else:
-                        current_flag = "warning"
-                elif line.startswith("CATEGORY:"):
-                    current_category = line.split(":", 1)[1].strip().lower()
-                elif current_title:
-                    current_content.append(line)
-            
-            # Add last finding
-            if current_title:
-                items.append({
-                    "title": current_title,
-                    "description": ' '.join(current_content)[:500],
-                    "flag": current_flag,
-                    "category": current_category
-                })
-        
-        # Ensure we have at least some findings
-        if len(items) == 0:
+            elif line.startswith("CATEGORY:"):
+                current_category = line.split(":", 1)[1].strip().lower()
+            elif current_title:
+                current_content.append(line)
+        
+        # Add last finding
+        if current_title:
             items.append({
-                "title": "Analysis Completed",
-                "description": "The terms have been reviewed. Please check the full response for details.",
+                "title": current_title,
+                "description": ' '.join(current_content)[:500],
+                "flag": current_flag,
+                "category": current_category
+            })
+    
+    # Ensure we have at least some findings
+    if len(items) == 0:
+        strategy = "placeholder"
+        items.append({
+            "title": "Analysis Completed",
+            "description": "The terms have been reviewed. Please check the full response for details.",
+            "flag": "warning",
+            "category": "general"
+        })
+    
+    # Calculate score
+    score = calculate_score(items)
+    record_parse(strategy)
+    
+    return {
+        "score": score,
+        "summary": summary,
+        "items": items
+    }
+
+def analysis_error_result() -> Dict[str, Any]:
+    """Result returned when both the analysis and its fallback fail"""
+    record_parse("error")
+    return {
+        "score": 50,
+        "summary": "Unable to analyze the terms. Please try again or check the server logs.",
+        "items": [
+            {
+                "title": "Analysis Error",
+                "description": "An error occurred during analysis. Please try again.",
                 "flag": "warning",
                 "category": "general"
-            })
-        
-        # Calculate score
-        score = calculate_score(items)
-        
-        return {
-            "score": score,
-            "summary": summary,
-            "items": items
-        }
+            }
+        ]
+    }
+
+def fallback_analysis(terms_data: str, error_info: str = "") -> Dict[str, Any]:
+    """
+    Fallback analysis using simpler prompts when JSON parsing fails
+    """
+    print("Using fallback analysis method...")
+    
+    # Generate simpler, more structured analysis
+    try:
+        response = llm.invoke(build_fallback_messages(terms_data), **call_options("fallback"))
+        return parse_fallback_response(visible_text(response))
         
     except Exception as e:
         print(f"Fallback error: {e}")
-        return {
-            "score": 50,
-            "summary": "Unable to analyze the terms. Please try again or check the server logs.",
-            "items": [
-                {
-                    "title": "Analysis Error",
-                    "description": "An error occurred during analysis. Please try again.",
-                    "flag": "warning",
-                    "category": "general"
-                }
-            ]
-        }
+        return analysis_error_result()
+
+def parse_chunk_responses(responses: List[Any]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Parse batched analysis responses
+    
+    Args:
+        responses: Model responses (or exceptions) in request order
+        
+    Returns:
+        Parsed result per response, None where it needs the fallback
+    """
+    results = []
+    for response in responses:
+        if isinstance(response, Exception):
+            print(f"Batch Analysis Error: {response}")
+            results.append(None)
+        else:
+            results.append(parse_analysis_response(visible_text(response)))
+    return results
+
+def merge_chunk_results(results: List[Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Reduce per-chunk results into one deduplicated, rescored result
+    """
+    results = [r for r in results if r is not None]
+    
+    findings = [
+        item
+        for result in results
+        for item in result["items"]
+        if item.get("title") not in PLACEHOLDER_TITLES
+    ]
+    
+    if not findings:
+        return analysis_error_result()
+    
+    items = merge_findings(findings, ANALYSIS_MAX_FINDINGS)
+    
+    return {
+        "score": calculate_score(items),
+        "summary": merge_summaries([r.get("summary") for r in results]),
+        "items": items
+    }
+
+def analyze_terms_chunked(terms_data: str) -> Dict[str, Any]:
+    """
+    Map-reduce analysis of the full document
+    
+    The document is split into chunks that are analyzed concurrently with
+    llm.batch; chunks whose output does not parse get one batched fallback
+    pass (or a local rule-based scan with structured output), then the
+    findings are merged and deduplicated before scoring.
+    
+    Args:
+        terms_data: The terms and conditions text to analyze
+        
+    Returns:
+        Dictionary with score, summary, and items
+    """
+    chunks = split_into_chunks(terms_data, ANALYSIS_CHUNK_SIZE, ANALYSIS_MAX_CHUNKS)
+    if len(chunks) <= 1:
+        return analyze_terms_and_conditions(terms_data)
+    
+    results = analyze_texts_batched(chunks, ANALYSIS_MAX_CONCURRENCY)
+    return merge_chunk_results(results)
+
+def analyze_texts_batched(texts: List[str], max_concurrency: int, max_chars: Optional[int] = None,
+                          min_findings: int = 0) -> List[Optional[Dict[str, Any]]]:
+    """
+    Analyze several texts in one llm.batch call
+    
+    With routing, the texts go to the small model first and only the
+    rejected ones to the large model. Texts whose output does not parse get
+    one batched fallback pass, or a local rule-based scan when structured
+    output is enabled.
+    
+    Args:
+        texts: Texts to analyze (document chunks or whole documents)
+        max_concurrency: Upstream calls in flight at once
+        max_chars: Prompt budget per text (None sends each text whole)
+        min_findings: Fewest findings a small-model result needs; leave 0 for
+            chunks and segments, which may hold no notable clause at all
+        
+    Returns:
+        Parsed result per text, None where the analysis failed
+    """
+    config = {"max_concurrency": max_concurrency}
+    messages = [build_analysis_messages(text, max_chars=max_chars or len(text)) for text in texts]
+    results: List[Optional[Dict[str, Any]]] = [None] * len(texts)
+    pending = list(range(len(texts)))
+    
+    if small_llm is not None:
+        results = small_model_analyses(messages, texts, max_concurrency, min_findings)
+        pending = [i for i, result in enumerate(results) if result is None]
+        if not pending:
+            return results
+    
+    responses = llm.batch(
+        [messages[i] for i in pending],
+        config=config,
+        return_exceptions=True,
+        **call_options("analysis")
+    )
+    for i, result in zip(pending, parse_chunk_responses(responses)):
+        results[i] = result
+    errors = {i for i, response in zip(pending, responses) if isinstance(response, Exception)}
+    
+    failed = [i for i in pending if results[i] is None]
+    if failed and STRUCTURED_OUTPUT_ENABLED:
+        # No second model call; failed upstream calls stay None so they are retried later
+        for i in failed:
+            if i not in errors:
+                results[i] = local_analysis(texts[i])
+    elif failed:
+        print(f"Using fallback analysis for {len(failed)} of {len(texts)} texts...")
+        fallback_responses = llm.batch(
+            [build_fallback_messages(texts[i], max_chars=max_chars or len(texts[i])) for i in failed],
+            config=config,
+            return_exceptions=True,
+            **call_options("fallback")
+        )
+        for i, response in zip(failed, fallback_responses):
+            if not isinstance(response, Exception):
+                results[i] = parse_fallback_response(visible_text(response))
+    
+    return results
+
+def incremental_analysis(terms_data: str, url: str) -> Dict[str, Any]:
+    """
+    Whole-document analysis that reuses the findings of unchanged clauses
+    
+    The document's clauses are compared with the last version analyzed for
+    url. Segments whose clauses are all unchanged keep their findings, and
+    only the added or edited clauses are sent to the model before the
+    findings are merged and rescored. The first version of a URL costs the
+    same as a chunked analysis.
+    
+    Args:
+        terms_data: The terms and conditions text to analyze
+        url: Page the document was taken from
+        
+    Returns:
+        Dictionary with score, summary, and items
+    """
+    plan = policy_versions.plan(url, terms_data, incremental_segment_chars(terms_data))
+    if plan.empty:
+        return analyze_terms_chunked(terms_data)
+    
+    texts = plan.texts()
+    results = analyze_texts_batched(texts, ANALYSIS_MAX_CONCURRENCY) if texts else []
+    return finish_incremental_analysis(url, plan, results)
+
+def incremental_segment_chars(terms_data: str) -> int:
+    """Segment size for incremental analysis (chunk size, raised for very long documents)"""
+    return max(ANALYSIS_CHUNK_SIZE, -(-len(terms_data) // ANALYSIS_MAX_CHUNKS))
+
+def finish_incremental_analysis(url: str, plan: UpdatePlan,
+                                results: List[Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Store the new version of url and merge reused and fresh segment findings"""
+    results = [None if result is None or is_placeholder_result(result) else result for result in results]
+    record, segment_results = plan.complete(results)
+    policy_versions.update(url, plan, record)
+    print(f"Incremental analysis of {url}: reused {plan.reused_clauses} clauses, "
+          f"analyzed {plan.analyzed_clauses} in {len(plan.groups)} calls")
+    return merge_chunk_results(segment_results)
+
+def analysis_mode(data: Dict[str, Any], default: Optional[str] = None) -> str:
+    """
+    Requested analysis mode
+    
+    Falls back to default, then to ANALYSIS_MODE. A url alone does not change
+    the mode; incremental re-analysis needs an explicit "chunked".
+    """
+    return data.get('mode') or default or ANALYSIS_MODE
+
+def policy_url(data: Dict[str, Any]) -> Optional[str]:
+    """
+    Page URL sent with an analysis request, if any
+    
+    Raises:
+        ValueError: If url is not a string
+    """
+    url = data.get('url')
+    if url is None or url == "":
+        return None
+    if not isinstance(url, str):
+        raise ValueError("url must be a string")
+    return url
+
+def run_analysis(terms_data: str, mode: str = ANALYSIS_MODE) -> Dict[str, Any]:
+    """Dispatch to the analyzer for the requested mode"""
+    if mode == "chunked":
+        return analyze_terms_chunked(terms_data)
+    if mode == "fast":
+        return rule_analysis(terms_data)
+    return analyze_terms_and_conditions(terms_data)
+
+def rule_analysis(terms_data: str) -> Dict[str, Any]:
+    """
+    LLM-free analysis with the rule-based phrase scanner (milliseconds)
+    
+    Returns:
+        Dictionary with score, summary, and items
+    """
+    items = detect_findings(terms_data)
+    return {
+        "score": calculate_score(items),
+        "summary": summarize_findings(items),
+        "items": items
+    }
+
+def refine_rule_result(rule_result: Dict[str, Any], llm_result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Refine a rule-based result with the model's analysis
+    
+    The model's summary replaces the rule summary and its findings are merged
+    with the rule findings (duplicates collapse, the more severe flag wins).
+    
+    Returns:
+        The refined result, or None if the model analysis failed
+    """
+    if is_placeholder_result(llm_result) or llm_result.get("degraded"):
+        return None
+    
+    items = merge_findings(llm_result["items"] + rule_result["items"], ANALYSIS_MAX_FINDINGS)
+    return {
+        "score": calculate_score(items),
+        "summary": llm_result["summary"],
+        "items": items,
+        "refined": True
+    }
 
 def calculate_score(findings: List[Dict[str, str]]) -> int:
     """
@@ -328,35 +1021,391 @@ def calculate_score(findings: List[Dict[str, str]]) -> int:
     
     return score
 
+def cached_analysis(terms_data: str, mode: str = ANALYSIS_MODE,
+                    url: Optional[str] = None) -> Tuple[Dict[str, Any], bool]:
+    """
+    Analyze terms and conditions, reusing a cached result for identical documents
+    
+    Concurrent misses for the same document share a single analysis.
+    
+    Args:
+        terms_data: The terms and conditions text to analyze
+        mode: Analysis mode, one of ANALYSIS_MODES
+        url: Page the document came from; with mode "chunked", a changed
+            document is re-analyzed incrementally against that URL's last version
+        
+    Returns:
+        Tuple of (analysis result, whether it came from the cache)
+    """
+    # Rule scans take milliseconds, so they are not cached
+    if mode == "fast":
+        return rule_analysis(terms_data), False
+    if mode == "hybrid":
+        return hybrid_analysis(terms_data)
+    
+    cache_key = analysis_cache_key(terms_data, mode, url)
+    
+    cached = analysis_cache.get(cache_key)
+    if cached is not None:
+        return cached, True
+    
+    def analyze_once() -> Dict[str, Any]:
+        # A call that just finished may have filled the cache after our lookup
+        cached = analysis_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        if url and mode == "chunked":
+            result = incremental_analysis(terms_data, url)
+        else:
+            result = run_analysis(terms_data, mode)
+        cache_result(cache_key, result)
+        return result
+    
+    result, shared = analysis_flight.do(cache_key, analyze_once)
+    if shared:
+        print(f"Coalesced duplicate analysis {cache_key[:12]}")
+    
+    return result, False
+
+def analysis_cache_key(terms_data: str, mode: str, url: Optional[str] = None) -> str:
+    """
+    Cache key for a document analyzed with the current model and prompts
+    
+    Chunked analyses with a url are keyed by the url too: a hit skips
+    incremental_analysis, so identical text served from a new url must miss
+    once for that url's version to be recorded.
+    """
+    if url and mode == "chunked":
+        return make_cache_key(terms_data, ANALYSIS_MODEL_ID, ANALYSIS_PROMPT_VERSION, mode, url)
+    return make_cache_key(terms_data, ANALYSIS_MODEL_ID, ANALYSIS_PROMPT_VERSION, mode)
+
+def cache_result(cache_key: str, result: Dict[str, Any]) -> None:
+    """Store an analysis result, except error placeholders and degraded results"""
+    if not is_placeholder_result(result) and not result.get("degraded"):
+        analysis_cache.set(cache_key, result)
+
+def is_placeholder_result(result: Dict[str, Any]) -> bool:
+    """True for the error/fallback placeholder results"""
+    return any(item.get("title") in PLACEHOLDER_TITLES for item in result.get("items", []))
+
+# Background model refinements for hybrid mode, keyed by hybrid cache key
+refinement_executor = ThreadPoolExecutor(max_workers=ANALYSIS_MAX_CONCURRENCY, thread_name_prefix="refine")
+pending_refinements = set()
+refinement_lock = threading.Lock()
+
+def hybrid_analysis(terms_data: str) -> Tuple[Dict[str, Any], bool]:
+    """
+    Rule-based result now, model-refined result once it is ready
+    
+    The first request for a document returns the rule result with
+    "refined": false and queues the model analysis in the background; later
+    requests get the cached refined result ("refined": true).
+    
+    Returns:
+        Tuple of (analysis result, whether it came from the cache)
+    """
+    hybrid_key = analysis_cache_key(terms_data, "hybrid")
+    
+    cached = analysis_cache.get(hybrid_key)
+    if cached is not None:
+        return cached, True
+    
+    with refinement_lock:
+        queued = hybrid_key not in pending_refinements
+        pending_refinements.add(hybrid_key)
+    if queued:
+        refinement_executor.submit(refine_in_background, terms_data, hybrid_key)
+    
+    return {**rule_analysis(terms_data), "refined": False}, False
+
+def refine_in_background(terms_data: str, hybrid_key: str) -> None:
+    """Run the model analysis for a hybrid request and cache the refined result"""
+    try:
+        llm_result, _ = cached_analysis(terms_data, "single")
+        refined = refine_rule_result(rule_analysis(terms_data), llm_result)
+        if refined is not None:
+            cache_result(hybrid_key, refined)
+    except Exception as e:
+        print(f"Refinement Error: {e}")
+    finally:
+        with refinement_lock:
+            pending_refinements.discard(hybrid_key)
+
+def plan_batch(documents: List[Any], default_mode: Optional[str]) -> Tuple[List[Dict[str, Any]], Dict[str, Tuple[str, str, Optional[str]]]]:
+    """
+    Validate the documents of a batch request and deduplicate them
+    
+    Documents with the same text and mode share one cache key, so each is
+    analyzed once however many times it appears in the batch.
+    
+    Args:
+        documents: Request items, each {"terms_data" or "document_id", "mode",
+            "url"} or a plain terms string
+        default_mode: Mode for items that do not set one
+        
+    Returns:
+        Tuple of (one entry per item in request order, holding either its
+        cache key or an error, and the unique jobs as cache key -> (terms, mode, url))
+    """
+    entries = []
+    jobs: Dict[str, Tuple[str, str, Optional[str]]] = {}
+    
+    for index, item in enumerate(documents):
+        if isinstance(item, str):
+            item = {"terms_data": item}
+        if not isinstance(item, dict):
+            entries.append({"index": index, "error": "Each document must be an object or a string", "status": 400})
+            continue
+        
+        terms_data, document_id = resolve_document(item)
+        error = document_error(terms_data, document_id)
+        if error:
+            entries.append({"index": index, "error": error[0], "status": error[1]})
+            continue
+        
+        mode = analysis_mode(item, default_mode)
+        if mode not in ANALYSIS_MODES:
+            entries.append({
+                "index": index,
+                "error": f"mode must be one of: {', '.join(ANALYSIS_MODES)}",
+                "status": 400
+            })
+            continue
+        
+        try:
+            url = policy_url(item)
+        except ValueError as e:
+            entries.append({"index": index, "error": str(e), "status": 400})
+            continue
+        
+        cache_key = analysis_cache_key(terms_data, mode, url)
+        jobs.setdefault(cache_key, (terms_data, mode, url))
+        entries.append({"index": index, "document_id": document_id, "cache_key": cache_key})
+    
+    return entries, jobs
+
+def batch_analysis(jobs: Dict[str, Tuple[str, str, Optional[str]]], max_concurrency: int) -> Dict[str, Tuple[Any, bool]]:
+    """
+    Analyze the unique documents of a batch
+    
+    Cache hits are served first. Uncached "single" documents go upstream
+    together in one llm.batch call; the other modes run through
+    cached_analysis on a pool of max_concurrency threads.
+    
+    Args:
+        jobs: Cache key -> (terms, mode, url), as returned by plan_batch
+        max_concurrency: Documents analyzed in parallel
+        
+    Returns:
+        Cache key -> (result or the exception raised, whether it came from the cache)
+    """
+    outcomes: Dict[str, Tuple[Any, bool]] = {}
+    single_keys = []
+    other_keys = []
+    
+    for cache_key, (_, mode, _) in jobs.items():
+        if mode != "single":
+            other_keys.append(cache_key)
+            continue
+        cached = analysis_cache.get(cache_key)
+        if cached is not None:
+            outcomes[cache_key] = (cached, True)
+        else:
+            single_keys.append(cache_key)
+    
+    if single_keys:
+        try:
+            results = analyze_texts_batched([jobs[key][0] for key in single_keys], max_concurrency,
+                                            max_chars=2000, min_findings=ROUTER_MIN_FINDINGS)
+            for cache_key, result in zip(single_keys, results):
+                result = result or analysis_error_result()
+                cache_result(cache_key, result)
+                outcomes[cache_key] = (result, False)
+        except Exception as e:
+            print(f"Batch Analysis Error: {e}")
+            for cache_key in single_keys:
+                outcomes[cache_key] = (e, False)
+    
+    if other_keys:
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(other_keys))) as pool:
+            futures = {key: pool.submit(cached_analysis, *jobs[key]) for key in other_keys}
+            for cache_key, future in futures.items():
+                try:
+                    outcomes[cache_key] = future.result()
+                except Exception as e:
+                    print(f"Batch Analysis Error: {e}")
+                    outcomes[cache_key] = (e, False)
+    
+    return outcomes
+
+def batch_response(entries: List[Dict[str, Any]], jobs: Dict[str, Tuple[str, str, Optional[str]]],
+                   outcomes: Dict[str, Tuple[Any, bool]]) -> Dict[str, Any]:
+    """
+    Assemble the batch response in request order
+    
+    Each item carries either its analysis (plus "cached") or an "error" and
+    "status", so one bad document does not fail the whole request.
+    """
+    results = []
+    for entry in entries:
+        if "error" in entry:
+            results.append(entry)
+            continue
+        outcome, cache_hit = outcomes[entry["cache_key"]]
+        item = {"index": entry["index"], "document_id": entry["document_id"]}
+        if isinstance(outcome, Exception):
+            item.update({"error": str(outcome), "status": 500})
+        else:
+            item.update({"cached": cache_hit, **outcome})
+        results.append(item)
+    
+    return {
+        "results": results,
+        "unique_documents": len(jobs),
+        "errors": sum(1 for item in results if "error" in item)
+    }
+
+def batch_concurrency(value: Any) -> int:
+    """
+    Per-request max_concurrency, capped at ANALYSIS_BATCH_MAX_CONCURRENCY
+    
+    Raises:
+        ValueError: If the value is not a positive integer
+    """
+    if value is None:
+        return ANALYSIS_BATCH_MAX_CONCURRENCY
+    if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+        raise ValueError("max_concurrency must be a positive integer")
+    return min(value, ANALYSIS_BATCH_MAX_CONCURRENCY)
+
+def batch_request_error(data: Dict[str, Any]) -> Optional[str]:
+    """Validate the shape of a batch request; returns an error message or None"""
+    documents = data.get('documents')
+    if not isinstance(documents, list) or not documents:
+        return "documents must be a non-empty list"
+    if len(documents) > ANALYSIS_BATCH_MAX_DOCUMENTS:
+        return f"At most {ANALYSIS_BATCH_MAX_DOCUMENTS} documents per batch"
+    return None
+
+class AnalysisStream:
+    """
+    Turns streamed analyzer output into NDJSON events
+    
+    Each fed chunk yields a "summary" event once the summary string is
+    complete and a "finding" event for every finding object as it closes.
+    Leaked <think> blocks are dropped before parsing.
+    """
+    
+    def __init__(self):
+        self.think_filter = ThinkFilter()
+        self.parser = IncrementalAnalysisParser()
+        self.summary = None
+        self.items = []
+    
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        events = []
+        for kind, value in self.parser.feed(self.think_filter.feed(text)):
+            if kind == "summary" and self.summary is None:
+                self.summary = value
+                events.append({"type": "summary", "summary": value})
+            elif kind == "finding":
+                item = format_finding(value)
+                if item is not None:
+                    self.items.append(item)
+                    events.append({"type": "finding", "finding": item})
+        return events
+    
+    def result(self) -> Optional[Dict[str, Any]]:
+        """The scored result, or None if no findings were streamed"""
+        if not self.items:
+            return None
+        return {
+            "score": calculate_score(self.items),
+            "summary": self.summary or "Analysis of the provided terms and conditions.",
+            "items": self.items
+        }
+
+def result_events(result: Dict[str, Any], include_summary: bool = True) -> List[Dict[str, Any]]:
+    """NDJSON events for a result that was not streamed (cache hit or fallback)"""
+    events = [{"type": "summary", "summary": result["summary"]}] if include_summary else []
+    events.extend({"type": "finding", "finding": item} for item in result["items"])
+    return events
+
+def stream_analysis(terms_data: str) -> Iterator[Dict[str, Any]]:
+    """
+    Streaming version of cached_analysis (single mode)
+    
+    Yields:
+        "summary" and "finding" events as the model produces them, then a
+        final "result" event with the score from calculate_score
+    """
+    cache_key = analysis_cache_key(terms_data, "single")
+    
+    cached = analysis_cache.get(cache_key)
+    if cached is not None:
+        yield from result_events(cached)
+        yield {"type": "result", **cached, "cached": True}
+        return
+    
+    # Always the large model: streamed findings cannot be taken back on escalation
+    stream = AnalysisStream()
+    failed = False
+    try:
+        for chunk in llm.stream(build_analysis_messages(terms_data), **call_options("analysis")):
+            yield from stream.feed(chunk.content)
+    except Exception as e:
+        print(f"Analysis Stream Error: {e}")
+        failed = True
+    
+    result = stream.result()
+    if result is None:
+        print("No findings in streamed output. Using fallback.")
+        result = recover_analysis(terms_data, stream.parser.buffer)
+        if failed:
+            result = mark_degraded(result)
+        yield from result_events(result, include_summary=stream.summary is None)
+        cache_result(cache_key, result)
+    elif stream.parser.done:
+        # Only cache output that streamed to the end
+        cache_result(cache_key, result)
+    
+    yield {"type": "result", **result, "cached": False}
+
 # ============================================================================
 # WORKFLOW 2: CHATBOT
 # ============================================================================
 
-def chatbot_response(terms_data: str, user_message: str, conversation_id: str) -> str:
+def clause_index_for(terms_data: str, document_id: Optional[str] = None) -> ClauseIndex:
+    """
+    Get the clause index of a document, building it on first use
+    
+    Indexes of registered documents are cached in the document registry.
+    """
+    if document_id:
+        return document_registry.derived(document_id, "clause_index", lambda: ClauseIndex.from_text(terms_data))
+    return ClauseIndex.from_text(terms_data)
+
+def build_chat_system_prompt(terms_data: str, excerpt: Optional[str] = None) -> str:
     """
-    Handle chatbot conversation with context awareness
+    Build the chatbot system prompt with the terms as context
     
     Args:
         terms_data: The terms and conditions document
-        user_message: User's question
-        conversation_id: Unique ID for this conversation
-        
-    Returns:
-        AI response as string
+        excerpt: Clauses retrieved for the current question; when omitted
+            the document (or its most salient clauses) is used
     """
+    if excerpt is None:
+        excerpt = select_prompt_text(terms_data, CHAT_CONTEXT_CHARS)
     
-    # Get or create conversation history
-    if conversation_id not in conversation_store:
-        conversation_store[conversation_id] = []
+    # Only a cut-off prefix of the document is marked as continuing; selected
+    # or retrieved clauses are whole and need no ellipsis
+    truncated = len(excerpt) < len(terms_data) and terms_data.startswith(excerpt)
     
-    conversation_history = conversation_store[conversation_id]
-    
-    # Build the system prompt with terms context
-    system_prompt = f"""You are a helpful AI assistant that answers questions about terms and conditions.
+    return f"""You are a helpful AI assistant that answers questions about terms and conditions.
 
 You have access to the following terms and conditions document:
 
-{terms_data[:3000]}{"..." if len(terms_data) > 3000 else ""}
+{excerpt}{"..." if truncated else ""}
 
 Your role:
 - Answer questions clearly and concisely
@@ -367,11 +1416,48 @@ Your role:
 
 Always base your answers on the provided terms and conditions."""
 
+def build_chat_messages(terms_data: str, user_message: str, conversation_history: List[Dict[str, str]],
+                        document_id: Optional[str] = None, summary: str = "") -> List[Any]:
+    """
+    Build the chatbot prompt from the terms, prior turns and the new question
+    
+    Args:
+        terms_data: The terms and conditions document
+        user_message: User's question
+        conversation_history: Prior messages as dicts with 'role' and 'content'
+        document_id: Registered document ID; its clause index and default
+            system prompt are built once and reused on later turns
+        summary: Running summary of turns no longer kept verbatim
+        
+    Returns:
+        List of messages for the model
+    """
+    system_prompt = None
+    if RETRIEVAL_ENABLED and len(terms_data) > CHAT_CONTEXT_CHARS:
+        # Pull the clauses matching this question (and the previous one, for follow-ups)
+        previous = [msg["content"] for msg in conversation_history if msg["role"] == "user"][-1:]
+        excerpt = clause_index_for(terms_data, document_id).select(
+            " ".join(previous + [user_message]), CHAT_CONTEXT_CHARS, RETRIEVAL_TOP_K
+        )
+        if excerpt:
+            system_prompt = build_chat_system_prompt(terms_data, excerpt)
+    
+    if system_prompt is None:
+        if document_id:
+            system_prompt = document_registry.derived(
+                document_id, "chat_system_prompt", lambda: build_chat_system_prompt(terms_data)
+            )
+        else:
+            system_prompt = build_chat_system_prompt(terms_data)
+
+    if summary:
+        system_prompt = f"{system_prompt}\n\nSummary of the earlier conversation:\n{summary}"
+
     # Build messages with conversation history
     messages = [SystemMessage(content=system_prompt)]
     
-    # Add conversation history (last 10 messages to avoid token limits)
-    for msg in conversation_history[-10:]:
+    # Add the most recent messages that fit the history token budget
+    for msg in recent_messages(conversation_history, MEMORY_HISTORY_TOKENS):
         if msg["role"] == "user":
             messages.append(HumanMessage(content=msg["content"]))
         elif msg["role"] == "assistant":
@@ -380,18 +1466,76 @@ Always base your answers on the provided terms and conditions."""
     # Add current user message
     messages.append(HumanMessage(content=user_message))
     
-    try:
-        response = llm.invoke(messages)
-        assistant_response = response.content
+    return messages
+
+def load_memory(conversation_id: str) -> Tuple[str, List[Dict[str, str]]]:
+    """
+    Get a conversation's running summary and the messages it does not cover
+    """
+    summary, messages = conversation_store.get_memory(conversation_id)
+    return summary, [message for _, message in messages]
+
+def store_exchange(conversation_id: str, user_message: str, assistant_response: str) -> None:
+    """
+    Append a question/answer pair to the conversation history
+    
+    Queues a background summary of older turns once the history outgrows
+    its token budget.
+    """
+    conversation_store.append_exchange(conversation_id, user_message, assistant_response)
+    if MEMORY_SUMMARY_ENABLED:
+        conversation_summarizer.maybe_schedule(conversation_id)
+
+def summarize_conversation(summary: str, messages: List[Dict[str, str]]) -> str:
+    """
+    Fold older turns into a conversation's running summary (runs in the background)
+    
+    Args:
+        summary: The current summary ("" for none)
+        messages: Turns to fold in, oldest first
+        
+    Returns:
+        The updated summary, at most MEMORY_SUMMARY_CHARS long
+    """
+    prompt = f"""Update the running summary of a conversation between a user and an assistant about a terms and conditions document.
+
+Current summary:
+{summary or "(none)"}
+
+New turns:
+{format_transcript(messages)}
+
+Write the updated summary in under 150 words. Keep the user's questions, the answers and any facts about the terms they rely on. Return ONLY the summary."""
+
+    response = (small_llm or llm).invoke([HumanMessage(content=prompt)], **call_options("summary"))
+    return visible_text(response)[:MEMORY_SUMMARY_CHARS]
+
+def chatbot_response(terms_data: str, user_message: str, conversation_id: str, remember: bool = True,
+                     document_id: Optional[str] = None) -> str:
+    """
+    Handle chatbot conversation with context awareness
+    
+    Args:
+        terms_data: The terms and conditions document
+        user_message: User's question
+        conversation_id: Unique ID for this conversation
+        remember: Whether to store the exchange (False for one-shot questions)
+        document_id: Registered document ID, used to reuse the system prompt
         
-        # Store in conversation history
-        conversation_history.append({"role": "user", "content": user_message})
-        conversation_history.append({"role": "assistant", "content": assistant_response})
+    Returns:
+        AI response as string
+    """
+    
+    # Get conversation history
+    summary, conversation_history = load_memory(conversation_id)
+    
+    messages = build_chat_messages(terms_data, user_message, conversation_history, document_id, summary)
+    
+    try:
+        assistant_response = chat_answer(messages)
         
-        # Keep only last 20 messages (10 exchanges)
-        if len(conversation_history) > 20:
-            conversation_history = conversation_history[-20:]
-            conversation_store[conversation_id] = conversation_history
+        if remember:
+            store_exchange(conversation_id, user_message, assistant_response)
         
         return assistant_response
         
@@ -399,6 +1543,97 @@ Always base your answers on the provided terms and conditions."""
         print(f"Chatbot Error: {e}")
         return f"I apologize, but I encountered an error: {str(e)}"
 
+def stream_chatbot_response(terms_data: str, user_message: str, conversation_id: str,
+                            remember: bool = True, document_id: Optional[str] = None) -> Iterator[str]:
+    """
+    Streaming version of chatbot_response
+    
+    Yields:
+        Chunks of the answer as they arrive from the model. The full answer
+        is stored in the conversation history once the stream completes.
+    """
+    summary, conversation_history = load_memory(conversation_id)
+    messages = build_chat_messages(terms_data, user_message, conversation_history, document_id, summary)
+    
+    parts = []
+    for text in stream_chat_answer(messages):
+        parts.append(text)
+        yield text
+    
+    if remember:
+        store_exchange(conversation_id, user_message, "".join(parts))
+
+def sse_event(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    """Format one Server-Sent Events message"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+def sse_chat_stream(terms_data: str, user_message: str, conversation_id: str,
+                    start: Dict[str, Any], done_key: str, persistent: bool,
+                    document_id: Optional[str] = None) -> Iterator[str]:
+    """
+    SSE event stream for a chatbot answer
+    
+    Emits a "start" event, one "token" event per chunk, then a "done" event
+    carrying the full answer under done_key (or an "error" event). Persistent
+    conversations are stored and their ID is included in the "done" event.
+    """
+    yield sse_event(start, "start")
+    
+    parts = []
+    try:
+        for token in stream_chatbot_response(terms_data, user_message, conversation_id,
+                                             remember=persistent, document_id=document_id):
+            parts.append(token)
+            yield sse_event({"token": token}, "token")
+    except Exception as e:
+        print(f"Chatbot Stream Error: {e}")
+        yield sse_event({"error": f"I apologize, but I encountered an error: {str(e)}"}, "error")
+        return
+    
+    done = {done_key: "".join(parts)}
+    if persistent:
+        done["conversation_id"] = conversation_id
+    yield sse_event(done, "done")
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no"  # Disable proxy buffering so tokens arrive immediately
+}
+
+# ============================================================================
+# REQUEST METRICS
+# ============================================================================
+
+def metrics_endpoint() -> str:
+    """Route template of the current request, so path parameters do not become labels"""
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+@app.before_request
+def start_request_metrics():
+    g.metrics_start = time.perf_counter()
+    HTTP_REQUESTS_IN_FLIGHT.labels(endpoint=metrics_endpoint()).inc()
+
+@app.after_request
+def finish_request_metrics(response):
+    start = g.pop("metrics_start", None)
+    if start is None:
+        return response
+    endpoint, method, status = metrics_endpoint(), request.method, str(response.status_code)
+    
+    def record():
+        HTTP_REQUESTS_IN_FLIGHT.labels(endpoint=endpoint).dec()
+        HTTP_REQUEST_LATENCY.labels(endpoint=endpoint, method=method, status=status).observe(
+            time.perf_counter() - start
+        )
+    
+    # Streamed responses are measured until their last chunk is sent
+    if response.is_streamed:
+        response.call_on_close(record)
+    else:
+        record()
+    return response
+
 # ============================================================================
 # API ENDPOINTS
 # ============================================================================
@@ -409,7 +1644,8 @@ def health_check():
     return jsonify({
         "status": "healthy",
         "message": "Terms Analysis Server is running",
-        "model": "nvidia/llama-3.3-nemotron-super-49b-v1.5"
+        "model": MODEL_NAME,
+        "small_model": SMALL_MODEL_NAME if ROUTER_ENABLED else None
     })
 
 @app.route('/api/analyze', methods=['POST'])
@@ -419,11 +1655,14 @@ def analyze():
     
     Request body:
     {
-        "terms_data": "The full terms and conditions text"
+        "terms_data": "The full terms and conditions text",  // or "document_id"
+        "mode": "single",  // optional: "single", "chunked", "fast" or "hybrid"
+        "url": "https://example.com/terms"  // optional: re-analyze only changed clauses
     }
     
     Response:
     {
+        "document_id": "doc_3f2a...",  // pass on later calls instead of terms_data
         "score": 65,
         "summary": "This ToS has moderate concerns...",
         "items": [
@@ -438,17 +1677,190 @@ def analyze():
     """
     try:
         data = request.json
-        terms_data = data.get('terms_data', '')
+        terms_data, document_id = resolve_document(data)
+        mode = analysis_mode(data)
+        
+        error = document_error(terms_data, document_id)
+        if error:
+            return jsonify({
+                "error": error[0]
+            }), error[1]
+        
+        if mode not in ANALYSIS_MODES:
+            return jsonify({
+                "error": f"mode must be one of: {', '.join(ANALYSIS_MODES)}"
+            }), 400
+        
+        try:
+            url = policy_url(data)
+        except ValueError as e:
+            return jsonify({
+                "error": str(e)
+            }), 400
+        
+        # Perform analysis (served from the cache for repeat documents)
+        result, cache_hit = cached_analysis(terms_data, mode, url)
+        
+        response = jsonify({"document_id": document_id, **result})
+        response.headers["X-Cache"] = "HIT" if cache_hit else "MISS"
+        return response
+        
+    except Exception as e:
+        return jsonify({
+            "error": str(e)
+        }), 500
+
+@app.route('/api/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """
+    Analyze several documents in one request
+    
+    Duplicate documents are analyzed once; uncached documents go upstream
+    together with at most max_concurrency calls in flight.
+    
+    Request body:
+    {
+        "documents": [
+            {"terms_data": "First policy text..."},
+            {"document_id": "doc_3f2a...", "mode": "chunked"}
+        ],
+        "mode": "single",  // optional default for items without a mode
+        "max_concurrency": 4  // optional, capped by ANALYSIS_BATCH_MAX_CONCURRENCY
+    }
+    
+    Response (results are in request order):
+    {
+        "results": [
+            {"index": 0, "document_id": "doc_9b1c...", "cached": false,
+             "score": 65, "summary": "...", "items": [...]},
+            {"index": 1, "error": "Unknown document_id: doc_3f2a...", "status": 404}
+        ],
+        "unique_documents": 1,
+        "errors": 1
+    }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        error = batch_request_error(data)
+        if error:
+            return jsonify({
+                "error": error
+            }), 400
+        
+        try:
+            max_concurrency = batch_concurrency(data.get('max_concurrency'))
+        except ValueError as e:
+            return jsonify({
+                "error": str(e)
+            }), 400
+        
+        entries, jobs = plan_batch(data['documents'], data.get('mode'))
+        outcomes = batch_analysis(jobs, max_concurrency)
+        
+        return jsonify(batch_response(entries, jobs, outcomes))
+        
+    except Exception as e:
+        return jsonify({
+            "error": str(e)
+        }), 500
+
+@app.route('/api/analyze/html', methods=['POST'])
+def analyze_html():
+    """
+    Extract the legal text from a raw HTML page and analyze it
+    
+    Request body: the raw HTML page (Content-Type: text/html), optionally
+    gzip-compressed. The analysis mode can be set with ?mode=chunked, and
+    the page address with ?url=... for incremental re-analysis.
+    
+    Response: same as /api/analyze, plus extraction statistics
+    {
+        "document_id": "doc_3f2a...",
+        "score": 65,
+        "summary": "...",
+        "items": [...],
+        "extraction": {
+            "bytes_received": 48213,
+            "html_chars": 182344,
+            "text_chars": 20311,
+            "reduction_percent": 88.9,
+            "extraction_ms": 14.2
+        }
+    }
+    """
+    try:
+        mode = analysis_mode(request.args)
+        url = request.args.get('url') or None
+        
+        if mode not in ANALYSIS_MODES:
+            return jsonify({
+                "error": f"mode must be one of: {', '.join(ANALYSIS_MODES)}"
+            }), 400
+        
+        # Parse the body as it is read instead of buffering the whole page
+        extractor = LegalTextExtractor(max_html_bytes=HTML_MAX_BYTES)
+        try:
+            while True:
+                chunk = request.stream.read(HTML_READ_CHUNK)
+                if not chunk:
+                    break
+                extractor.feed_bytes(chunk)
+            terms_data = extractor.finish()
+        except ExtractionError as e:
+            return jsonify({
+                "error": str(e)
+            }), 400
+        
+        extraction = extraction_stats(extractor, terms_data)
+        print(f"Extracted {extraction['text_chars']} of {extraction['html_chars']} chars "
+              f"in {extraction['extraction_ms']}ms")
         
         if not terms_data:
             return jsonify({
-                "error": "terms_data is required"
+                "error": "No text could be extracted from the HTML"
             }), 400
         
-        # Perform analysis
-        result = analyze_terms_and_conditions(terms_data)
+        document_id, _ = document_registry.register(terms_data)
+        result, cache_hit = cached_analysis(terms_data, mode, url)
+        
+        response = jsonify({"document_id": document_id, **result, "extraction": extraction})
+        response.headers["X-Cache"] = "HIT" if cache_hit else "MISS"
+        return response
+        
+    except Exception as e:
+        return jsonify({
+            "error": str(e)
+        }), 500
+
+@app.route('/api/analyze/stream', methods=['POST'])
+def analyze_stream():
+    """
+    Streaming analysis (NDJSON, one JSON object per line)
+    
+    Request body:
+    {
+        "terms_data": "The full terms and conditions text"  // or "document_id"
+    }
+    
+    Response (application/x-ndjson):
+    {"type": "summary", "summary": "This ToS has moderate concerns..."}
+    {"type": "finding", "finding": {"title": "...", "description": "...", "flag": "critical", "category": "legal"}}
+    {"type": "finding", "finding": {...}}
+    {"type": "result", "score": 65, "summary": "...", "items": [...], "cached": false}
+    """
+    try:
+        data = request.json
+        terms_data, document_id = resolve_document(data)
+        
+        error = document_error(terms_data, document_id)
+        if error:
+            return jsonify({
+                "error": error[0]
+            }), error[1]
         
-        return jsonify(result)
+        lines = (json.dumps(event) + "\n" for event in stream_analysis(terms_data))
+        return Response(stream_with_context(lines), mimetype="application/x-ndjson", headers=SSE_HEADERS)
         
     except Exception as e:
         return jsonify({
@@ -462,7 +1874,7 @@ def chatbot():
     
     Request body:
     {
-        "terms_data": "The full terms and conditions text",
+        "terms_data": "The full terms and conditions text",  // or "document_id"
         "message": "User's question",
         "conversation_id": "optional-unique-id"
     }
@@ -475,14 +1887,15 @@ def chatbot():
     """
     try:
         data = request.json
-        terms_data = data.get('terms_data', '')
+        terms_data, document_id = resolve_document(data)
         user_message = data.get('message', '')
         conversation_id = data.get('conversation_id', str(uuid.uuid4()))
         
-        if not terms_data:
+        error = document_error(terms_data, document_id)
+        if error:
             return jsonify({
-                "error": "terms_data is required"
-            }), 400
+                "error": error[0]
+            }), error[1]
         
         if not user_message:
             return jsonify({
@@ -490,7 +1903,7 @@ def chatbot():
             }), 400
         
         # Get chatbot response
-        response_text = chatbot_response(terms_data, user_message, conversation_id)
+        response_text = chatbot_response(terms_data, user_message, conversation_id, document_id=document_id)
         
         return jsonify({
             "response": response_text,
@@ -509,7 +1922,7 @@ def chat():
     
     Request body (from n8n):
     {
-        "terms_data": "The full terms and conditions text",
+        "terms_data": "The full terms and conditions text",  // or "document_id"
         "question": "User's question"
     }
     
@@ -520,13 +1933,14 @@ def chat():
     """
     try:
         data = request.json
-        terms_data = data.get('terms_data', '')
+        terms_data, document_id = resolve_document(data)
         question = data.get('question', '')
         
-        if not terms_data:
+        error = document_error(terms_data, document_id)
+        if error:
             return jsonify({
-                "error": "terms_data is required"
-            }), 400
+                "error": error[0]
+            }), error[1]
         
         if not question:
             return jsonify({
@@ -536,8 +1950,9 @@ def chat():
         # Generate a simple conversation ID for this request
         conversation_id = str(uuid.uuid4())
         
-        # Get chatbot response
-        response_text = chatbot_response(terms_data, question, conversation_id)
+        # Get chatbot response (the ID is never returned, so don't keep the history)
+        response_text = chatbot_response(terms_data, question, conversation_id, remember=False,
+                                         document_id=document_id)
         
         return jsonify({
             "answer": response_text
@@ -548,6 +1963,142 @@ def chat():
             "error": str(e)
         }), 500
 
+@app.route('/api/chatbot/stream', methods=['POST'])
+def chatbot_stream():
+    """
+    Streaming chatbot endpoint (Server-Sent Events)
+    
+    Request body: same as /api/chatbot
+    
+    Response (text/event-stream):
+        event: start
+        data: {"conversation_id": "unique-id-for-this-conversation"}
+        
+        event: token
+        data: {"token": "Based"}
+        
+        event: done
+        data: {"response": "Based on the terms...", "conversation_id": "..."}
+    """
+    try:
+        data = request.json
+        terms_data, document_id = resolve_document(data)
+        user_message = data.get('message', '')
+        conversation_id = data.get('conversation_id', str(uuid.uuid4()))
+        
+        error = document_error(terms_data, document_id)
+        if error:
+            return jsonify({
+                "error": error[0]
+            }), error[1]
+        
+        if not user_message:
+            return jsonify({
+                "error": "message is required"
+            }), 400
+        
+        events = sse_chat_stream(
+            terms_data, user_message, conversation_id,
+            start={"conversation_id": conversation_id}, done_key="response", persistent=True,
+            document_id=document_id
+        )
+        return Response(stream_with_context(events), mimetype="text/event-stream", headers=SSE_HEADERS)
+        
+    except Exception as e:
+        return jsonify({
+            "error": str(e)
+        }), 500
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Streaming n8n chat endpoint (Server-Sent Events)
+    
+    Request body: same as /chat
+    
+    Response (text/event-stream): "start", then "token" events, then
+        event: done
+        data: {"answer": "AI's answer"}
+    """
+    try:
+        data = request.json
+        terms_data, document_id = resolve_document(data)
+        question = data.get('question', '')
+        
+        error = document_error(terms_data, document_id)
+        if error:
+            return jsonify({
+                "error": error[0]
+            }), error[1]
+        
+        if not question:
+            return jsonify({
+                "error": "question is required"
+            }), 400
+        
+        conversation_id = str(uuid.uuid4())
+        
+        events = sse_chat_stream(
+            terms_data, question, conversation_id,
+            start={}, done_key="answer", persistent=False,
+            document_id=document_id
+        )
+        return Response(stream_with_context(events), mimetype="text/event-stream", headers=SSE_HEADERS)
+        
+    except Exception as e:
+        return jsonify({
+            "error": str(e)
+        }), 500
+
+@app.route('/api/documents', methods=['POST'])
+def register_document():
+    """
+    Register a document once and reference it by ID afterwards
+    
+    Request body:
+    {
+        "terms_data": "The full terms and conditions text"
+    }
+    
+    Response (201 when newly stored, 200 when already registered):
+    {
+        "document_id": "doc_3f2a...",
+        "chars": 20311,
+        "stored_bytes": 6120
+    }
+    """
+    try:
+        data = request.json
+        terms_data = data.get('terms_data', '')
+        
+        if not terms_data:
+            return jsonify({
+                "error": "terms_data is required"
+            }), 400
+        
+        document_id, created = document_registry.register(terms_data)
+        
+        return jsonify(document_registry.info(document_id)), 201 if created else 200
+        
+    except Exception as e:
+        return jsonify({
+            "error": str(e)
+        }), 500
+
+@app.route('/api/documents/<document_id>', methods=['GET'])
+def get_document(document_id):
+    """
+    Check whether a document is registered
+    
+    Response: same as POST /api/documents, or 404 if the ID is unknown
+    """
+    info = document_registry.info(document_id)
+    if info is None:
+        return jsonify({
+            "error": f"Unknown document_id: {document_id}"
+        }), 404
+    return jsonify(info)
+
 @app.route('/api/chatbot/reset', methods=['POST'])
 def reset_conversation():
     """
@@ -562,8 +2113,7 @@ def reset_conversation():
         data = request.json
         conversation_id = data.get('conversation_id', '')
         
-        if conversation_id in conversation_store:
-            del conversation_store[conversation_id]
+        conversation_store.delete(conversation_id)
         
         return jsonify({
             "message": "Conversation reset successfully"
@@ -588,12 +2138,13 @@ def get_conversation_history():
         data = request.json
         conversation_id = data.get('conversation_id', '')
         
-        history = conversation_store.get(conversation_id, [])
+        summary, history = load_memory(conversation_id)
         
         return jsonify({
             "conversation_id": conversation_id,
             "history": history,
-            "message_count": len(history)
+            "message_count": len(history),
+            "summary": summary
         })
         
     except Exception as e:
@@ -601,27 +2152,77 @@ def get_conversation_history():
             "error": str(e)
         }), 500
 
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    """
+    Server statistics
+    
+    Response:
+    {
+        "analysis_cache": {"memory_hits": 10, "disk_hits": 2, "misses": 5, ...},
+        "analysis_singleflight": {"executions": 5, "coalesced": 3, "in_flight": 0},
+        "conversation_store": {"conversations": 12, "messages": 96, "bytes_used": 48213, ...},
+        "document_registry": {"documents": 40, "bytes_used": 310212, "deduplicated": 87, ...},
+        "conversation_summarizer": {"scheduled": 6, "completed": 6, "failed": 0, "in_flight": 0},
+        "policy_versions": {"urls": 8, "incremental_analyses": 3, "clauses_reused": 412, ...},
+        "model_clients": {"clients": 2, "created": 2, "create_seconds": 0.912},
+        "server_startup": {"import_seconds": 0.412, "warmup_seconds": 1.304}
+    }
+    """
+    return jsonify({
+        "analysis_cache": analysis_cache.stats(),
+        "analysis_singleflight": analysis_flight.stats(),
+        "conversation_store": conversation_store.stats(),
+        "document_registry": document_registry.stats(),
+        "conversation_summarizer": conversation_summarizer.stats(),
+        "policy_versions": policy_versions.stats(),
+        "model_clients": client_stats(),
+        "server_startup": startup_stats
+    })
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics (text exposition format)"""
+    return Response(render_metrics(), content_type=CONTENT_TYPE_LATEST)
+
+startup_stats["import_seconds"] = round(time.perf_counter() - STARTUP_STARTED, 3)
+
 # ============================================================================
 # RUN SERVER
 # ============================================================================
 
 if __name__ == '__main__':
-    if not os.getenv("NVIDIA_API_KEY"):
+    if requires_api_key() and not os.getenv("NVIDIA_API_KEY"):
         print("❌ ERROR: NVIDIA_API_KEY not set in .env file")
         exit(1)
     
     print("=" * 60)
     print("🚀 Terms & Conditions Analysis Server")
     print("=" * 60)
-    print(f"Model: nvidia/llama-3.3-nemotron-super-49b-v1.5")
+    print(f"Model: {MODEL_NAME} (backend: {llm_backend()})")
+    if ROUTER_ENABLED:
+        print(f"Small model: {SMALL_MODEL_NAME} (escalates to {MODEL_NAME})")
     print(f"Endpoints:")
     print(f"  - POST /api/analyze     - Analyze terms & conditions")
+    print(f"  - POST /api/analyze/batch - Analyze several documents at once")
+    print(f"  - POST /api/analyze/html - Analyze a raw (or gzipped) HTML page")
+    print(f"  - POST /api/analyze/stream - Streamed analysis (NDJSON)")
     print(f"  - POST /api/chatbot     - Ask questions about terms")
+    print(f"  - POST /api/chatbot/stream - Streamed answer (SSE)")
     print(f"  - POST /chat            - n8n integration endpoint")
+    print(f"  - POST /chat/stream     - Streamed n8n answer (SSE)")
+    print(f"  - POST /api/documents   - Register a document, get its ID")
     print(f"  - POST /api/chatbot/reset - Reset conversation")
+    print(f"  - GET  /api/stats       - Cache statistics")
+    print(f"  - GET  /metrics         - Prometheus metrics")
     print(f"  - GET  /health          - Health check")
+    print("Development server; for production run: gunicorn langchain_server:app")
     print("=" * 60)
     
+    if WARMUP_ENABLED:
+        warm_up_models()
+    print(f"Startup: import {startup_stats['import_seconds']:.2f}s, warm-up {startup_stats['warmup_seconds']:.2f}s")
+    
     app.run(
         host='0.0.0.0',
         port=5000,
@@ -0,0 +1,913 @@
+"""
+Async (ASGI) server for Terms & Conditions Analysis and Chatbot
+Serves the same API contract as langchain_server.py on Starlette, using the
+model's async methods so pending LLM calls do not hold a worker thread.
+Blocking work shared with the Flask server (SQLite and disk-cache reads and
+writes, clause indexing, HTML extraction) runs in Starlette's thread pool
+so it never stalls the event loop
+
+Run with:
+    uvicorn langchain_server_async:app --host 0.0.0.0 --port 8000
+"""
+
+import time
+
+# Import time is measured from here (server.startup_stats)
+STARTUP_STARTED = time.perf_counter()
+
+import asyncio
+import contextlib
+import json
+import os
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Match, Route
+
+import langchain_server as server
+from singleflight import AsyncSingleFlight
+from html_extract import ExtractionError, LegalTextExtractor, extraction_stats
+from model_clients import awarm_up, client_stats, llm_backend, requires_api_key
+from reasoning import ThinkFilter
+from metrics import CONTENT_TYPE_LATEST, HTTP_REQUEST_LATENCY, HTTP_REQUESTS_IN_FLIGHT, record_route, render_metrics
+from model_router import LOW_CONFIDENCE_MARKER, analysis_rejection, chat_rejection, with_escalation_instruction
+
+# Coalesce concurrent analyses of the same document into one upstream call
+analysis_flight = AsyncSingleFlight()
+server.stats_collector.sources["analysis_singleflight"] = lambda: analysis_flight.stats()
+
+# Background model refinements for hybrid mode, keyed by hybrid cache key
+refinement_tasks: Dict[str, asyncio.Task] = {}
+
+# ============================================================================
+# MODEL CALLS
+# ============================================================================
+
+async def avisible_stream(chunks: AsyncIterator[Any]) -> AsyncIterator[str]:
+    """
+    Async version of visible_stream
+    """
+    think_filter = ThinkFilter()
+    async for chunk in chunks:
+        text = think_filter.feed(chunk.content)
+        if text:
+            yield text
+    text = think_filter.flush()
+    if text:
+        yield text
+
+async def asmall_model_analyses(messages: List[List[Any]], texts: List[str],
+                                max_concurrency: int, min_findings: int) -> List[Optional[Dict[str, Any]]]:
+    """
+    Async version of small_model_analyses, using abatch
+    """
+    responses = await server.small_llm.abatch(
+        messages,
+        config={"max_concurrency": max_concurrency},
+        return_exceptions=True,
+        **server.call_options("analysis")
+    )
+    results = []
+    for response, text in zip(responses, texts):
+        if isinstance(response, Exception):
+            print(f"Small Model Error: {response}")
+            result, reason = None, "error"
+        else:
+            result = server.parse_analysis_response(server.visible_text(response))
+            reason = analysis_rejection(result, text, min_findings)
+        record_route("analysis", reason)
+        results.append(None if reason else result)
+    return results
+
+async def achat_answer(messages: List[Any]) -> str:
+    """
+    Async version of chat_answer
+    """
+    if server.small_llm is not None:
+        try:
+            response = await server.small_llm.ainvoke(with_escalation_instruction(messages),
+                                                      **server.call_options("chat"))
+            answer = server.visible_text(response)
+            reason = chat_rejection(answer)
+        except Exception as e:
+            print(f"Small Model Error: {e}")
+            reason = "error"
+        record_route("chat", reason)
+        if reason is None:
+            return answer
+
+    response = await server.llm.ainvoke(messages, **server.call_options("chat"))
+    return server.visible_text(response)
+
+async def astream_chat_answer(messages: List[Any]) -> AsyncIterator[str]:
+    """
+    Async version of stream_chat_answer
+    """
+    if server.small_llm is not None:
+        head = ""
+        stream = avisible_stream(server.small_llm.astream(with_escalation_instruction(messages),
+                                                          **server.call_options("chat")))
+        try:
+            async for text in stream:
+                head += text
+                if len(head.lstrip()) > len(LOW_CONFIDENCE_MARKER):
+                    break
+            reason = chat_rejection(head)
+        except Exception as e:
+            print(f"Small Model Error: {e}")
+            reason = "error"
+        record_route("chat", reason)
+        if reason is None:
+            yield head
+            async for text in stream:
+                yield text
+            return
+        await stream.aclose()
+
+    async for text in avisible_stream(server.llm.astream(messages, **server.call_options("chat"))):
+        yield text
+
+# ============================================================================
+# WORKFLOW 1: ANALYZER
+# ============================================================================
+
+async def aanalyze_terms_and_conditions(terms_data: str) -> Dict[str, Any]:
+    """
+    Async version of analyze_terms_and_conditions
+
+    Args:
+        terms_data: The terms and conditions text to analyze
+
+    Returns:
+        Dictionary with score, summary, and items
+    """
+    messages = server.build_analysis_messages(terms_data)
+
+    try:
+        if server.small_llm is not None:
+            result = (await asmall_model_analyses([messages], [terms_data], 1, server.ROUTER_MIN_FINDINGS))[0]
+            if result is not None:
+                return result
+
+        response = await server.llm.ainvoke(messages, **server.call_options("analysis"))
+        response_text = server.visible_text(response)
+
+        result = server.parse_analysis_response(response_text)
+        if result is None:
+            return await arecover_analysis(terms_data, response_text)
+
+        return result
+
+    except Exception as e:
+        print(f"Analysis Error: {e}")
+        return server.mark_degraded(await arecover_analysis(terms_data, str(e)))
+
+async def arecover_analysis(terms_data: str, error_info: str = "") -> Dict[str, Any]:
+    """
+    Async version of recover_analysis
+    """
+    if server.STRUCTURED_OUTPUT_ENABLED:
+        return server.local_analysis(terms_data)
+    return await afallback_analysis(terms_data, error_info)
+
+async def afallback_analysis(terms_data: str, error_info: str = "") -> Dict[str, Any]:
+    """
+    Async version of fallback_analysis
+    """
+    print("Using fallback analysis method...")
+
+    try:
+        response = await server.llm.ainvoke(server.build_fallback_messages(terms_data), **server.call_options("fallback"))
+        return server.parse_fallback_response(server.visible_text(response))
+
+    except Exception as e:
+        print(f"Fallback error: {e}")
+        return server.analysis_error_result()
+
+async def aanalyze_terms_chunked(terms_data: str) -> Dict[str, Any]:
+    """
+    Async version of analyze_terms_chunked, dispatching chunks with llm.abatch
+    """
+    chunks = server.split_into_chunks(terms_data, server.ANALYSIS_CHUNK_SIZE, server.ANALYSIS_MAX_CHUNKS)
+    if len(chunks) <= 1:
+        return await aanalyze_terms_and_conditions(terms_data)
+
+    results = await aanalyze_texts_batched(chunks, server.ANALYSIS_MAX_CONCURRENCY)
+    return server.merge_chunk_results(results)
+
+async def aanalyze_texts_batched(texts: List[str], max_concurrency: int, max_chars: Optional[int] = None,
+                                 min_findings: int = 0) -> List[Optional[Dict[str, Any]]]:
+    """
+    Async version of analyze_texts_batched, using llm.abatch
+    """
+    config = {"max_concurrency": max_concurrency}
+    messages = [server.build_analysis_messages(text, max_chars=max_chars or len(text)) for text in texts]
+    results: List[Optional[Dict[str, Any]]] = [None] * len(texts)
+    pending = list(range(len(texts)))
+
+    if server.small_llm is not None:
+        results = await asmall_model_analyses(messages, texts, max_concurrency, min_findings)
+        pending = [i for i, result in enumerate(results) if result is None]
+        if not pending:
+            return results
+
+    responses = await server.llm.abatch(
+        [messages[i] for i in pending],
+        config=config,
+        return_exceptions=True,
+        **server.call_options("analysis")
+    )
+    for i, result in zip(pending, server.parse_chunk_responses(responses)):
+        results[i] = result
+    errors = {i for i, response in zip(pending, responses) if isinstance(response, Exception)}
+
+    failed = [i for i in pending if results[i] is None]
+    if failed and server.STRUCTURED_OUTPUT_ENABLED:
+        for i in failed:
+            if i not in errors:
+                results[i] = server.local_analysis(texts[i])
+    elif failed:
+        print(f"Using fallback analysis for {len(failed)} of {len(texts)} texts...")
+        fallback_responses = await server.llm.abatch(
+            [server.build_fallback_messages(texts[i], max_chars=max_chars or len(texts[i])) for i in failed],
+            config=config,
+            return_exceptions=True,
+            **server.call_options("fallback")
+        )
+        for i, response in zip(failed, fallback_responses):
+            if not isinstance(response, Exception):
+                results[i] = server.parse_fallback_response(server.visible_text(response))
+
+    return results
+
+async def aincremental_analysis(terms_data: str, url: str) -> Dict[str, Any]:
+    """
+    Async version of incremental_analysis
+    """
+    plan = await run_in_threadpool(
+        server.policy_versions.plan, url, terms_data, server.incremental_segment_chars(terms_data)
+    )
+    if plan.empty:
+        return await aanalyze_terms_chunked(terms_data)
+
+    texts = plan.texts()
+    results = await aanalyze_texts_batched(texts, server.ANALYSIS_MAX_CONCURRENCY) if texts else []
+    return await run_in_threadpool(server.finish_incremental_analysis, url, plan, results)
+
+async def arun_analysis(terms_data: str, mode: str) -> Dict[str, Any]:
+    """Async version of run_analysis"""
+    if mode == "chunked":
+        return await aanalyze_terms_chunked(terms_data)
+    if mode == "fast":
+        return server.rule_analysis(terms_data)
+    return await aanalyze_terms_and_conditions(terms_data)
+
+async def acached_analysis(terms_data: str, mode: str, url: Optional[str] = None) -> Tuple[Dict[str, Any], bool]:
+    """
+    Async version of cached_analysis, sharing the same cache
+    """
+    if mode == "fast":
+        return server.rule_analysis(terms_data), False
+    if mode == "hybrid":
+        return await ahybrid_analysis(terms_data)
+
+    cache_key = server.analysis_cache_key(terms_data, mode, url)
+
+    cached = await run_in_threadpool(server.analysis_cache.get, cache_key)
+    if cached is not None:
+        return cached, True
+
+    async def analyze_once() -> Dict[str, Any]:
+        cached = await run_in_threadpool(server.analysis_cache.get, cache_key)
+        if cached is not None:
+            return cached
+        if url and mode == "chunked":
+            result = await aincremental_analysis(terms_data, url)
+        else:
+            result = await arun_analysis(terms_data, mode)
+        await run_in_threadpool(server.cache_result, cache_key, result)
+        return result
+
+    result, shared = await analysis_flight.do(cache_key, analyze_once)
+    if shared:
+        print(f"Coalesced duplicate analysis {cache_key[:12]}")
+
+    return result, False
+
+async def ahybrid_analysis(terms_data: str) -> Tuple[Dict[str, Any], bool]:
+    """
+    Async version of hybrid_analysis; the refinement runs as a background task
+    """
+    hybrid_key = server.analysis_cache_key(terms_data, "hybrid")
+
+    cached = await run_in_threadpool(server.analysis_cache.get, hybrid_key)
+    if cached is not None:
+        return cached, True
+
+    if hybrid_key not in refinement_tasks:
+        task = asyncio.ensure_future(arefine_in_background(terms_data, hybrid_key))
+        refinement_tasks[hybrid_key] = task
+        task.add_done_callback(lambda _: refinement_tasks.pop(hybrid_key, None))
+
+    return {**server.rule_analysis(terms_data), "refined": False}, False
+
+async def arefine_in_background(terms_data: str, hybrid_key: str) -> None:
+    """Async version of refine_in_background"""
+    try:
+        llm_result, _ = await acached_analysis(terms_data, "single")
+        refined = server.refine_rule_result(server.rule_analysis(terms_data), llm_result)
+        if refined is not None:
+            await run_in_threadpool(server.cache_result, hybrid_key, refined)
+    except Exception as e:
+        print(f"Refinement Error: {e}")
+
+async def abatch_analysis(jobs: Dict[str, Tuple[str, str, Optional[str]]], max_concurrency: int) -> Dict[str, Tuple[Any, bool]]:
+    """
+    Async version of batch_analysis; non-"single" modes are bounded by a semaphore
+    """
+    outcomes: Dict[str, Tuple[Any, bool]] = {}
+    single_keys = []
+    other_keys = []
+
+    for cache_key, (_, mode, _) in jobs.items():
+        if mode != "single":
+            other_keys.append(cache_key)
+            continue
+        cached = await run_in_threadpool(server.analysis_cache.get, cache_key)
+        if cached is not None:
+            outcomes[cache_key] = (cached, True)
+        else:
+            single_keys.append(cache_key)
+
+    if single_keys:
+        try:
+            results = await aanalyze_texts_batched(
+                [jobs[key][0] for key in single_keys], max_concurrency,
+                max_chars=2000, min_findings=server.ROUTER_MIN_FINDINGS
+            )
+            for cache_key, result in zip(single_keys, results):
+                result = result or server.analysis_error_result()
+                await run_in_threadpool(server.cache_result, cache_key, result)
+                outcomes[cache_key] = (result, False)
+        except Exception as e:
+            print(f"Batch Analysis Error: {e}")
+            for cache_key in single_keys:
+                outcomes[cache_key] = (e, False)
+
+    if other_keys:
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def analyze_one(cache_key: str) -> Tuple[Any, bool]:
+            async with semaphore:
+                return await acached_analysis(*jobs[cache_key])
+
+        results = await asyncio.gather(*(analyze_one(key) for key in other_keys), return_exceptions=True)
+        for cache_key, result in zip(other_keys, results):
+            if isinstance(result, Exception):
+                print(f"Batch Analysis Error: {result}")
+                result = (result, False)
+            outcomes[cache_key] = result
+
+    return outcomes
+
+async def astream_analysis(terms_data: str) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Async version of stream_analysis, using llm.astream
+    """
+    cache_key = server.analysis_cache_key(terms_data, "single")
+
+    cached = await run_in_threadpool(server.analysis_cache.get, cache_key)
+    if cached is not None:
+        for event in server.result_events(cached):
+            yield event
+        yield {"type": "result", **cached, "cached": True}
+        return
+
+    stream = server.AnalysisStream()
+    failed = False
+    try:
+        async for chunk in server.llm.astream(server.build_analysis_messages(terms_data), **server.call_options("analysis")):
+            for event in stream.feed(chunk.content):
+                yield event
+    except Exception as e:
+        print(f"Analysis Stream Error: {e}")
+        failed = True
+
+    result = stream.result()
+    if result is None:
+        print("No findings in streamed output. Using fallback.")
+        result = await arecover_analysis(terms_data, stream.parser.buffer)
+        if failed:
+            result = server.mark_degraded(result)
+        for event in server.result_events(result, include_summary=stream.summary is None):
+            yield event
+        await run_in_threadpool(server.cache_result, cache_key, result)
+    elif stream.parser.done:
+        await run_in_threadpool(server.cache_result, cache_key, result)
+
+    yield {"type": "result", **result, "cached": False}
+
+# ============================================================================
+# WORKFLOW 2: CHATBOT
+# ============================================================================
+
+async def achatbot_response(terms_data: str, user_message: str, conversation_id: str,
+                            remember: bool = True, document_id: Optional[str] = None) -> str:
+    """
+    Async version of chatbot_response
+
+    Args:
+        terms_data: The terms and conditions document
+        user_message: User's question
+        conversation_id: Unique ID for this conversation
+        remember: Whether to store the exchange (False for one-shot questions)
+        document_id: Registered document ID, used to reuse the system prompt
+
+    Returns:
+        AI response as string
+    """
+    summary, conversation_history = await run_in_threadpool(server.load_memory, conversation_id)
+    messages = await run_in_threadpool(
+        server.build_chat_messages, terms_data, user_message, conversation_history, document_id, summary
+    )
+
+    try:
+        assistant_response = await achat_answer(messages)
+
+        if remember:
+            await run_in_threadpool(server.store_exchange, conversation_id, user_message, assistant_response)
+
+        return assistant_response
+
+    except Exception as e:
+        print(f"Chatbot Error: {e}")
+        return f"I apologize, but I encountered an error: {str(e)}"
+
+async def astream_chatbot_response(terms_data: str, user_message: str, conversation_id: str,
+                                   remember: bool = True, document_id: Optional[str] = None) -> AsyncIterator[str]:
+    """
+    Async version of stream_chatbot_response, using llm.astream
+    """
+    summary, conversation_history = await run_in_threadpool(server.load_memory, conversation_id)
+    messages = await run_in_threadpool(
+        server.build_chat_messages, terms_data, user_message, conversation_history, document_id, summary
+    )
+
+    parts = []
+    async for text in astream_chat_answer(messages):
+        parts.append(text)
+        yield text
+
+    if remember:
+        await run_in_threadpool(server.store_exchange, conversation_id, user_message, "".join(parts))
+
+async def asse_chat_stream(terms_data: str, user_message: str, conversation_id: str,
+                           start: Dict[str, Any], done_key: str, persistent: bool,
+                           document_id: Optional[str] = None) -> AsyncIterator[str]:
+    """
+    Async version of sse_chat_stream
+    """
+    yield server.sse_event(start, "start")
+
+    parts = []
+    try:
+        async for token in astream_chatbot_response(terms_data, user_message, conversation_id,
+                                                    remember=persistent, document_id=document_id):
+            parts.append(token)
+            yield server.sse_event({"token": token}, "token")
+    except Exception as e:
+        print(f"Chatbot Stream Error: {e}")
+        yield server.sse_event({"error": f"I apologize, but I encountered an error: {str(e)}"}, "error")
+        return
+
+    done = {done_key: "".join(parts)}
+    if persistent:
+        done["conversation_id"] = conversation_id
+    yield server.sse_event(done, "done")
+
+# ============================================================================
+# API ENDPOINTS
+# ============================================================================
+
+async def read_json(request: Request) -> Dict[str, Any]:
+    """Parse the request body, treating an empty or invalid body as {}"""
+    try:
+        data = await request.json()
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+async def health_check(request: Request) -> JSONResponse:
+    """Health check endpoint"""
+    return JSONResponse({
+        "status": "healthy",
+        "message": "Terms Analysis Server is running",
+        "model": server.MODEL_NAME,
+        "small_model": server.SMALL_MODEL_NAME if server.ROUTER_ENABLED else None
+    })
+
+async def analyze(request: Request) -> JSONResponse:
+    """Analyze terms and conditions (same contract as the Flask /api/analyze)"""
+    try:
+        data = await read_json(request)
+        terms_data, document_id = await run_in_threadpool(server.resolve_document, data)
+        mode = server.analysis_mode(data)
+
+        error = server.document_error(terms_data, document_id)
+        if error:
+            return JSONResponse({"error": error[0]}, status_code=error[1])
+
+        if mode not in server.ANALYSIS_MODES:
+            return JSONResponse(
+                {"error": f"mode must be one of: {', '.join(server.ANALYSIS_MODES)}"},
+                status_code=400
+            )
+
+        try:
+            url = server.policy_url(data)
+        except ValueError as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+
+        result, cache_hit = await acached_analysis(terms_data, mode, url)
+
+        return JSONResponse(
+            {"document_id": document_id, **result},
+            headers={"X-Cache": "HIT" if cache_hit else "MISS"}
+        )
+
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+async def analyze_batch(request: Request) -> JSONResponse:
+    """Batch analysis (same contract as the Flask /api/analyze/batch)"""
+    try:
+        data = await read_json(request)
+
+        error = server.batch_request_error(data)
+        if error:
+            return JSONResponse({"error": error}, status_code=400)
+
+        try:
+            max_concurrency = server.batch_concurrency(data.get('max_concurrency'))
+        except ValueError as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+
+        entries, jobs = await run_in_threadpool(server.plan_batch, data['documents'], data.get('mode'))
+        outcomes = await abatch_analysis(jobs, max_concurrency)
+
+        return JSONResponse(server.batch_response(entries, jobs, outcomes))
+
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+async def analyze_stream(request: Request):
+    """Streaming analysis (same contract as the Flask /api/analyze/stream)"""
+    try:
+        data = await read_json(request)
+        terms_data, document_id = await run_in_threadpool(server.resolve_document, data)
+
+        error = server.document_error(terms_data, document_id)
+        if error:
+            return JSONResponse({"error": error[0]}, status_code=error[1])
+
+        async def lines():
+            async for event in astream_analysis(terms_data):
+                yield json.dumps(event) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson", headers=server.SSE_HEADERS)
+
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+async def analyze_html(request: Request) -> JSONResponse:
+    """Extract and analyze a raw HTML page (same contract as the Flask /api/analyze/html)"""
+    try:
+        mode = server.analysis_mode(request.query_params)
+        url = request.query_params.get('url') or None
+
+        if mode not in server.ANALYSIS_MODES:
+            return JSONResponse(
+                {"error": f"mode must be one of: {', '.join(server.ANALYSIS_MODES)}"},
+                status_code=400
+            )
+
+        extractor = LegalTextExtractor(max_html_bytes=server.HTML_MAX_BYTES)
+        try:
+            async for chunk in request.stream():
+                await run_in_threadpool(extractor.feed_bytes, chunk)
+            terms_data = await run_in_threadpool(extractor.finish)
+        except ExtractionError as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+
+        extraction = extraction_stats(extractor, terms_data)
+
+        if not terms_data:
+            return JSONResponse({"error": "No text could be extracted from the HTML"}, status_code=400)
+
+        document_id, _ = await run_in_threadpool(server.document_registry.register, terms_data)
+        result, cache_hit = await acached_analysis(terms_data, mode, url)
+
+        return JSONResponse(
+            {"document_id": document_id, **result, "extraction": extraction},
+            headers={"X-Cache": "HIT" if cache_hit else "MISS"}
+        )
+
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+async def chatbot(request: Request) -> JSONResponse:
+    """Chatbot endpoint (same contract as the Flask /api/chatbot)"""
+    try:
+        data = await read_json(request)
+        terms_data, document_id = await run_in_threadpool(server.resolve_document, data)
+        user_message = data.get('message', '')
+        conversation_id = data.get('conversation_id', str(uuid.uuid4()))
+
+        error = server.document_error(terms_data, document_id)
+        if error:
+            return JSONResponse({"error": error[0]}, status_code=error[1])
+
+        if not user_message:
+            return JSONResponse({"error": "message is required"}, status_code=400)
+
+        response_text = await achatbot_response(terms_data, user_message, conversation_id,
+                                                document_id=document_id)
+
+        return JSONResponse({
+            "response": response_text,
+            "conversation_id": conversation_id
+        })
+
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+async def chat(request: Request) -> JSONResponse:
+    """Chat endpoint for n8n integration (same contract as the Flask /chat)"""
+    try:
+        data = await read_json(request)
+        terms_data, document_id = await run_in_threadpool(server.resolve_document, data)
+        question = data.get('question', '')
+
+        error = server.document_error(terms_data, document_id)
+        if error:
+            return JSONResponse({"error": error[0]}, status_code=error[1])
+
+        if not question:
+            return JSONResponse({"error": "question is required"}, status_code=400)
+
+        conversation_id = str(uuid.uuid4())
+        response_text = await achatbot_response(terms_data, question, conversation_id, remember=False,
+                                                document_id=document_id)
+
+        return JSONResponse({"answer": response_text})
+
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+async def chatbot_stream(request: Request):
+    """Streaming chatbot endpoint (same contract as the Flask /api/chatbot/stream)"""
+    try:
+        data = await read_json(request)
+        terms_data, document_id = await run_in_threadpool(server.resolve_document, data)
+        user_message = data.get('message', '')
+        conversation_id = data.get('conversation_id', str(uuid.uuid4()))
+
+        error = server.document_error(terms_data, document_id)
+        if error:
+            return JSONResponse({"error": error[0]}, status_code=error[1])
+
+        if not user_message:
+            return JSONResponse({"error": "message is required"}, status_code=400)
+
+        events = asse_chat_stream(
+            terms_data, user_message, conversation_id,
+            start={"conversation_id": conversation_id}, done_key="response", persistent=True,
+            document_id=document_id
+        )
+        return StreamingResponse(events, media_type="text/event-stream", headers=server.SSE_HEADERS)
+
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+async def chat_stream(request: Request):
+    """Streaming n8n chat endpoint (same contract as the Flask /chat/stream)"""
+    try:
+        data = await read_json(request)
+        terms_data, document_id = await run_in_threadpool(server.resolve_document, data)
+        question = data.get('question', '')
+
+        error = server.document_error(terms_data, document_id)
+        if error:
+            return JSONResponse({"error": error[0]}, status_code=error[1])
+
+        if not question:
+            return JSONResponse({"error": "question is required"}, status_code=400)
+
+        conversation_id = str(uuid.uuid4())
+
+        events = asse_chat_stream(
+            terms_data, question, conversation_id,
+            start={}, done_key="answer", persistent=False,
+            document_id=document_id
+        )
+        return StreamingResponse(events, media_type="text/event-stream", headers=server.SSE_HEADERS)
+
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+async def register_document(request: Request) -> JSONResponse:
+    """Register a document (same contract as the Flask /api/documents)"""
+    try:
+        data = await read_json(request)
+        terms_data = data.get('terms_data', '')
+
+        if not terms_data:
+            return JSONResponse({"error": "terms_data is required"}, status_code=400)
+
+        document_id, created = await run_in_threadpool(server.document_registry.register, terms_data)
+        info = await run_in_threadpool(server.document_registry.info, document_id)
+
+        return JSONResponse(info, status_code=201 if created else 200)
+
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+async def get_document(request: Request) -> JSONResponse:
+    """Check whether a document is registered"""
+    document_id = request.path_params['document_id']
+    info = await run_in_threadpool(server.document_registry.info, document_id)
+    if info is None:
+        return JSONResponse({"error": f"Unknown document_id: {document_id}"}, status_code=404)
+    return JSONResponse(info)
+
+async def reset_conversation(request: Request) -> JSONResponse:
+    """Reset a conversation"""
+    try:
+        data = await read_json(request)
+        conversation_id = data.get('conversation_id', '')
+
+        await run_in_threadpool(server.conversation_store.delete, conversation_id)
+
+        return JSONResponse({"message": "Conversation reset successfully"})
+
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+async def get_conversation_history(request: Request) -> JSONResponse:
+    """Get conversation history"""
+    try:
+        data = await read_json(request)
+        conversation_id = data.get('conversation_id', '')
+
+        summary, history = await run_in_threadpool(server.load_memory, conversation_id)
+
+        return JSONResponse({
+            "conversation_id": conversation_id,
+            "history": history,
+            "message_count": len(history),
+            "summary": summary
+        })
+
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+def server_stats() -> Dict[str, Any]:
+    # Some stores count their SQLite rows, so this runs in the thread pool
+    return {
+        "analysis_cache": server.analysis_cache.stats(),
+        "analysis_singleflight": analysis_flight.stats(),
+        "conversation_store": server.conversation_store.stats(),
+        "document_registry": server.document_registry.stats(),
+        "conversation_summarizer": server.conversation_summarizer.stats(),
+        "policy_versions": server.policy_versions.stats(),
+        "model_clients": client_stats(),
+        "server_startup": server.startup_stats
+    }
+
+async def get_stats(request: Request) -> JSONResponse:
+    """Server statistics"""
+    return JSONResponse(await run_in_threadpool(server_stats))
+
+async def metrics(request: Request) -> Response:
+    """Prometheus metrics (text exposition format)"""
+    return Response(await run_in_threadpool(render_metrics), media_type=CONTENT_TYPE_LATEST)
+
+# ============================================================================
+# REQUEST METRICS
+# ============================================================================
+
+def route_template(scope: Dict[str, Any]) -> str:
+    """Path template of the route matching a request, so path parameters do not become labels"""
+    for route in routes:
+        match, _ = route.matches(scope)
+        if match != Match.NONE:
+            return route.path
+    return "unmatched"
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording in-flight requests and latency per endpoint
+
+    Latency is measured until the application returns, i.e. after the last
+    chunk of a streamed response.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        endpoint = route_template(scope)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.labels(endpoint=endpoint).inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.labels(endpoint=endpoint).dec()
+            HTTP_REQUEST_LATENCY.labels(
+                endpoint=endpoint, method=scope["method"], status=str(status)
+            ).observe(time.perf_counter() - start)
+
+routes = [
+    Route('/health', health_check, methods=['GET']),
+    Route('/api/analyze', analyze, methods=['POST']),
+    Route('/api/analyze/batch', analyze_batch, methods=['POST']),
+    Route('/api/analyze/html', analyze_html, methods=['POST']),
+    Route('/api/analyze/stream', analyze_stream, methods=['POST']),
+    Route('/api/chatbot', chatbot, methods=['POST']),
+    Route('/api/chatbot/stream', chatbot_stream, methods=['POST']),
+    Route('/chat', chat, methods=['POST']),
+    Route('/chat/stream', chat_stream, methods=['POST']),
+    Route('/api/documents', register_document, methods=['POST']),
+    Route('/api/documents/{document_id}', get_document, methods=['GET']),
+    Route('/api/chatbot/reset', reset_conversation, methods=['POST']),
+    Route('/api/chatbot/history', get_conversation_history, methods=['POST']),
+    Route('/api/stats', get_stats, methods=['GET']),
+    Route('/metrics', metrics, methods=['GET']),
+]
+
+@contextlib.asynccontextmanager
+async def lifespan(app: Starlette) -> AsyncIterator[None]:
+    """Warm up the model clients (async connection pool) before serving"""
+    if server.WARMUP_ENABLED:
+        started = time.perf_counter()
+        models = [server.llm, server.small_llm] if server.small_llm is not None else [server.llm]
+        for model, seconds in (await awarm_up(models, server.WARMUP_PING)).items():
+            print(f"Warmed up {model} in {seconds * 1000:.0f}ms")
+        server.startup_stats["warmup_seconds"] = round(time.perf_counter() - started, 3)
+    print(f"Startup: import {server.startup_stats['import_seconds']:.2f}s, "
+          f"warm-up {server.startup_stats['warmup_seconds']:.2f}s")
+    yield
+
+app = Starlette(
+    routes=routes,
+    lifespan=lifespan,
+    middleware=[
+        Middleware(MetricsMiddleware),
+        Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"]),
+    ],
+)
+
+# Includes importing langchain_server, unless it was imported before this module
+server.startup_stats["import_seconds"] = max(
+    server.startup_stats["import_seconds"], round(time.perf_counter() - STARTUP_STARTED, 3)
+)
+
+# ============================================================================
+# RUN SERVER
+# ============================================================================
+
+if __name__ == '__main__':
+    import uvicorn
+
+    if requires_api_key() and not os.getenv("NVIDIA_API_KEY"):
+        print("❌ ERROR: NVIDIA_API_KEY not set in .env file")
+        exit(1)
+
+    print("=" * 60)
+    print("🚀 Terms & Conditions Analysis Server (async)")
+    print("=" * 60)
+    print(f"Model: {server.MODEL_NAME} (backend: {llm_backend()})")
+    if server.ROUTER_ENABLED:
+        print(f"Small model: {server.SMALL_MODEL_NAME} (escalates to {server.MODEL_NAME})")
+    print("Same endpoints as langchain_server.py, served on port 8000")
+    print("=" * 60)
+
+    uvicorn.run(app, host='0.0.0.0', port=int(os.getenv("ASYNC_PORT", "8000")))
@@ -3,20 +3,18 @@ LangChain integration with NVIDIA's Nemotron-Nano-12B-v2-VL model
 Uses NVIDIA AI Endpoints for inference
 """
 
-from langchain_nvidia_ai_endpoints import ChatNVIDIA
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import ChatPromptTemplate
 import os
 from dotenv import load_dotenv
+from model_clients import LazyChatModel, requires_api_key
 
 # Load environment variables
 load_dotenv()
 
-# Initialize the NVIDIA AI Endpoints
-llm = ChatNVIDIA(
-    model="nvidia/llama-3.3-nemotron-super-49b-v1.5",
-    api_key=os.getenv("NVIDIA_API_KEY"),
+# Initialize the NVIDIA AI Endpoints (or the LLM_BACKEND stand-in, see llm_backends.py).
+# The client is created on first use and shared with the server (see model_clients.py)
+llm = LazyChatModel(
+    "nvidia/llama-3.3-nemotron-super-49b-v1.5",
     temperature=0.3,  
     top_p=0.9,
     max_completion_tokens=4096,
@@ -66,12 +64,16 @@ def chat_with_prompt_template(template_vars: dict) -> str:
     Returns:
         The model's response
     """
+    # Imported here so importing this module does not load the prompt and parser stack
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.prompts import ChatPromptTemplate
+    
     prompt = ChatPromptTemplate.from_messages([
         ("system", "You are a helpful AI assistant specializing in {specialty}."),
         ("user", "{user_input}")
     ])
     
-    chain = prompt | llm | StrOutputParser()
+    chain = prompt | llm.client | StrOutputParser()
     response = chain.invoke(template_vars)
     return response
 
@@ -128,7 +130,7 @@ def multi_turn_conversation(conversation_history: list[dict]) -> str:
 # Example usage
 if __name__ == "__main__":
     # Make sure to set your NVIDIA_API_KEY environment variable
-    if not os.getenv("NVIDIA_API_KEY"):
+    if requires_api_key() and not os.getenv("NVIDIA_API_KEY"):
         print("Please set NVIDIA_API_KEY environment variable")
         exit(1)
     
@@ -0,0 +1,476 @@
+"""
+Pluggable model backends for the server and llm.py
+LLM_BACKEND selects how chat models are created:
+- nvidia (default): the hosted NVIDIA endpoint
+- fake: a deterministic local stand-in with configurable latency, token
+  rate, error rates, slow calls and canned outputs (including malformed JSON that sends
+  the analyzer down its fallback path), for offline benchmarks and profiling
+- record: the NVIDIA endpoint, saving every response to a cassette file
+- replay: answers from recorded cassettes only, never touching the network
+The servers and llm.py do not call create_llm() directly: they get shared,
+lazily created clients from model_clients.py.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import tempfile
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from model_clients import llm_backend, requires_api_key
+from model_router import ESCALATION_INSTRUCTION, LOW_CONFIDENCE_MARKER
+from rule_analyzer import detect_findings
+
+LLM_BACKENDS = ("nvidia", "fake", "record", "replay")
+
+DEFAULT_CASSETTE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cassettes")
+
+# Rough characters per token, used for simulated timing and usage metadata
+CHARS_PER_TOKEN = 4
+
+_TOKEN_RE = re.compile(r"\S+\s*|\s+")
+_TERMS_RE = re.compile(r"TERMS:\s*(.*?)\n\s*Output format", re.DOTALL)
+
+FAKE_SUMMARY = (
+    "These terms grant the company broad rights over the service and your data. "
+    "Several clauses limit your remedies."
+)
+FAKE_FINDINGS = [
+    {"title": "Broad Data Collection", "description": "The service collects personal and usage data.",
+     "flag": "warning", "category": "privacy"},
+    {"title": "Limited Liability", "description": "The company caps or disclaims its liability.",
+     "flag": "warning", "category": "liability"},
+    {"title": "Clear Account Rules", "description": "Account responsibilities are explained plainly.",
+     "flag": "good", "category": "usage"},
+]
+FAKE_CHAT_ANSWER = (
+    "Based on the terms, the company may change the service and these terms, and it limits "
+    "its liability. Check the refund and termination sections for the details that apply to you."
+)
+FAKE_CONVERSATION_SUMMARY = "The user asked about the terms and the assistant summarized the relevant clauses."
+FAKE_REASONING = "Let me go through the clauses one by one and decide how each one affects the user. "
+
+# Call arguments that change the response, so they are part of a cassette's key
+CASSETTE_OPTIONS = ("response_format", "thinking_mode", "max_tokens")
+
+
+class BackendError(RuntimeError):
+    """Raised by the fake backend for simulated upstream errors, and on cassette misses"""
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def messages_text(messages: List[BaseMessage]) -> str:
+    return "\n".join(str(message.content) for message in messages)
+
+
+def usage_metadata(prompt: str, completion: str) -> Dict[str, int]:
+    """Estimated token usage, in the shape of AIMessage.usage_metadata"""
+    input_tokens = estimate_tokens(prompt)
+    output_tokens = estimate_tokens(completion)
+    return {"input_tokens": input_tokens, "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens}
+
+
+def split_tokens(text: str) -> List[str]:
+    """Word-sized stream chunks (whitespace kept, so they join back to text)"""
+    return _TOKEN_RE.findall(text)
+
+
+def _fraction(seed: int, label: str, prompt: str) -> float:
+    # Stable pseudo-random number in [0, 1) for a prompt, independent of call order
+    digest = hashlib.sha256(f"{seed}:{label}:{prompt}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+
+def _result(text: str, prompt: str, usage: Optional[Dict[str, int]] = None) -> ChatResult:
+    message = AIMessage(content=text, usage_metadata=usage or usage_metadata(prompt, text))
+    return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic local chat model
+
+    Outputs depend only on the prompt: analysis prompts get JSON findings
+    for the phrases rule_analyzer finds in the text, fallback prompts get the
+    SUMMARY/FINDING format, and other prompts a canned answer. Whether a call
+    fails or returns malformed JSON is also decided from a hash of the
+    prompt, so a run is reproducible regardless of concurrency.
+
+    With think_chars set, answers start with a <think> block like a
+    reasoning model's, unless the call passes thinking_mode=False. A
+    max_tokens argument cuts the output (reasoning included) at that length.
+
+    flaky_rate and slow_rate simulate upstream jitter instead: they are
+    drawn at random per call, so a retried or hedged call may succeed or be
+    fast where the first attempt was not.
+
+    Args:
+        model_name: Reported model name
+        latency: Seconds before the first token
+        tokens_per_second: Output rate (0 returns the whole text at once)
+        error_rate: Fraction of prompts that raise BackendError
+        malformed_rate: Fraction of analysis prompts answered with broken JSON
+        responses: Canned overrides, [{"contains": "...", "response": "..."}];
+            the first entry whose text occurs in the prompt wins
+        seed: Changes which prompts fail or are malformed
+        think_chars: Length of the simulated reasoning (0 = no reasoning)
+        low_confidence_rate: Fraction of chat prompts that allow it (the
+            router's small-model prompts) answered with LOW_CONFIDENCE_MARKER
+        flaky_rate: Fraction of calls failing with a transient BackendError
+        slow_rate: Fraction of calls delayed by slow_latency extra seconds
+        slow_latency: Extra seconds of a slow call
+    """
+
+    model_name: str = "fake"
+    latency: float = 0.0
+    tokens_per_second: float = 0.0
+    error_rate: float = 0.0
+    malformed_rate: float = 0.0
+    responses: List[Dict[str, str]] = []
+    seed: int = 0
+    think_chars: int = 0
+    low_confidence_rate: float = 0.0
+    flaky_rate: float = 0.0
+    slow_rate: float = 0.0
+    slow_latency: float = 5.0
+
+    @classmethod
+    def from_env(cls, model_name: str) -> "FakeChatModel":
+        """Build the fake backend from FAKE_LLM_* environment variables"""
+        responses = []
+        responses_path = os.getenv("FAKE_LLM_RESPONSES")
+        if responses_path:
+            with open(responses_path, "r", encoding="utf-8") as f:
+                responses = json.load(f)
+        return cls(
+            model_name=model_name,
+            latency=float(os.getenv("FAKE_LLM_LATENCY", "0.2")),
+            tokens_per_second=float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "50")),
+            error_rate=float(os.getenv("FAKE_LLM_ERROR_RATE", "0")),
+            malformed_rate=float(os.getenv("FAKE_LLM_MALFORMED_RATE", "0")),
+            responses=responses,
+            seed=int(os.getenv("FAKE_LLM_SEED", "0")),
+            think_chars=int(os.getenv("FAKE_LLM_THINK_CHARS", "0")),
+            low_confidence_rate=float(os.getenv("FAKE_LLM_LOW_CONFIDENCE_RATE", "0")),
+            flaky_rate=float(os.getenv("FAKE_LLM_FLAKY_RATE", "0")),
+            slow_rate=float(os.getenv("FAKE_LLM_SLOW_RATE", "0")),
+            slow_latency=float(os.getenv("FAKE_LLM_SLOW_LATENCY", "5")),
+        )
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def respond(self, prompt: str, structured: bool = False) -> str:
+        """
+        The fake's answer to a prompt
+
+        Args:
+            prompt: Text of all the messages
+            structured: A response_format was requested; malformed answers are
+                then valid JSON cut off by the token limit, as with
+                schema-constrained decoding, rather than prose around JSON
+
+        Raises:
+            BackendError: For prompts selected by error_rate
+        """
+        if _fraction(self.seed, "error", prompt) < self.error_rate:
+            raise BackendError("Simulated upstream error (503 Service Unavailable)")
+
+        for canned in self.responses:
+            if canned.get("contains", "") in prompt:
+                return canned["response"]
+
+        if '"findings"' in prompt:
+            if _fraction(self.seed, "malformed", prompt) < self.malformed_rate:
+                if structured:
+                    text = json.dumps({"summary": FAKE_SUMMARY, "findings": self._findings(prompt)})
+                    return text[:len(text) * 2 // 3]
+                return 'Here is the analysis you asked for:\n{"summary": "The terms are mostly standard", "findings": [{"title": '
+            return json.dumps({"summary": FAKE_SUMMARY, "findings": self._findings(prompt)})
+        if "FINDING 1:" in prompt:
+            lines = [f"SUMMARY: {FAKE_SUMMARY}", ""]
+            for number, finding in enumerate(self._findings(prompt), 1):
+                lines += [f"FINDING {number}: {finding['title']}", finding["description"],
+                          f"FLAG: {finding['flag']}", f"CATEGORY: {finding['category']}", ""]
+            return "\n".join(lines).strip()
+        if "running summary" in prompt:
+            return FAKE_CONVERSATION_SUMMARY
+        if ESCALATION_INSTRUCTION.strip() in prompt:
+            if _fraction(self.seed, "low_confidence", prompt) < self.low_confidence_rate:
+                return LOW_CONFIDENCE_MARKER
+        return FAKE_CHAT_ANSWER
+
+    def complete(self, prompt: str, options: Dict[str, Any]) -> str:
+        """The fake's output for a call: reasoning, answer and token limit applied"""
+        text = self.respond(prompt, structured="response_format" in options)
+        if self.think_chars and options.get("thinking_mode") is not False:
+            reasoning = (FAKE_REASONING * (self.think_chars // len(FAKE_REASONING) + 1))[:self.think_chars]
+            text = f"<think>\n{reasoning}\n</think>\n\n{text}"
+        max_tokens = options.get("max_tokens")
+        if max_tokens and estimate_tokens(text) > max_tokens:
+            text = text[:max_tokens * CHARS_PER_TOKEN]
+        return text
+
+    def _findings(self, prompt: str) -> List[Dict[str, str]]:
+        match = _TERMS_RE.search(prompt)
+        findings = detect_findings(match.group(1) if match else prompt)[:6]
+        return findings or FAKE_FINDINGS
+
+    def _first_token_seconds(self) -> float:
+        """
+        Seconds before the first token of this call, with simulated jitter
+
+        Raises:
+            BackendError: For calls drawn by flaky_rate
+        """
+        if self.flaky_rate and random.random() < self.flaky_rate:
+            raise BackendError("Simulated transient upstream error (503 Service Unavailable)")
+        if self.slow_rate and random.random() < self.slow_rate:
+            return self.latency + self.slow_latency
+        return self.latency
+
+    def _generation_seconds(self, text: str) -> float:
+        latency = self._first_token_seconds()
+        if not self.tokens_per_second:
+            return latency
+        return latency + estimate_tokens(text) / self.tokens_per_second
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        prompt = messages_text(messages)
+        text = self.complete(prompt, kwargs)
+        time.sleep(self._generation_seconds(text))
+        return _result(text, prompt)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        prompt = messages_text(messages)
+        text = self.complete(prompt, kwargs)
+        await asyncio.sleep(self._generation_seconds(text))
+        return _result(text, prompt)
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        prompt = messages_text(messages)
+        text = self.complete(prompt, kwargs)
+        time.sleep(self._first_token_seconds())
+        for token in split_tokens(text):
+            if self.tokens_per_second:
+                time.sleep(estimate_tokens(token) / self.tokens_per_second)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        prompt = messages_text(messages)
+        text = self.complete(prompt, kwargs)
+        await asyncio.sleep(self._first_token_seconds())
+        for token in split_tokens(text):
+            if self.tokens_per_second:
+                await asyncio.sleep(estimate_tokens(token) / self.tokens_per_second)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+class RecordReplayChatModel(BaseChatModel):
+    """
+    Records a real model's responses to cassette files, or replays them
+
+    Each distinct request (model, messages, stop) is one JSON file named by
+    its hash, so cassettes can be committed, diffed and shared.
+
+    Args:
+        mode: "record" (call inner and save) or "replay" (cassettes only)
+        cassette_dir: Directory holding the cassette files
+        inner: The real chat model (record mode)
+        model_name: Model name, part of the request hash
+        replay_timing: In replay mode, sleep for the recorded duration
+    """
+
+    mode: str = "replay"
+    cassette_dir: str = DEFAULT_CASSETTE_DIR
+    inner: Optional[Any] = None
+    model_name: str = ""
+    replay_timing: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return f"{self.mode}-cassette"
+
+    def cassette_key(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                     options: Optional[Dict[str, Any]] = None) -> str:
+        """Hash identifying a request (messages, stop and the CASSETTE_OPTIONS call arguments)"""
+        request = {
+            "model": self.model_name,
+            "messages": [[message.type, message.content] for message in messages],
+            "stop": stop,
+        }
+        for name in CASSETTE_OPTIONS:
+            if (options or {}).get(name) is not None:
+                request[name] = options[name]
+        payload = json.dumps(request, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def load(self, key: str) -> Dict[str, Any]:
+        """
+        Read a cassette
+
+        Raises:
+            BackendError: If the request was never recorded
+        """
+        path = os.path.join(self.cassette_dir, f"{key}.json")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise BackendError(
+                f"No cassette for request {key[:12]} in {self.cassette_dir} (record it with LLM_BACKEND=record)"
+            ) from None
+
+    def save(self, key: str, messages: List[BaseMessage], text: str, elapsed: float,
+             usage: Optional[Dict[str, int]]) -> None:
+        """Write a cassette atomically"""
+        os.makedirs(self.cassette_dir, exist_ok=True)
+        record = {
+            "model": self.model_name,
+            "messages": [{"role": message.type, "content": message.content} for message in messages],
+            "response": text,
+            "elapsed_s": round(elapsed, 3),
+            "usage": usage,
+            "recorded_at": time.time(),
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=self.cassette_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(record, f, indent=1)
+            os.replace(tmp_path, os.path.join(self.cassette_dir, f"{key}.json"))
+        except OSError as e:
+            print(f"Cassette write error: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def _replay(self, messages: List[BaseMessage], stop: Optional[List[str]],
+                options: Dict[str, Any]) -> Dict[str, Any]:
+        record = self.load(self.cassette_key(messages, stop, options))
+        if not self.replay_timing:
+            record["elapsed_s"] = 0.0
+        return record
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        prompt = messages_text(messages)
+        if self.mode == "replay":
+            record = self._replay(messages, stop, kwargs)
+            time.sleep(record["elapsed_s"])
+            return _result(record["response"], prompt, record.get("usage"))
+
+        started = time.perf_counter()
+        response = self.inner.invoke(messages, stop=stop, **kwargs)
+        usage = getattr(response, "usage_metadata", None)
+        self.save(self.cassette_key(messages, stop, kwargs), messages, response.content,
+                  time.perf_counter() - started, usage)
+        return _result(response.content, prompt, usage)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        prompt = messages_text(messages)
+        if self.mode == "replay":
+            record = self._replay(messages, stop, kwargs)
+            await asyncio.sleep(record["elapsed_s"])
+            return _result(record["response"], prompt, record.get("usage"))
+
+        started = time.perf_counter()
+        response = await self.inner.ainvoke(messages, stop=stop, **kwargs)
+        usage = getattr(response, "usage_metadata", None)
+        self.save(self.cassette_key(messages, stop, kwargs), messages, response.content,
+                  time.perf_counter() - started, usage)
+        return _result(response.content, prompt, usage)
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        if self.mode == "replay":
+            record = self._replay(messages, stop, kwargs)
+            tokens = split_tokens(record["response"])
+            for token in tokens:
+                time.sleep(record["elapsed_s"] / len(tokens))
+                yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+            return
+
+        started = time.perf_counter()
+        parts = []
+        for chunk in self.inner.stream(messages, stop=stop, **kwargs):
+            parts.append(chunk.content)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=chunk.content))
+        self.save(self.cassette_key(messages, stop, kwargs), messages, "".join(parts),
+                  time.perf_counter() - started, None)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        if self.mode == "replay":
+            record = self._replay(messages, stop, kwargs)
+            tokens = split_tokens(record["response"])
+            for token in tokens:
+                await asyncio.sleep(record["elapsed_s"] / len(tokens))
+                yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+            return
+
+        started = time.perf_counter()
+        parts = []
+        async for chunk in self.inner.astream(messages, stop=stop, **kwargs):
+            parts.append(chunk.content)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=chunk.content))
+        self.save(self.cassette_key(messages, stop, kwargs), messages, "".join(parts),
+                  time.perf_counter() - started, None)
+
+
+def create_llm(model: str, backend: Optional[str] = None, **model_kwargs: Any) -> BaseChatModel:
+    """
+    Create the chat model for the configured backend
+
+    Args:
+        model: Model name
+        backend: One of LLM_BACKENDS (defaults to LLM_BACKEND, then "nvidia")
+        **model_kwargs: Sampling settings for the NVIDIA model
+
+    Returns:
+        A LangChain chat model (invoke/batch/stream and their async versions)
+
+    Raises:
+        ValueError: If the backend is unknown
+    """
+    backend = backend or llm_backend()
+    if backend not in LLM_BACKENDS:
+        raise ValueError(f"LLM_BACKEND must be one of: {', '.join(LLM_BACKENDS)}")
+
+    cassette_dir = os.getenv("LLM_CASSETTE_DIR", DEFAULT_CASSETTE_DIR)
+
+    if backend == "fake":
+        return FakeChatModel.from_env(model)
+    if backend == "replay":
+        return RecordReplayChatModel(
+            mode="replay",
+            cassette_dir=cassette_dir,
+            model_name=model,
+            replay_timing=os.getenv("LLM_REPLAY_TIMING", "false").lower() in ("1", "true", "yes"),
+        )
+
+    # Imported here so the fake and replay backends work without the NVIDIA package
+    from langchain_nvidia_ai_endpoints import ChatNVIDIA
+
+    llm = ChatNVIDIA(model=model, api_key=os.getenv("NVIDIA_API_KEY"), **model_kwargs)
+    if backend == "record":
+        return RecordReplayChatModel(mode="record", cassette_dir=cassette_dir, inner=llm, model_name=model)
+    return llm
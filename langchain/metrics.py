@@ -0,0 +1,268 @@
+"""
+Prometheus metrics for the servers
+HTTP latency and in-flight requests per endpoint, upstream model latency,
+time to first token and token counts (via a LangChain callback handler), the
+parse strategy that produced each analysis result, small/large model routing
+decisions, upstream retries, hedges and circuit breaker state, and the sizes
+of the in-process stores, read from their stats() at scrape time.
+With PROMETHEUS_MULTIPROC_DIR set (gunicorn.conf.py sets it), each worker
+process writes its values to files in that directory and /metrics reports
+the sum over all workers.
+"""
+
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+from prometheus_client.core import GaugeMetricFamily
+
+from conversation_memory import estimate_tokens
+
+MULTIPROCESS_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+# Request latencies range from a cached lookup (ms) to a chunked analysis (minutes)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+# Parse strategies of the analysis pipeline, in the order they are tried
+PARSE_STRATEGIES = (
+    "direct", "code_fence", "repaired", "rules", "fallback_regex", "line_parser", "placeholder", "error"
+)
+
+HTTP_REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency, until the last byte of streamed responses",
+    ["endpoint", "method", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests being served",
+    ["endpoint"],
+    multiprocess_mode="livesum",
+)
+LLM_REQUEST_LATENCY = Histogram(
+    "llm_request_duration_seconds",
+    "Upstream model call latency",
+    ["model", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    "llm_time_to_first_token_seconds",
+    "Time to the first streamed token of a model call",
+    ["model"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_REQUESTS_IN_FLIGHT = Gauge(
+    "llm_requests_in_flight",
+    "Upstream model calls in progress",
+    ["model"],
+    multiprocess_mode="livesum",
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "Tokens sent to and generated by the model (estimated when the backend reports no usage)",
+    ["model", "direction"],
+)
+ANALYSIS_PARSE_RESULTS = Counter(
+    "analysis_parse_results_total",
+    "Analysis results by the parse strategy that produced them",
+    ["strategy"],
+)
+MODEL_ROUTING_DECISIONS = Counter(
+    "model_routing_decisions_total",
+    "Routed model calls by the tier that answered and why the small model was escalated",
+    ["kind", "tier", "reason"],
+)
+LLM_UPSTREAM_EVENTS = Counter(
+    "llm_upstream_events_total",
+    "Retries, hedged attempts, deadline misses and circuit breaker transitions of model calls",
+    ["model", "event"],
+)
+LLM_CIRCUIT_OPEN = Gauge(
+    "llm_circuit_open",
+    "1 while calls to the model fail fast because its circuit breaker is open",
+    ["model"],
+    multiprocess_mode="livemax",
+)
+
+for _strategy in PARSE_STRATEGIES:
+    ANALYSIS_PARSE_RESULTS.labels(strategy=_strategy)
+
+
+def record_parse(strategy: str) -> None:
+    """Count an analysis result produced by one of PARSE_STRATEGIES"""
+    ANALYSIS_PARSE_RESULTS.labels(strategy=strategy).inc()
+
+
+def record_route(kind: str, reason: Optional[str]) -> None:
+    """Count a routed call: answered by the small model, or escalated for reason"""
+    tier = "large" if reason else "small"
+    MODEL_ROUTING_DECISIONS.labels(kind=kind, tier=tier, reason=reason or "none").inc()
+
+
+def record_upstream(model: str, event: str) -> None:
+    """Count a retry, hedge, deadline miss or circuit breaker event of a model's calls"""
+    LLM_UPSTREAM_EVENTS.labels(model=model, event=event).inc()
+
+
+def set_circuit_open(model: str, is_open: bool) -> None:
+    LLM_CIRCUIT_OPEN.labels(model=model).set(1 if is_open else 0)
+
+
+class LLMMetricsHandler(BaseCallbackHandler):
+    """
+    Callback handler recording latency, time to first token and token usage
+
+    Token counts come from the response's usage_metadata; when the backend
+    reports none (e.g. some streamed responses) they are estimated from the
+    prompt and output length.
+
+    Args:
+        model: Model label for the recorded metrics
+    """
+
+    # Only updates counters, so it is safe to run on the event loop
+    run_inline = True
+
+    def __init__(self, model: str):
+        self.model = model
+        self._runs: Dict[UUID, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *,
+                            run_id: UUID, **kwargs: Any) -> None:
+        prompt = "".join(str(message.content) for batch in messages for message in batch)
+        with self._lock:
+            self._runs[run_id] = {"start": time.perf_counter(), "prompt_tokens": estimate_tokens(prompt),
+                                  "first_token": False}
+        LLM_REQUESTS_IN_FLIGHT.labels(model=self.model).inc()
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is None or run["first_token"]:
+                return
+            run["first_token"] = True
+        LLM_TIME_TO_FIRST_TOKEN.labels(model=self.model).observe(time.perf_counter() - run["start"])
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._finish(run_id, "ok")
+        if run is None:
+            return
+
+        input_tokens = output_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    input_tokens += usage.get("input_tokens", 0)
+                    output_tokens += usage.get("output_tokens", 0)
+                else:
+                    output_tokens += estimate_tokens(generation.text)
+        LLM_TOKENS.labels(model=self.model, direction="input").inc(input_tokens or run["prompt_tokens"])
+        LLM_TOKENS.labels(model=self.model, direction="output").inc(output_tokens)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id, "error")
+
+    def _finish(self, run_id: UUID, outcome: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return None
+        LLM_REQUESTS_IN_FLIGHT.labels(model=self.model).dec()
+        LLM_REQUEST_LATENCY.labels(model=self.model, outcome=outcome).observe(time.perf_counter() - run["start"])
+        return run
+
+
+def instrument_llm(llm: Any, model: str) -> Any:
+    """Attach an LLMMetricsHandler to a chat model and return the model"""
+    llm.callbacks = list(llm.callbacks or []) + [LLMMetricsHandler(model)]
+    return llm
+
+
+# Characters allowed in the field part of a stats gauge name
+_METRIC_NAME_RE = re.compile(r"[^a-zA-Z0-9_]")
+
+
+class StatsCollector:
+    """
+    Exports the numeric fields of stats() dictionaries as gauges
+
+    Each source becomes gauges named <prefix>_<field>, e.g. the
+    conversation store's "conversations" and "bytes_used" become
+    conversation_store_conversations and conversation_store_bytes_used.
+    Nested dicts of numbers are flattened to <prefix>_<field>_<key>, so
+    "evictions": {"idle": 3} becomes conversation_store_evictions_idle.
+    Boolean and non-numeric fields are skipped.
+
+    Args:
+        sources: Mapping of metric prefix to a function returning a stats dict
+    """
+
+    def __init__(self, sources: Dict[str, Callable[[], Dict[str, Any]]]):
+        self.sources = sources
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        for prefix, stats in self.sources.items():
+            try:
+                values = stats()
+            except Exception as e:
+                print(f"Metrics Error ({prefix}): {e}")
+                continue
+            for field, value in _numeric_fields(values):
+                yield GaugeMetricFamily(f"{prefix}_{field}", f"{prefix} {field.replace('_', ' ')}", value=value)
+
+
+def _numeric_fields(values: Dict[str, Any], parent: str = "") -> Iterator[Tuple[str, float]]:
+    """(field name, value) for the numeric fields of a stats dict, nested dicts flattened"""
+    for field, value in values.items():
+        name = _METRIC_NAME_RE.sub("_", f"{parent}{field}")
+        if isinstance(value, dict):
+            yield from _numeric_fields(value, f"{name}_")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield name, value
+
+
+_stats_collectors: List[StatsCollector] = []
+
+
+def register_stats(sources: Dict[str, Callable[[], Dict[str, Any]]]) -> StatsCollector:
+    """Register a StatsCollector with the default registry"""
+    collector = StatsCollector(sources)
+    REGISTRY.register(collector)
+    _stats_collectors.append(collector)
+    return collector
+
+
+def render_metrics() -> bytes:
+    """
+    Current metrics in the Prometheus text format
+
+    In multiprocess mode the counters, histograms and in-flight gauges are
+    summed over all worker processes; the stats() gauges are those of the
+    worker serving the scrape (the SQLite-backed stores are shared anyway).
+    """
+    if not MULTIPROCESS_DIR:
+        return generate_latest(REGISTRY)
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    for collector in _stats_collectors:
+        registry.register(collector)
+    return generate_latest(registry)
+
+
+def mark_process_dead(pid: int) -> None:
+    """Drop an exited worker's in-flight gauges (multiprocess mode)"""
+    if MULTIPROCESS_DIR:
+        multiprocess.mark_process_dead(pid)
+
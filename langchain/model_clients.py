@@ -0,0 +1,177 @@
+"""
+Lazily created, shared model clients
+Creating a chat model imports the LangChain model stack (and the NVIDIA
+client for the hosted backend), which used to dominate the servers' import
+time. Modules hold a LazyChatModel instead: the client is created by
+get_llm() on first use and shared by every caller asking for the same
+backend, model and settings. warm_up() creates the clients and primes the
+upstream connection at boot, before the first request pays for it.
+Clients of the hosted backend keep their connections alive in a pool and
+are wrapped in upstream.ResilientChatModel (deadlines, retries, circuit
+breaker, hedging).
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+_clients: Dict[Tuple[Any, ...], Any] = {}
+_lock = threading.Lock()
+_stats = {"created": 0, "create_seconds": 0.0}
+
+
+def llm_backend() -> str:
+    """The configured backend name (LLM_BACKEND)"""
+    return os.getenv("LLM_BACKEND", "nvidia").lower()
+
+
+def requires_api_key(backend: Optional[str] = None) -> bool:
+    """True if the backend calls the NVIDIA endpoint"""
+    return (backend or llm_backend()) in ("nvidia", "record")
+
+
+def get_llm(model: str, **model_kwargs: Any) -> Any:
+    """
+    The shared client for a model and its settings, created on first use
+
+    Clients are instrumented for /metrics when they are created, so each
+    attempt of a retried or hedged call is measured.
+
+    Args:
+        model: Model name
+        **model_kwargs: Sampling settings, passed to create_llm()
+
+    Returns:
+        A LangChain chat model for the configured backend
+    """
+    key = (llm_backend(), model, tuple(sorted(model_kwargs.items())))
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            started = time.perf_counter()
+            # Imported here: these pull in the LangChain model stack
+            from llm_backends import create_llm
+            from metrics import instrument_llm
+            from upstream import ResilientChatModel, UpstreamPolicy, pool_connections, resilience_enabled
+
+            policy = UpstreamPolicy.from_env()
+            client = create_llm(model, key[0], **model_kwargs)
+            pool_connections(getattr(client, "inner", None) or client, policy.pool_size)
+            client = instrument_llm(client, model)
+            if resilience_enabled(key[0]):
+                client = ResilientChatModel(client, model, policy)
+            _clients[key] = client
+            _stats["created"] += 1
+            _stats["create_seconds"] += time.perf_counter() - started
+    return client
+
+
+def reset_clients() -> None:
+    """Drop the shared clients; the next use creates new ones"""
+    with _lock:
+        for client in _clients.values():
+            if hasattr(type(client), "close"):
+                client.close()
+        _clients.clear()
+
+
+def client_stats() -> Dict[str, Any]:
+    """Clients held, clients created, the seconds spent creating them and open circuits"""
+    with _lock:
+        return {
+            "clients": len(_clients),
+            "created": _stats["created"],
+            "create_seconds": round(_stats["create_seconds"], 3),
+            "open_circuits": sum(
+                1 for client in _clients.values()
+                if getattr(getattr(client, "breaker", None), "state", "closed") != "closed"
+            ),
+        }
+
+
+class LazyChatModel:
+    """
+    Stand-in for a chat model until its first use
+
+    Attribute access (invoke, batch, stream and their async versions, or a
+    fake backend's settings) goes to the client from get_llm(), so it is
+    created on first use and re-created after reset_clients(). Pass .client
+    where a real Runnable is needed, e.g. in a `prompt | model` chain.
+
+    Args:
+        model: Model name
+        **model_kwargs: Sampling settings, passed to create_llm()
+    """
+
+    def __init__(self, model: str, **model_kwargs: Any):
+        object.__setattr__(self, "model", model)
+        object.__setattr__(self, "model_kwargs", model_kwargs)
+
+    @property
+    def client(self) -> Any:
+        return get_llm(self.model, **self.model_kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.client, name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self.client, name, value)
+
+    def __repr__(self) -> str:
+        return f"LazyChatModel({self.model!r})"
+
+
+def _client(llm: Any) -> Any:
+    return llm.client if isinstance(llm, LazyChatModel) else llm
+
+
+def warm_up(models: List[Any], ping: bool = True) -> Dict[str, float]:
+    """
+    Create model clients ahead of the first request
+
+    With ping, each hosted model also gets a one-token call, which opens
+    and keeps the pooled upstream connection (DNS, TLS). The local backends
+    have no connection to prime and are never pinged.
+
+    Args:
+        models: LazyChatModel instances (or ready clients)
+        ping: Whether to send the priming call
+
+    Returns:
+        Seconds spent per model
+    """
+    ping = ping and llm_backend() == "nvidia"
+    timings = {}
+    for llm in models:
+        started = time.perf_counter()
+        client = _client(llm)
+        if ping:
+            try:
+                client.invoke("ping", max_tokens=1)
+            except Exception as e:
+                print(f"Warm-up Error ({getattr(llm, 'model', llm)}): {e}")
+        timings[getattr(llm, "model", repr(llm))] = time.perf_counter() - started
+    return timings
+
+
+async def awarm_up(models: List[Any], ping: bool = True) -> Dict[str, float]:
+    """
+    Async version of warm_up, priming the async client's connection pool
+    """
+    ping = ping and llm_backend() == "nvidia"
+    timings = {}
+    for llm in models:
+        started = time.perf_counter()
+        client = _client(llm)
+        if ping:
+            try:
+                await client.ainvoke("ping", max_tokens=1)
+            except Exception as e:
+                print(f"Warm-up Error ({getattr(llm, 'model', llm)}): {e}")
+        timings[getattr(llm, "model", repr(llm))] = time.perf_counter() - started
+    return timings
@@ -0,0 +1,85 @@
+"""
+Tiered model routing
+Chat answers and first-pass analyses go to a fast small model; the large
+model is called only when the small model's output is rejected: it failed,
+did not validate, or the model reported low confidence. The checks below
+decide that, and every decision is counted on /metrics
+(model_routing_decisions_total) next to each model's latency.
+"""
+
+import re
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import SystemMessage
+
+from rule_analyzer import detect_findings
+
+DEFAULT_SMALL_MODEL = "meta/llama-3.1-8b-instruct"
+
+# Reply the small model gives when it cannot answer confidently
+LOW_CONFIDENCE_MARKER = "ESCALATE"
+
+ESCALATION_INSTRUCTION = (
+    f"\n\nIf the terms do not let you answer the question confidently, reply with only the word "
+    f"{LOW_CONFIDENCE_MARKER} and nothing else."
+)
+
+# The marker as a whole word at the start, so "ESCALATED ..." or prose is not a decline
+LOW_CONFIDENCE_PATTERN = re.compile(rf"\s*{LOW_CONFIDENCE_MARKER}\b")
+
+
+def with_escalation_instruction(messages: List[Any]) -> List[Any]:
+    """Chat messages for the small model, which may decline with LOW_CONFIDENCE_MARKER"""
+    if messages and isinstance(messages[0], SystemMessage):
+        return [SystemMessage(content=messages[0].content + ESCALATION_INSTRUCTION)] + list(messages[1:])
+    return [SystemMessage(content=ESCALATION_INSTRUCTION.strip())] + list(messages)
+
+
+def is_low_confidence(text: str) -> bool:
+    """
+    True if an answer starts with the low-confidence marker as a whole word
+
+    A streamed answer must be checked with at least one character past the
+    marker (or complete), since "ESCALATE" is also a prefix of "ESCALATED".
+    """
+    return LOW_CONFIDENCE_PATTERN.match(text) is not None
+
+
+def chat_rejection(answer: str) -> Optional[str]:
+    """
+    Why a small-model chat answer must be escalated
+
+    Returns:
+        "empty" or "low_confidence", or None if the answer can be used
+    """
+    if not answer.strip():
+        return "empty"
+    if is_low_confidence(answer):
+        return "low_confidence"
+    return None
+
+
+def analysis_rejection(result: Optional[Dict[str, Any]], terms_data: str, min_findings: int) -> Optional[str]:
+    """
+    Why a small-model analysis must be escalated
+
+    Args:
+        result: Parsed analysis, None if the output did not parse
+        terms_data: The analyzed text
+        min_findings: Fewest findings accepted (the prompt asks for 4-6);
+            0 for chunks and segments, which may hold no notable clause
+
+    Returns:
+        "invalid", "few_findings" or "missed_critical" (the rule scan finds a
+        critical clause the model flagged nothing critical for), or None if
+        the analysis can be used
+    """
+    if result is None:
+        return "invalid"
+    items = result["items"]
+    if len(items) < min_findings:
+        return "few_findings"
+    if not any(item["flag"] == "critical" for item in items):
+        if any(finding["flag"] == "critical" for finding in detect_findings(terms_data)):
+            return "missed_critical"
+    return None
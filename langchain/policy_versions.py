@@ -0,0 +1,205 @@
+"""
+Clause-level version tracking for incremental re-analysis
+Each analyzed URL keeps the hashes of its clauses, grouped into the segments
+that were sent to the model, along with each segment's findings. When a new
+version of the policy arrives, segments whose clauses are all still present
+keep their findings; only the added or edited clauses are analyzed again,
+so the cost of a re-analysis follows the size of the change.
+"""
+
+import hashlib
+import threading
+from collections import Counter, OrderedDict, defaultdict, deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from clause_salience import MIN_CLAUSE_CHARS, split_clauses
+
+
+def clause_hash(clause: str) -> str:
+    """Short content hash of a clause, ignoring whitespace differences"""
+    return hashlib.sha256(" ".join(clause.split()).encode("utf-8")).hexdigest()[:16]
+
+
+def is_boilerplate(clause: str) -> bool:
+    """
+    Navigation-like line (short, no sentence punctuation)
+
+    These carry no terms, so they are never sent to the model and a changed
+    one ("Last updated in July 2020") does not trigger a re-analysis.
+    """
+    return len(clause) < MIN_CLAUSE_CHARS and not clause.rstrip().endswith((".", ";", ":"))
+
+
+def group_positions(positions: List[int], clauses: List[str], segment_chars: int) -> List[List[int]]:
+    """Pack clause positions, in order, into segments of at most segment_chars"""
+    groups: List[List[int]] = []
+    current: List[int] = []
+    used = 0
+    for position in positions:
+        cost = len(clauses[position]) + 1
+        if current and used + cost > segment_chars:
+            groups.append(current)
+            current = []
+            used = 0
+        current.append(position)
+        used += cost
+    if current:
+        groups.append(current)
+    return groups
+
+
+class UpdatePlan:
+    """
+    Which segments of a new policy version can reuse their findings
+
+    A stored segment is reused when every one of its clauses is present in
+    the new version (its findings depend only on that text, not on where it
+    sits). The remaining clauses are packed into new segments for the model.
+
+    Args:
+        terms_data: The new version of the document
+        record: Stored record for the URL (None on the first analysis)
+        segment_chars: Target characters per new segment
+    """
+
+    def __init__(self, terms_data: str, record: Optional[Dict[str, Any]], segment_chars: int):
+        self.clauses = [clause for clause in split_clauses(terms_data) if not is_boilerplate(clause)]
+        self.hashes = [clause_hash(clause) for clause in self.clauses]
+
+        available: Dict[str, deque] = defaultdict(deque)
+        for position, digest in enumerate(self.hashes):
+            available[digest].append(position)
+
+        # (first position in the new version, stored segment)
+        self.kept: List[Tuple[int, Dict[str, Any]]] = []
+        for segment in (record or {}).get("segments", []):
+            needed = Counter(segment["hashes"])
+            if all(len(available[digest]) >= count for digest, count in needed.items()):
+                positions = [available[digest].popleft() for digest in segment["hashes"]]
+                self.kept.append((min(positions), segment))
+
+        remaining = sorted(position for positions in available.values() for position in positions)
+        self.groups = group_positions(remaining, self.clauses, segment_chars)
+
+    @property
+    def empty(self) -> bool:
+        """True if the document has no substantive clauses"""
+        return not self.clauses
+
+    @property
+    def reused_clauses(self) -> int:
+        return sum(len(segment["hashes"]) for _, segment in self.kept)
+
+    @property
+    def analyzed_clauses(self) -> int:
+        return sum(len(group) for group in self.groups)
+
+    def texts(self) -> List[str]:
+        """Text of each new segment, one model call each"""
+        return ["\n".join(self.clauses[position] for position in group) for group in self.groups]
+
+    def complete(self, results: List[Optional[Dict[str, Any]]]) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """
+        Combine reused segments with the results for the new ones
+
+        Args:
+            results: Parsed result per text() entry, None where analysis failed.
+                Failed segments are not stored, so they are retried next time.
+
+        Returns:
+            Tuple of (record to store for the URL, per-segment results with
+            summary and items in document order)
+        """
+        segments = list(self.kept)
+        for group, result in zip(self.groups, results):
+            if result is None:
+                continue
+            segments.append((group[0], {
+                "hashes": [self.hashes[position] for position in group],
+                "summary": result["summary"],
+                "items": result["items"],
+            }))
+        segments.sort(key=lambda entry: entry[0])
+
+        record = {"segments": [segment for _, segment in segments]}
+        segment_results = [
+            {"summary": segment["summary"], "items": segment["items"]}
+            for _, segment in segments
+        ]
+        return record, segment_results
+
+
+class PolicyVersionStore:
+    """
+    Thread-safe LRU store of the latest analyzed version of each URL
+
+    Args:
+        max_urls: Maximum URLs kept in memory
+        persistent_tier: Optional object with get(url) -> record and
+            set(url, record) so versions survive restarts and evictions
+            (e.g. SQLitePolicyTier)
+    """
+
+    def __init__(self, max_urls: int = 1000, persistent_tier: Optional[Any] = None):
+        self.max_urls = max_urls
+        self.persistent = persistent_tier
+        self.full_analyses = 0
+        self.incremental_analyses = 0
+        self.clauses_reused = 0
+        self.clauses_analyzed = 0
+        self._records: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def plan(self, url: str, terms_data: str, segment_chars: int) -> UpdatePlan:
+        """Plan the analysis of a new version of the document at url"""
+        return UpdatePlan(terms_data, self.get(url), segment_chars)
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """Stored record for a URL, or None if it was never analyzed"""
+        with self._lock:
+            record = self._records.get(url)
+            if record is not None:
+                self._records.move_to_end(url)
+                return record
+
+        if not self.persistent:
+            return None
+        record = self.persistent.get(url)
+        if record is not None:
+            with self._lock:
+                self._insert(url, record)
+        return record
+
+    def update(self, url: str, plan: UpdatePlan, record: Dict[str, Any]) -> None:
+        """Store the record produced by plan.complete() and count the reuse"""
+        with self._lock:
+            if plan.kept:
+                self.incremental_analyses += 1
+            else:
+                self.full_analyses += 1
+            self.clauses_reused += plan.reused_clauses
+            self.clauses_analyzed += plan.analyzed_clauses
+            self._insert(url, record)
+        if self.persistent:
+            self.persistent.set(url, record)
+
+    def stats(self) -> Dict[str, Any]:
+        """URL count and reuse counters"""
+        with self._lock:
+            total = self.clauses_reused + self.clauses_analyzed
+            return {
+                "urls": len(self._records),
+                "full_analyses": self.full_analyses,
+                "incremental_analyses": self.incremental_analyses,
+                "clauses_reused": self.clauses_reused,
+                "clauses_analyzed": self.clauses_analyzed,
+                "reuse_rate": round(self.clauses_reused / total, 4) if total else 0.0,
+                "persistent": self.persistent is not None,
+            }
+
+    def _insert(self, url: str, record: Dict[str, Any]) -> None:
+        # Call with the lock held
+        self._records[url] = record
+        self._records.move_to_end(url)
+        while len(self._records) > self.max_urls:
+            self._records.popitem(last=False)
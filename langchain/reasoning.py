@@ -0,0 +1,112 @@
+"""
+Reasoning control for reasoning models
+Nemotron models think before answering unless the system prompt carries
+"/no_think"; the reasoning tokens count against the completion-token limit
+and, when they leak into the answer as <think>...</think> blocks, break JSON
+parsing. The thinking_mode call argument switches reasoning on or off where
+the model supports it (ChatNVIDIA adds the model's prefix), and the helpers
+below remove any think block that still reaches the output.
+"""
+
+from typing import Any, Dict
+
+# "off" suppresses reasoning, "on" requests it, "default" leaves the model's default
+REASONING_MODES = ("off", "on", "default")
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+
+def reasoning_kwargs(mode: str) -> Dict[str, Any]:
+    """Model call arguments for a reasoning mode"""
+    if mode == "off":
+        return {"thinking_mode": False}
+    if mode == "on":
+        return {"thinking_mode": True}
+    return {}
+
+
+def strip_think(text: str) -> str:
+    """
+    Remove reasoning blocks from a complete response
+
+    Besides <think>...</think> blocks, a response that starts inside one (its
+    opening tag was part of the prompt template) loses everything up to the
+    first </think>. An unterminated block runs to the end of the text.
+    """
+    opened = text.find(THINK_OPEN)
+    closed = text.find(THINK_CLOSE)
+    if closed >= 0 and (opened < 0 or closed < opened):
+        text = text[closed + len(THINK_CLOSE):]
+
+    parts = []
+    position = 0
+    while True:
+        start = text.find(THINK_OPEN, position)
+        if start < 0:
+            parts.append(text[position:])
+            break
+        parts.append(text[position:start])
+        end = text.find(THINK_CLOSE, start)
+        if end < 0:
+            break
+        position = end + len(THINK_CLOSE)
+    return "".join(parts)
+
+
+def _partial_tag(text: str, tag: str) -> int:
+    """Length of the longest suffix of text that is a proper prefix of tag"""
+    for length in range(min(len(tag) - 1, len(text)), 0, -1):
+        if text.endswith(tag[:length]):
+            return length
+    return 0
+
+
+class ThinkFilter:
+    """
+    Streaming filter that drops <think>...</think> blocks
+
+    Chunks are fed as they arrive and the visible text is returned at once,
+    except for a possible partial tag at the end of a chunk, which is held
+    back until the next chunk shows whether it is a tag.
+    """
+
+    def __init__(self):
+        self.in_think = False
+        self.held = ""
+        self.dropped_chars = 0
+
+    def feed(self, chunk: str) -> str:
+        """Visible text of a chunk"""
+        text = self.held + chunk
+        self.held = ""
+        visible = []
+
+        while text:
+            tag = THINK_CLOSE if self.in_think else THINK_OPEN
+            index = text.find(tag)
+            if index >= 0:
+                if self.in_think:
+                    self.dropped_chars += index
+                else:
+                    visible.append(text[:index])
+                self.in_think = not self.in_think
+                text = text[index + len(tag):]
+                continue
+
+            held = _partial_tag(text, tag)
+            body = text[:len(text) - held]
+            if self.in_think:
+                self.dropped_chars += len(body)
+            else:
+                visible.append(body)
+            self.held = text[len(text) - held:]
+            break
+
+        return "".join(visible)
+
+    def flush(self) -> str:
+        """Text held back at the end of the stream"""
+        held, self.held = self.held, ""
+        return "" if self.in_think else held
+
@@ -0,0 +1,351 @@
+"""
+LLM-free rule-based analyzer
+A curated phrase library (mandatory arbitration, sale of data, no refunds,
+unilateral changes, ...) compiled into one Aho-Corasick automaton, so a whole
+document is scanned in a single pass and scored in milliseconds. Findings use
+the same title/description/flag/category shape as the model's.
+"""
+
+import re
+from collections import deque
+from typing import Any, Dict, List, Tuple
+
+from document_chunks import FLAG_RANK
+
+# Each rule becomes at most one finding. Phrases are lowercase and matched on
+# word boundaries against the lowercased, whitespace-collapsed document.
+RULES: List[Dict[str, Any]] = [
+    {
+        "title": "Mandatory Arbitration",
+        "description": "Disputes must go to binding arbitration instead of court.",
+        "flag": "critical",
+        "category": "legal",
+        "phrases": [
+            "binding arbitration", "mandatory arbitration", "final and binding arbitration",
+            "resolved by arbitration", "resolved through arbitration", "submit to arbitration",
+            "agree to arbitrate", "arbitration agreement",
+        ],
+    },
+    {
+        "title": "Class Action Waiver",
+        "description": "You give up the right to join a class action or jury trial.",
+        "flag": "critical",
+        "category": "legal",
+        "phrases": [
+            "class action waiver", "waive any right to a jury trial", "waive your right to a jury trial",
+            "waive the right to participate in a class action", "not participate in a class action",
+            "on an individual basis and not as a plaintiff or class member",
+        ],
+    },
+    {
+        "title": "Sale of Personal Data",
+        "description": "Your personal data may be sold to other companies.",
+        "flag": "critical",
+        "category": "privacy",
+        "phrases": [
+            "sell your personal information", "sell your personal data", "sell your data",
+            "sell your information", "sale of your personal information", "sale of personal data",
+            "rent or sell", "sell or rent",
+        ],
+    },
+    {
+        "title": "No Refunds",
+        "description": "Payments are not refundable.",
+        "flag": "critical",
+        "category": "payment",
+        "phrases": [
+            "no refunds", "no refund", "non-refundable", "nonrefundable", "not refundable",
+            "will not be refunded", "all sales are final", "not entitled to a refund",
+            "not eligible for a refund",
+        ],
+    },
+    {
+        "title": "Unilateral Changes to Terms",
+        "description": "The company can change the terms at any time, possibly without notice.",
+        "flag": "critical",
+        "category": "usage",
+        "phrases": [
+            "modify these terms at any time", "change these terms at any time",
+            "amend these terms at any time", "update these terms at any time",
+            "without prior notice", "without notice to you", "at our sole discretion",
+            "in our sole discretion", "reserve the right to modify", "reserve the right to change",
+        ],
+    },
+    {
+        "title": "Perpetual Content License",
+        "description": "You grant a broad, lasting license to content you upload.",
+        "flag": "critical",
+        "category": "usage",
+        "phrases": [
+            "perpetual, irrevocable", "irrevocable, perpetual", "worldwide, royalty-free",
+            "royalty-free, perpetual", "perpetual license", "irrevocable license",
+        ],
+    },
+    {
+        "title": "Limited Liability",
+        "description": "The company disclaims or caps its liability for damages.",
+        "flag": "warning",
+        "category": "liability",
+        "phrases": [
+            "limitation of liability", "shall not be liable", "will not be liable",
+            "not be liable for any", "in no event shall", "to the maximum extent permitted by law",
+        ],
+    },
+    {
+        "title": "Service Provided As Is",
+        "description": "The service comes without warranties.",
+        "flag": "warning",
+        "category": "liability",
+        "phrases": [
+            '"as is"', "provided as is", "on an as is", "as is and as available", '"as available"',
+            "without warranties of any kind",
+            "disclaim all warranties", "without warranty of any kind",
+        ],
+    },
+    {
+        "title": "Indemnification",
+        "description": "You must cover the company's legal costs in some disputes.",
+        "flag": "warning",
+        "category": "liability",
+        "phrases": ["you agree to indemnify", "indemnify and hold harmless", "indemnify, defend and hold harmless"],
+    },
+    {
+        "title": "Data Shared With Third Parties",
+        "description": "Your data may be shared with advertisers, partners or other third parties.",
+        "flag": "warning",
+        "category": "privacy",
+        "phrases": [
+            "share your personal information with", "share your information with",
+            "share your data with", "disclose your personal information to",
+            "third-party advertisers", "third party advertisers", "advertising partners",
+            "with our partners",
+        ],
+    },
+    {
+        "title": "Tracking and Profiling",
+        "description": "Your activity is tracked for analytics or advertising.",
+        "flag": "warning",
+        "category": "privacy",
+        "phrases": [
+            "browsing history", "tracking technologies", "targeted advertising",
+            "interest-based advertising", "device fingerprint", "precise location",
+            "cross-device tracking",
+        ],
+    },
+    {
+        "title": "Automatic Renewal",
+        "description": "Subscriptions renew and charge automatically unless cancelled.",
+        "flag": "warning",
+        "category": "payment",
+        "phrases": [
+            "automatically renew", "automatic renewal", "auto-renew", "auto renew",
+            "renews automatically", "recurring charges", "recurring billing",
+        ],
+    },
+    {
+        "title": "Price Changes",
+        "description": "Fees can be changed by the company.",
+        "flag": "warning",
+        "category": "payment",
+        "phrases": ["change our prices", "change the fees", "prices are subject to change", "modify the fees"],
+    },
+    {
+        "title": "Account Termination",
+        "description": "Your account can be suspended or terminated at the company's discretion.",
+        "flag": "warning",
+        "category": "usage",
+        "phrases": [
+            "terminate your account at any time", "suspend or terminate your account",
+            "terminate or suspend your account", "terminate your access",
+            "for any reason or no reason",
+        ],
+    },
+    {
+        "title": "Foreign Jurisdiction",
+        "description": "Disputes are governed by a specific law and courts chosen by the company.",
+        "flag": "warning",
+        "category": "legal",
+        "phrases": ["exclusive jurisdiction", "governed by the laws of", "governed by and construed"],
+    },
+    {
+        "title": "Clear Refund Policy",
+        "description": "Refunds are available under stated conditions.",
+        "flag": "good",
+        "category": "payment",
+        "phrases": [
+            "full refund", "money-back guarantee", "money back guarantee",
+            "entitled to a refund", "eligible for a refund", "right to cancel",
+        ],
+    },
+    {
+        "title": "Cancel Anytime",
+        "description": "You can cancel your subscription at any time.",
+        "flag": "good",
+        "category": "payment",
+        "phrases": ["cancel at any time", "cancel anytime", "cancel your subscription at any time"],
+    },
+    {
+        "title": "No Sale of Personal Data",
+        "description": "The company states it does not sell your personal data.",
+        "flag": "good",
+        "category": "privacy",
+        "phrases": [
+            "we do not sell your", "we will never sell", "we never sell", "we don't sell",
+            "will not sell your",
+        ],
+    },
+    {
+        "title": "Privacy Rights",
+        "description": "You can access, delete or opt out of the use of your data.",
+        "flag": "good",
+        "category": "privacy",
+        "phrases": [
+            "right to access", "right to erasure", "right to delete", "right to object",
+            "opt out of", "opt-out of", "data portability", "gdpr", "ccpa",
+        ],
+    },
+    {
+        "title": "Data Security",
+        "description": "Data is protected with encryption or other security measures.",
+        "flag": "good",
+        "category": "security",
+        "phrases": ["encrypted", "encryption", "industry-standard security", "secure servers"],
+    },
+    {
+        "title": "Advance Notice of Changes",
+        "description": "The company notifies you before changing the terms.",
+        "flag": "good",
+        "category": "usage",
+        "phrases": ["notify you of any changes", "we will notify you", "days' notice", "days notice", "prior notice of"],
+    },
+]
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_NEGATION_RE = re.compile(r"\b(?:not|never|no|don't|do not|will not|won't)\b")
+
+# Characters before a match searched for a negation ("we do not sell your data")
+NEGATION_WINDOW = 24
+
+
+class PhraseMatcher:
+    """
+    Aho-Corasick automaton over a set of phrases
+
+    Args:
+        phrases: List of (phrase, value) pairs; value is returned on a match
+    """
+
+    def __init__(self, phrases: List[Tuple[str, Any]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[int, Any]]] = [[]]
+
+        for phrase, value in phrases:
+            node = 0
+            for ch in phrase:
+                next_node = self._goto[node].get(ch)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][ch] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                node = next_node
+            self._output[node].append((len(phrase), value))
+
+        # Breadth-first pass to set failure links and merge outputs
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(ch, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def find_all(self, text: str) -> List[Tuple[int, int, Any]]:
+        """
+        All phrase occurrences in text
+
+        Returns:
+            List of (start, end, value) in order of their end position
+        """
+        goto, fail, output = self._goto, self._fail, self._output
+        matches = []
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if output[node]:
+                for length, value in output[node]:
+                    matches.append((i - length + 1, i + 1, value))
+        return matches
+
+
+def _build_matcher() -> PhraseMatcher:
+    return PhraseMatcher([(phrase, index) for index, rule in enumerate(RULES) for phrase in rule["phrases"]])
+
+
+_MATCHER = _build_matcher()
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, straighten quotes and collapse whitespace"""
+    text = text.lower().replace("’", "'").replace("‘", "'")
+    return _WHITESPACE_RE.sub(" ", text)
+
+
+def _on_word_boundary(text: str, start: int, end: int) -> bool:
+    before = text[start - 1] if start > 0 else " "
+    after = text[end] if end < len(text) else " "
+    return not before.isalnum() and not after.isalnum()
+
+
+def _negated(text: str, start: int) -> bool:
+    return bool(_NEGATION_RE.search(text, max(0, start - NEGATION_WINDOW), start))
+
+
+def detect_findings(terms_data: str) -> List[Dict[str, Any]]:
+    """
+    Scan a document with the phrase library
+
+    Phrases preceded by a negation are ignored, so "we do not sell your data"
+    does not count as a sale of data, nor "not entitled to a refund" as a
+    refund policy.
+
+    Args:
+        terms_data: The terms and conditions text
+
+    Returns:
+        One finding per matched rule, most severe first, then in library order
+    """
+    text = normalize_text(terms_data)
+    matched = set()
+    for start, end, index in _MATCHER.find_all(text):
+        if index in matched or not _on_word_boundary(text, start, end):
+            continue
+        if _negated(text, start):
+            continue
+        matched.add(index)
+
+    findings = [
+        {key: RULES[index][key] for key in ("title", "description", "flag", "category")}
+        for index in sorted(matched)
+    ]
+    findings.sort(key=lambda finding: -FLAG_RANK.get(finding["flag"], 0))
+    return findings
+
+
+def summarize_findings(findings: List[Dict[str, Any]]) -> str:
+    """One-sentence summary of a rule-based scan"""
+    if not findings:
+        return "The rule-based scan found none of the common risky or protective clauses."
+
+    counts = {flag: sum(1 for f in findings if f["flag"] == flag) for flag in ("critical", "warning", "good")}
+    return (
+        f"Rule-based scan found {counts['critical']} critical, {counts['warning']} warning and "
+        f"{counts['good']} positive clause types."
+    )
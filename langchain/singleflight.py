@@ -0,0 +1,120 @@
+"""
+Single-flight request coalescing
+Concurrent calls with the same key share one execution: the first caller
+runs the function and everyone else waits for its result
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+
+
+class SingleFlight:
+    """
+    Thread-based single-flight group (for the Flask server)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run fn once for all concurrent callers with the same key
+
+        Args:
+            key: Identity of the work (e.g. a document hash)
+            fn: Function to run if no identical call is in flight
+
+        Returns:
+            Tuple of (result, whether it was shared from another caller's
+            execution). Exceptions raised by fn propagate to every caller.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+        return call.result, False
+
+    def stats(self) -> Dict[str, int]:
+        """Execution and coalescing counters"""
+        with self._lock:
+            return {
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls),
+            }
+
+
+class AsyncSingleFlight:
+    """
+    asyncio single-flight group (for the ASGI server)
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Await fn() once for all concurrent callers with the same key
+
+        The shared task is shielded, so a caller that disconnects does not
+        cancel the work for the others.
+
+        Returns:
+            Tuple of (result, whether it was shared from another caller's
+            execution)
+        """
+        task = self._calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task), True
+
+        self.executions += 1
+        task = asyncio.ensure_future(fn())
+        self._calls[key] = task
+        task.add_done_callback(lambda _: self._calls.pop(key, None))
+
+        return await asyncio.shield(task), False
+
+    def stats(self) -> Dict[str, int]:
+        """Execution and coalescing counters"""
+        return {
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls),
+        }
@@ -0,0 +1,454 @@
+"""
+SQLite storage backend for conversations, analysis results, documents and
+policy versions
+Survives restarts and can be shared by several worker processes on the same
+machine. Uses WAL mode, a small connection pool, cached (prepared)
+statements, batched writes and indexes on conversation_id and document hash.
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from conversation_store import pack_message, unpack_message
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    conversation_id TEXT PRIMARY KEY,
+    last_access REAL NOT NULL,
+    summary TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_conversations_last_access ON conversations (last_access);
+
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    conversation_id TEXT NOT NULL,
+    role INTEGER NOT NULL,
+    content BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_conversation ON messages (conversation_id, id);
+
+CREATE TABLE IF NOT EXISTS analyses (
+    doc_hash TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    result TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS documents (
+    document_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    content BLOB NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS policy_versions (
+    url TEXT PRIMARY KEY,
+    updated_at REAL NOT NULL,
+    record TEXT NOT NULL
+);
+"""
+
+# Statements are module constants so sqlite3's statement cache reuses the
+# compiled (prepared) form on every call
+SQL_TOUCH_CONVERSATION = (
+    "INSERT INTO conversations (conversation_id, last_access) VALUES (?, ?) "
+    "ON CONFLICT (conversation_id) DO UPDATE SET last_access = excluded.last_access"
+)
+SQL_INSERT_MESSAGE = "INSERT INTO messages (conversation_id, role, content) VALUES (?, ?, ?)"
+SQL_TRIM_MESSAGES = (
+    "DELETE FROM messages WHERE conversation_id = ? AND id <= ("
+    "SELECT id FROM messages WHERE conversation_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)"
+)
+SQL_SELECT_MESSAGES = (
+    "SELECT m.id, m.role, m.content FROM messages m "
+    "JOIN conversations c ON c.conversation_id = m.conversation_id "
+    "WHERE m.conversation_id = ? AND c.last_access >= ? ORDER BY m.id"
+)
+SQL_SELECT_SUMMARY = "SELECT summary FROM conversations WHERE conversation_id = ? AND last_access >= ?"
+SQL_UPDATE_SUMMARY = "UPDATE conversations SET summary = ? WHERE conversation_id = ?"
+SQL_DELETE_SUMMARIZED = "DELETE FROM messages WHERE conversation_id = ? AND id <= ?"
+SQL_CONVERSATION_EXISTS = "SELECT 1 FROM conversations WHERE conversation_id = ? AND last_access >= ?"
+SQL_DELETE_MESSAGES = "DELETE FROM messages WHERE conversation_id = ?"
+SQL_DELETE_CONVERSATION = "DELETE FROM conversations WHERE conversation_id = ?"
+SQL_SELECT_IDLE = "SELECT conversation_id FROM conversations WHERE last_access < ? LIMIT ?"
+SQL_SELECT_ANALYSIS = "SELECT result, created_at FROM analyses WHERE doc_hash = ?"
+SQL_UPSERT_ANALYSIS = (
+    "INSERT INTO analyses (doc_hash, created_at, result) VALUES (?, ?, ?) "
+    "ON CONFLICT (doc_hash) DO UPDATE SET created_at = excluded.created_at, result = excluded.result"
+)
+SQL_DELETE_ANALYSIS = "DELETE FROM analyses WHERE doc_hash = ?"
+SQL_SELECT_DOCUMENT = "SELECT content, created_at FROM documents WHERE document_id = ?"
+SQL_UPSERT_DOCUMENT = (
+    "INSERT INTO documents (document_id, created_at, content) VALUES (?, ?, ?) "
+    "ON CONFLICT (document_id) DO UPDATE SET created_at = excluded.created_at"
+)
+SQL_DELETE_DOCUMENT = "DELETE FROM documents WHERE document_id = ?"
+SQL_SELECT_POLICY = "SELECT record, updated_at FROM policy_versions WHERE url = ?"
+SQL_UPSERT_POLICY = (
+    "INSERT INTO policy_versions (url, updated_at, record) VALUES (?, ?, ?) "
+    "ON CONFLICT (url) DO UPDATE SET updated_at = excluded.updated_at, record = excluded.record"
+)
+SQL_DELETE_POLICY = "DELETE FROM policy_versions WHERE url = ?"
+
+# Columns added after the first release, applied to existing databases
+MIGRATIONS = [
+    ("conversations", "summary", "ALTER TABLE conversations ADD COLUMN summary TEXT NOT NULL DEFAULT ''"),
+]
+
+
+class SQLiteDatabase:
+    """
+    Pooled connections to one SQLite file
+
+    Args:
+        path: Database file path
+        pool_size: Maximum idle connections kept for reuse
+    """
+
+    def __init__(self, path: str, pool_size: int = 8):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=pool_size)
+
+        with self.connection() as conn:
+            conn.executescript(SCHEMA)
+            for table, column, statement in MIGRATIONS:
+                columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+                if column not in columns:
+                    conn.execute(statement)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path,
+            timeout=30,
+            isolation_level=None,  # Explicit BEGIN/COMMIT only
+            check_same_thread=False,
+            cached_statements=256,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection from the pool"""
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            try:
+                self._pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection and run the block in one write transaction"""
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def close(self) -> None:
+        """
+        Close the pooled connections
+
+        Call before forking worker processes: a connection must not be used
+        on both sides of a fork. Later calls open new connections.
+        """
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def size_bytes(self) -> int:
+        """Size of the database file plus its write-ahead log"""
+        total = 0
+        for suffix in ("", "-wal"):
+            try:
+                total += os.path.getsize(self.path + suffix)
+            except OSError:
+                pass
+        return total
+
+
+class SQLiteConversationStore:
+    """
+    Conversation history in SQLite, with the same interface as ConversationStore
+
+    Args:
+        db: Shared SQLiteDatabase
+        idle_ttl_seconds: Conversations not written for this long are pruned
+        max_messages: Messages kept per conversation (oldest dropped first)
+        prune_interval_seconds: How often writes also prune idle conversations
+    """
+
+    def __init__(self, db: SQLiteDatabase, idle_ttl_seconds: float = 60 * 60,
+                 max_messages: int = 20, prune_interval_seconds: float = 60):
+        self.db = db
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_messages = max_messages
+        self.prune_interval_seconds = prune_interval_seconds
+        self.evictions = {"idle": 0}
+        self._last_prune = 0.0
+        self._prune_lock = threading.Lock()
+
+    def __contains__(self, conversation_id: str) -> bool:
+        with self.db.connection() as conn:
+            row = conn.execute(
+                SQL_CONVERSATION_EXISTS, (conversation_id, time.time() - self.idle_ttl_seconds)
+            ).fetchone()
+        return row is not None
+
+    def __len__(self) -> int:
+        with self.db.connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+    def get_history(self, conversation_id: str) -> List[Dict[str, str]]:
+        """
+        Get a conversation's messages as {"role", "content"} dicts
+
+        Idle time is measured from the last write, so reads do not write.
+        """
+        with self.db.connection() as conn:
+            rows = conn.execute(
+                SQL_SELECT_MESSAGES, (conversation_id, time.time() - self.idle_ttl_seconds)
+            ).fetchall()
+        return [unpack_message((role, bytes(content))) for _, role, content in rows]
+
+    def get_memory(self, conversation_id: str) -> Tuple[str, List[Tuple[int, Dict[str, str]]]]:
+        """
+        Get a conversation's running summary and its not-yet-summarized messages
+
+        Returns:
+            Tuple of (summary, [(sequence number, message dict), ...])
+        """
+        cutoff = time.time() - self.idle_ttl_seconds
+        with self.db.connection() as conn:
+            row = conn.execute(SQL_SELECT_SUMMARY, (conversation_id, cutoff)).fetchone()
+            if row is None:
+                return "", []
+            rows = conn.execute(SQL_SELECT_MESSAGES, (conversation_id, cutoff)).fetchall()
+        return row[0], [(id_, unpack_message((role, bytes(content)))) for id_, role, content in rows]
+
+    def fold(self, conversation_id: str, summary: str, through_sequence: int) -> bool:
+        """
+        Replace the summary and drop the messages it now covers
+
+        Returns:
+            True if the conversation still exists
+        """
+        with self.db.transaction() as conn:
+            if conn.execute(SQL_UPDATE_SUMMARY, (summary, conversation_id)).rowcount == 0:
+                return False
+            conn.execute(SQL_DELETE_SUMMARIZED, (conversation_id, through_sequence))
+        return True
+
+    def append_exchange(self, conversation_id: str, user_message: str, assistant_response: str) -> None:
+        """Append a question/answer pair in a single transaction"""
+        self.append_exchanges([(conversation_id, user_message, assistant_response)])
+
+    def append_exchanges(self, exchanges: Sequence[Tuple[str, str, str]]) -> None:
+        """
+        Append many question/answer pairs in one transaction
+
+        Args:
+            exchanges: (conversation_id, user_message, assistant_response) tuples
+        """
+        now = time.time()
+        rows = []
+        touched = set()
+        for conversation_id, user_message, assistant_response in exchanges:
+            for role, content in (("user", user_message), ("assistant", assistant_response)):
+                code, data = pack_message(role, content)
+                rows.append((conversation_id, code, data))
+            touched.add(conversation_id)
+
+        with self.db.transaction() as conn:
+            conn.executemany(SQL_TOUCH_CONVERSATION, [(cid, now) for cid in touched])
+            conn.executemany(SQL_INSERT_MESSAGE, rows)
+            conn.executemany(
+                SQL_TRIM_MESSAGES, [(cid, cid, self.max_messages) for cid in touched]
+            )
+
+        self._maybe_prune(now)
+
+    def delete(self, conversation_id: str) -> bool:
+        """
+        Remove a conversation
+
+        Returns:
+            True if the conversation existed
+        """
+        with self.db.transaction() as conn:
+            conn.execute(SQL_DELETE_MESSAGES, (conversation_id,))
+            return conn.execute(SQL_DELETE_CONVERSATION, (conversation_id,)).rowcount > 0
+
+    def prune_idle(self, batch_size: int = 1000) -> int:
+        """
+        Delete conversations idle for longer than the TTL
+
+        Returns:
+            Number of conversations removed
+        """
+        cutoff = time.time() - self.idle_ttl_seconds
+        removed = 0
+        while True:
+            with self.db.transaction() as conn:
+                ids = [(row[0],) for row in conn.execute(SQL_SELECT_IDLE, (cutoff, batch_size))]
+                if not ids:
+                    break
+                conn.executemany(SQL_DELETE_MESSAGES, ids)
+                conn.executemany(SQL_DELETE_CONVERSATION, ids)
+            removed += len(ids)
+        self.evictions["idle"] += removed
+        return removed
+
+    def _maybe_prune(self, now: float) -> None:
+        if now - self._last_prune < self.prune_interval_seconds:
+            return
+        if not self._prune_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_prune = now
+            self.prune_idle()
+        finally:
+            self._prune_lock.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Entry counts, bytes on disk and eviction counters"""
+        with self.db.connection() as conn:
+            conversations = conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+            messages = conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+        return {
+            "backend": "sqlite",
+            "conversations": conversations,
+            "messages": messages,
+            "bytes_used": self.db.size_bytes(),
+            "evictions": dict(self.evictions),
+        }
+
+
+class SQLiteAnalysisTier:
+    """
+    Persistent tier for AnalysisCache, keyed by document hash
+
+    Args:
+        db: Shared SQLiteDatabase
+        ttl_seconds: How long a stored result stays valid
+    """
+
+    def __init__(self, db: SQLiteDatabase, ttl_seconds: float):
+        self.db = db
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self.get_entry(key)
+        return entry[0] if entry else None
+
+    def get_entry(self, key: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """The stored result and the time it expires at, or None"""
+        with self.db.connection() as conn:
+            row = conn.execute(SQL_SELECT_ANALYSIS, (key,)).fetchone()
+        if row is None:
+            return None
+
+        result, created_at = row
+        expires_at = created_at + self.ttl_seconds
+        if expires_at < time.time():
+            with self.db.transaction() as conn:
+                conn.execute(SQL_DELETE_ANALYSIS, (key,))
+            return None
+
+        return json.loads(result), expires_at
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        try:
+            with self.db.transaction() as conn:
+                conn.execute(SQL_UPSERT_ANALYSIS, (key, time.time(), json.dumps(value)))
+        except sqlite3.Error as e:
+            print(f"Analysis cache write error: {e}")
+
+
+class SQLiteDocumentTier:
+    """
+    Persistent tier for DocumentRegistry, storing compressed document bytes
+
+    Args:
+        db: Shared SQLiteDatabase
+        ttl_seconds: How long a document stays valid after it was last registered
+    """
+
+    def __init__(self, db: SQLiteDatabase, ttl_seconds: float):
+        self.db = db
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, document_id: str) -> Optional[bytes]:
+        with self.db.connection() as conn:
+            row = conn.execute(SQL_SELECT_DOCUMENT, (document_id,)).fetchone()
+        if row is None:
+            return None
+
+        content, created_at = row
+        if created_at + self.ttl_seconds < time.time():
+            with self.db.transaction() as conn:
+                conn.execute(SQL_DELETE_DOCUMENT, (document_id,))
+            return None
+
+        return bytes(content)
+
+    def set(self, document_id: str, content: bytes) -> None:
+        try:
+            with self.db.transaction() as conn:
+                conn.execute(SQL_UPSERT_DOCUMENT, (document_id, time.time(), content))
+        except sqlite3.Error as e:
+            print(f"Document registry write error: {e}")
+
+
+class SQLitePolicyTier:
+    """
+    Persistent tier for PolicyVersionStore, keyed by URL
+
+    Args:
+        db: Shared SQLiteDatabase
+        ttl_seconds: How long a stored version stays valid after its last analysis
+    """
+
+    def __init__(self, db: SQLiteDatabase, ttl_seconds: float):
+        self.db = db
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        with self.db.connection() as conn:
+            row = conn.execute(SQL_SELECT_POLICY, (url,)).fetchone()
+        if row is None:
+            return None
+
+        record, updated_at = row
+        if updated_at + self.ttl_seconds < time.time():
+            with self.db.transaction() as conn:
+                conn.execute(SQL_DELETE_POLICY, (url,))
+            return None
+
+        return json.loads(record)
+
+    def set(self, url: str, record: Dict[str, Any]) -> None:
+        try:
+            with self.db.transaction() as conn:
+                conn.execute(SQL_UPSERT_POLICY, (url, time.time(), json.dumps(record)))
+        except sqlite3.Error as e:
+            print(f"Policy version write error: {e}")
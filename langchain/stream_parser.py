@@ -0,0 +1,117 @@
+"""
+Incremental parser for the analyzer's JSON output
+Scans model output as it streams in and reports the summary and each
+finding as soon as that value is complete, without waiting for the whole
+JSON document
+"""
+
+import json
+from typing import Any, Dict, List, Tuple
+
+
+class IncrementalAnalysisParser:
+    """
+    Character-level scanner for {"summary": "...", "findings": [{...}, ...]}
+
+    Text before the first "{" (stray reasoning, a ```json fence) is skipped.
+    Call feed() with each streamed chunk; it returns the events completed by
+    that chunk as ("summary", str) or ("finding", dict) tuples.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.done = False
+        self._pos = 0
+        # Open containers; each frame is a dict with type, key, expect_key,
+        # start offset and whether it is (or is inside) the findings array
+        self._stack: List[Dict[str, Any]] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        """
+        Consume the next chunk of model output
+
+        Args:
+            text: Newly streamed text
+
+        Returns:
+            Events completed by this chunk, in order
+        """
+        events: List[Tuple[str, Any]] = []
+        self.buffer += text
+        buf = self.buffer
+        i = self._pos
+
+        while i < len(buf) and not self.done:
+            ch = buf[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._on_string(buf[self._string_start:i + 1], events)
+            elif not self._stack:
+                if ch == "{":
+                    self._stack.append(self._frame("{", i, in_findings=False))
+            elif ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch in "{[":
+                self._open(ch, i)
+            elif ch in "}]":
+                self._close(i, events)
+            elif ch == ":":
+                self._stack[-1]["expect_key"] = False
+            elif ch == ",":
+                if self._stack[-1]["type"] == "{":
+                    self._stack[-1]["expect_key"] = True
+
+            i += 1
+
+        self._pos = i
+        return events
+
+    @staticmethod
+    def _frame(kind: str, start: int, in_findings: bool) -> Dict[str, Any]:
+        return {
+            "type": kind,
+            "key": None,
+            "expect_key": kind == "{",
+            "start": start,
+            "in_findings": in_findings,
+            "is_findings": False,
+        }
+
+    def _open(self, kind: str, start: int) -> None:
+        parent = self._stack[-1]
+        frame = self._frame(kind, start, in_findings=parent["is_findings"])
+        if kind == "[" and len(self._stack) == 1 and parent["key"] == "findings":
+            frame["is_findings"] = True
+        self._stack.append(frame)
+
+    def _close(self, end: int, events: List[Tuple[str, Any]]) -> None:
+        frame = self._stack.pop()
+        if frame["type"] == "{" and frame["in_findings"]:
+            try:
+                events.append(("finding", json.loads(self.buffer[frame["start"]:end + 1])))
+            except json.JSONDecodeError:
+                pass
+        if not self._stack:
+            self.done = True
+
+    def _on_string(self, raw: str, events: List[Tuple[str, Any]]) -> None:
+        frame = self._stack[-1]
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            return
+
+        if frame["type"] == "{" and frame["expect_key"]:
+            frame["key"] = value
+        elif len(self._stack) == 1 and frame["key"] == "summary":
+            events.append(("summary", value))
@@ -0,0 +1,132 @@
+"""
+Schema-constrained analysis output and local JSON repair
+The analysis call asks the model for output matching ANALYSIS_SCHEMA (the
+OpenAI-compatible response_format the NVIDIA endpoints accept), so the
+findings arrive as valid JSON in one call. Output that is still malformed,
+usually cut off by the token limit, is repaired here instead of being sent
+back to the model.
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+FLAGS = ["critical", "warning", "good"]
+CATEGORIES = ["privacy", "payment", "security", "liability", "usage", "legal", "general"]
+
+ANALYSIS_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "summary": {"type": "string"},
+        "findings": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "title": {"type": "string"},
+                    "description": {"type": "string"},
+                    "flag": {"type": "string", "enum": FLAGS},
+                    "category": {"type": "string", "enum": CATEGORIES},
+                },
+                "required": ["title", "description", "flag", "category"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["summary", "findings"],
+    "additionalProperties": False,
+}
+
+# Truncation points tried, newest first, before giving up on a response
+MAX_REPAIR_ATTEMPTS = 200
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def analysis_response_format() -> Dict[str, Any]:
+    """response_format model argument constraining output to ANALYSIS_SCHEMA"""
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": "terms_analysis", "schema": ANALYSIS_SCHEMA, "strict": True},
+    }
+
+
+def _scan(text: str) -> Tuple[str, List[Tuple[int, str]]]:
+    """
+    Drop trailing commas and find the points where the JSON could be cut
+
+    Returns:
+        Tuple of (text without trailing commas, list of (cut position,
+        closing brackets needed at that position))
+    """
+    out: List[str] = []
+    cuts: List[Tuple[int, str]] = []
+    stack: List[str] = []
+    in_string = False
+    escaped = False
+
+    for ch in text:
+        if in_string:
+            out.append(ch)
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+                cuts.append((len(out), "".join(_CLOSERS[b] for b in reversed(stack))))
+            continue
+
+        if ch == '"':
+            in_string = True
+        elif ch in _CLOSERS:
+            stack.append(ch)
+        elif ch in "}]":
+            if not stack or _CLOSERS[stack[-1]] != ch:
+                break
+            stack.pop()
+            # A trailing comma before a closing bracket is not valid JSON
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+        out.append(ch)
+        if ch in "}]" or (ch.isdigit() and stack):
+            cuts.append((len(out), "".join(_CLOSERS[b] for b in reversed(stack))))
+        if not stack and ch == "}":
+            break
+
+    return "".join(out), cuts
+
+
+def repair_json(text: str) -> Optional[Any]:
+    """
+    Parse the JSON object in a model response, repairing it if needed
+
+    Leading prose and code fences are skipped and trailing commas dropped.
+    Output cut off mid-object is closed at the last point where it can be,
+    so the complete findings before the cut are kept and the partial one
+    is dropped.
+
+    Args:
+        text: Raw model output
+
+    Returns:
+        The parsed object, or None if nothing could be recovered
+    """
+    start = text.find("{")
+    if start < 0:
+        return None
+
+    cleaned, cuts = _scan(text[start:])
+    try:
+        return json.loads(cleaned)
+    except json.JSONDecodeError:
+        pass
+
+    for position, closers in reversed(cuts[-MAX_REPAIR_ATTEMPTS:]):
+        candidate = cleaned[:position].rstrip().rstrip(",:") + closers
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+    return None
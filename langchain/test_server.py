@@ -5,6 +5,8 @@ Tests both analyzer and chatbot workflows
 
 import requests
 import json
+import gzip
+import time
 
 BASE_URL = "http://localhost:5000"
 
@@ -459,6 +461,133 @@ def test_analyzer():
         print(f"Error: {response.text}")
         return False
 
+def test_analyze_html():
+    """Test server-side HTML extraction + analysis"""
+    print("\n" + "="*60)
+    print("TEST: HTML Analyzer")
+    print("="*60)
+    
+    html = "<html><body><nav>Home | Pricing | Sign in</nav><main>" + "".join(
+        f"<p>{line}</p>" for line in SAMPLE_TERMS.splitlines() if line.strip()
+    ) + "</main><footer>© 2025 n8n</footer></body></html>"
+    
+    response = requests.post(
+        f"{BASE_URL}/api/analyze/html",
+        data=gzip.compress(html.encode("utf-8")),
+        headers={"Content-Type": "text/html", "Content-Encoding": "gzip"}
+    )
+    print(f"Status Code: {response.status_code}")
+    
+    if response.status_code == 200:
+        result = response.json()
+        extraction = result['extraction']
+        print(f"\n📊 SCORE: {result['score']}/100")
+        print(f"✂️  Extracted {extraction['text_chars']} of {extraction['html_chars']} chars "
+              f"({extraction['reduction_percent']}% smaller) in {extraction['extraction_ms']}ms")
+        return True
+    else:
+        print(f"Error: {response.text}")
+        return False
+
+def test_analyze_batch():
+    """Test analyzing several documents (with a duplicate and a bad ID) in one request"""
+    print("\n" + "="*60)
+    print("TEST: Batch Analyzer")
+    print("="*60)
+    
+    response = requests.post(
+        f"{BASE_URL}/api/analyze/batch",
+        json={
+            "documents": [
+                {"terms_data": SAMPLE_TERMS},
+                {"terms_data": SAMPLE_TERMS},
+                {"document_id": "doc_unknown"}
+            ],
+            "max_concurrency": 2
+        }
+    )
+    print(f"Status Code: {response.status_code}")
+    
+    if response.status_code != 200:
+        print(f"Error: {response.text}")
+        return False
+    
+    result = response.json()
+    print(f"📦 {len(result['results'])} documents, {result['unique_documents']} unique, {result['errors']} errors")
+    for item in result['results']:
+        if "error" in item:
+            print(f"  [{item['index']}] ❌ {item['status']}: {item['error']}")
+        else:
+            print(f"  [{item['index']}] Score {item['score']}/100 (cached: {item['cached']})")
+    
+    return result['unique_documents'] == 1 and result['errors'] == 1
+
+def test_incremental_analysis():
+    """Test that a revised policy at the same URL only re-analyzes its changed clauses"""
+    print("\n" + "="*60)
+    print("TEST: Incremental Re-analysis")
+    print("="*60)
+    
+    # A fresh URL per run, so neither version is served from an earlier run's cache
+    url = f"https://n8n.io/legal/self-serve-terms?run={time.time_ns()}"
+    revised = SAMPLE_TERMS.replace(
+        "Last updated in July 2020",
+        "Last updated in January 2025"
+    ).replace(
+        "You must keep your account details safe.",
+        "You must keep your account details safe. We may share your account details with our partners."
+    )
+    
+    reused = []
+    for label, terms in (("Original", SAMPLE_TERMS), ("Revised", revised)):
+        response = requests.post(
+            f"{BASE_URL}/api/analyze",
+            json={"terms_data": terms, "url": url, "mode": "chunked"}
+        )
+        print(f"{label}: {response.status_code} (X-Cache: {response.headers.get('X-Cache')})")
+        if response.status_code != 200:
+            print(f"Error: {response.text}")
+            return False
+        print(f"  Score: {response.json()['score']}/100")
+        
+        versions = requests.get(f"{BASE_URL}/api/stats").json()["policy_versions"]
+        reused.append(versions['clauses_reused'])
+    
+    print(f"♻️  Clauses reused: {versions['clauses_reused']} | analyzed: {versions['clauses_analyzed']}")
+    return reused[1] - reused[0] > 0
+
+def test_document_registry():
+    """Test registering a document once and chatting by document_id"""
+    print("\n" + "="*60)
+    print("TEST: Document Registry")
+    print("="*60)
+    
+    response = requests.post(
+        f"{BASE_URL}/api/documents",
+        json={"terms_data": SAMPLE_TERMS}
+    )
+    print(f"Status Code: {response.status_code}")
+    
+    if response.status_code not in (200, 201):
+        print(f"Error: {response.text}")
+        return False
+    
+    document = response.json()
+    print(f"📄 {document['document_id'][:16]}... ({document['chars']} chars stored in {document['stored_bytes']} bytes)")
+    
+    response = requests.post(
+        f"{BASE_URL}/api/chatbot",
+        json={"document_id": document['document_id'], "message": "Can I get a refund?"}
+    )
+    print(f"Chat by document_id: {response.status_code}")
+    
+    if response.status_code == 200:
+        print(f"🤖 {response.json()['response'][:200]}")
+        return True
+    else:
+        print(f"Error: {response.text}")
+        return False
+
 def test_chatbot():
     """Test the chatbot workflow"""
     print("\n" + "="*60)
@@ -539,6 +668,34 @@ def test_conversation_reset():
     
     return response.status_code == 200
 
+def test_metrics():
+    """Test the Prometheus metrics endpoint after the requests above"""
+    print("\n" + "="*60)
+    print("TEST: Prometheus Metrics")
+    print("="*60)
+    
+    response = requests.get(f"{BASE_URL}/metrics")
+    print(f"Status Code: {response.status_code}")
+    
+    if response.status_code != 200:
+        print(f"Error: {response.text}")
+        return False
+    
+    expected = [
+        'http_request_duration_seconds_count{endpoint="/api/analyze"',
+        "llm_request_duration_seconds_count",
+        "analysis_parse_results_total",
+        "conversation_store_conversations",
+        "server_startup_import_seconds",
+    ]
+    if requests.get(f"{BASE_URL}/health").json().get("small_model"):
+        expected.append('model_routing_decisions_total{kind="chat"')
+    for name in expected:
+        present = name in response.text
+        print(f"{'✅' if present else '❌'} {name}")
+    
+    return all(name in response.text for name in expected)
+
 def run_all_tests():
     """Run all tests"""
     print("\n" + "🧪 LANGCHAIN SERVER TEST SUITE")
@@ -549,8 +706,13 @@ def run_all_tests():
     tests = [
         ("Health Check", test_health),
         ("Analyzer", test_analyzer),
+        ("HTML Analyzer", test_analyze_html),
+        ("Batch Analyzer", test_analyze_batch),
+        ("Incremental Re-analysis", test_incremental_analysis),
+        ("Document Registry", test_document_registry),
         ("Chatbot", test_chatbot),
-        ("Conversation Reset", test_conversation_reset)
+        ("Conversation Reset", test_conversation_reset),
+        ("Prometheus Metrics", test_metrics)
     ]
     
     results = []
@@ -0,0 +1,14 @@
+"""
+Shared setup of the offline tests
+The modules under test live in the parent directory, and every model call
+goes to the fake backend, so the tests need no network or API key.
+"""
+
+import os
+import sys
+
+os.environ["LLM_BACKEND"] = "fake"
+os.environ.setdefault("FAKE_LLM_LATENCY", "0")
+os.environ.setdefault("FAKE_LLM_TOKENS_PER_SECOND", "0")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,97 @@
+import json
+import os
+import time
+
+from analysis_cache import AnalysisCache, MemoryTier, make_cache_key
+from sqlite_store import SQLiteAnalysisTier, SQLiteDatabase
+
+RESULT = {"summary": "Standard terms", "items": [{"title": "Arbitration", "flag": "critical"}]}
+
+
+def test_key_ignores_whitespace_but_not_parts():
+    assert make_cache_key("a  b\n c", "model") == make_cache_key(" a b c ", "model")
+    assert make_cache_key("a b c", "model") != make_cache_key("a b c", "other-model")
+
+
+def test_memory_tier_evicts_least_recently_used():
+    tier = MemoryTier(max_entries=2, max_bytes=1000, ttl_seconds=60)
+    tier.set("a", 1, 10)
+    tier.set("b", 2, 10)
+    tier.get("a")
+    tier.set("c", 3, 10)
+    assert tier.get("b") is None
+    assert tier.get("a") == 1 and tier.get("c") == 3
+    assert tier.evictions == 1
+
+
+def test_memory_tier_byte_cap_and_oversized_values():
+    tier = MemoryTier(max_entries=10, max_bytes=100, ttl_seconds=60)
+    tier.set("big", 1, 101)
+    assert tier.get("big") is None
+    tier.set("a", 1, 60)
+    tier.set("b", 2, 60)
+    assert tier.get("a") is None and tier.bytes_used == 60
+
+
+def test_memory_tier_ttl():
+    tier = MemoryTier(max_entries=10, max_bytes=1000, ttl_seconds=60)
+    tier.set("old", 1, 10, expires_at=time.time() - 1)
+    assert tier.get("old") is None
+    assert tier.bytes_used == 0
+
+
+def test_get_returns_a_copy():
+    cache = AnalysisCache()
+    cache.set("k", RESULT)
+    first = cache.get("k")
+    first["items"].append({"title": "Mutated"})
+    first["summary"] = "changed"
+    assert cache.get("k") == RESULT
+
+
+def test_set_copies_the_value():
+    cache = AnalysisCache()
+    value = json.loads(json.dumps(RESULT))
+    cache.set("k", value)
+    value["summary"] = "changed"
+    assert cache.get("k")["summary"] == RESULT["summary"]
+
+
+def test_disk_hit_survives_restart(tmp_path):
+    AnalysisCache(disk_dir=str(tmp_path)).set("k", RESULT)
+    cache = AnalysisCache(disk_dir=str(tmp_path))
+    assert cache.get("k") == RESULT
+    assert cache.get("k") == RESULT
+    stats = cache.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 0)
+
+
+def test_disk_hit_keeps_its_remaining_ttl(tmp_path):
+    AnalysisCache(disk_dir=str(tmp_path), ttl_seconds=60).set("k", RESULT)
+    path = os.path.join(str(tmp_path), "k", "k.json")
+    with open(path, "r", encoding="utf-8") as f:
+        record = json.load(f)
+    record["created_at"] -= 50  # 10 seconds left on disk
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(record, f)
+
+    cache = AnalysisCache(disk_dir=str(tmp_path), ttl_seconds=60)
+    assert cache.get("k") == RESULT
+    expires_at = cache.memory._entries["k"][0]
+    assert expires_at <= time.time() + 10
+
+
+def test_expired_disk_entry_is_a_miss(tmp_path):
+    AnalysisCache(disk_dir=str(tmp_path), ttl_seconds=60).set("k", RESULT)
+    cache = AnalysisCache(disk_dir=str(tmp_path), ttl_seconds=-1)
+    assert cache.get("k") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_sqlite_tier_keeps_its_remaining_ttl(tmp_path):
+    db = SQLiteDatabase(str(tmp_path / "cache.db"))
+    AnalysisCache(persistent_tier=SQLiteAnalysisTier(db, 60)).set("k", RESULT)
+    cache = AnalysisCache(persistent_tier=SQLiteAnalysisTier(db, 60))
+    assert cache.get("k") == RESULT
+    assert cache.memory._entries["k"][0] <= time.time() + 60
+    db.close()
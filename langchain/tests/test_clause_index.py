@@ -0,0 +1,38 @@
+import pytest
+
+from clause_index import ClauseIndex, tokenize
+
+FILLER = [f"Section {i}. General provisions about the website layout and fonts, item {i}." for i in range(80)]
+REFUNDS = "Refunds are available within 30 days of purchase if you contact support."
+ARBITRATION = "Any dispute will be resolved by binding arbitration in Delaware."
+TERMS = "\n".join(FILLER[:40] + [REFUNDS] + FILLER[40:] + [ARBITRATION])
+
+
+def test_search_ranks_matching_clause_first():
+    index = ClauseIndex.from_text(TERMS)
+    assert tokenize("Refunds!") and index.search("can I get a refund?", k=3)
+    excerpt = index.select("Can I get a refund?", budget_chars=300)
+    assert REFUNDS in excerpt and len(excerpt) <= 300
+    assert ARBITRATION in index.select("how are disputes resolved", budget_chars=300)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    import langchain_server
+
+    monkeypatch.setattr(langchain_server, "CHAT_CONTEXT_CHARS", 500)
+    monkeypatch.setattr(langchain_server, "RETRIEVAL_ENABLED", True)
+    return langchain_server
+
+
+def test_retrieved_excerpt_is_not_marked_truncated(server):
+    messages = server.build_chat_messages(TERMS, "Can I get a refund?", [])
+    system_prompt = messages[0].content
+    assert REFUNDS in system_prompt
+    assert "..." not in system_prompt
+
+
+def test_prefix_cut_is_marked_truncated(server, monkeypatch):
+    monkeypatch.setattr(server, "SALIENCE_ENABLED", False)
+    assert f"{TERMS[:500]}...\n" in server.build_chat_system_prompt(TERMS)
+    assert "..." not in server.build_chat_system_prompt(REFUNDS)
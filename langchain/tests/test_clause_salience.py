@@ -0,0 +1,49 @@
+from clause_salience import rank_clauses, score_clause, select_salient_text, split_clauses
+
+NAVIGATION = "\n".join(["Home", "About us", "Careers", "Blog", "Contact"] * 20)
+ARBITRATION = "Any dispute will be resolved by binding arbitration and you waive your right to a jury trial."
+SHARING = "We may share your personal data with third-party advertisers and our affiliates."
+WELCOME = "Welcome to our wonderful service, we hope you enjoy using it every single day."
+
+
+def test_navigation_lines_score_zero():
+    assert score_clause("Home") == 0
+    assert score_clause("Privacy") == 0
+
+
+def test_risky_clauses_outscore_plain_ones():
+    assert score_clause(ARBITRATION) > score_clause(WELCOME) == 0
+    # Distinct signals add up: third-party sharing plus data collection
+    assert score_clause(SHARING) > score_clause(ARBITRATION)
+
+
+def test_long_paragraphs_are_split_by_sentence():
+    paragraph = " ".join([ARBITRATION] * 20)
+    clauses = split_clauses(paragraph)
+    assert len(clauses) > 1
+    assert all(len(clause) <= 600 for clause in clauses)
+
+
+def test_short_documents_are_unchanged():
+    assert select_salient_text(ARBITRATION, 1000) == ARBITRATION
+
+
+def test_selection_fits_the_budget_in_document_order():
+    text = "\n".join([NAVIGATION, WELCOME, SHARING, NAVIGATION, ARBITRATION])
+    selected = select_salient_text(text, len(ARBITRATION) + len(SHARING) + 2)
+    assert selected == f"{SHARING}\n{ARBITRATION}"
+
+
+def test_ties_prefer_earlier_clauses():
+    first = ARBITRATION.replace("dispute", "claim")
+    text = "\n".join([first, ARBITRATION, NAVIGATION])
+    assert select_salient_text(text, len(ARBITRATION) + 1) == first
+
+
+def test_no_signals_falls_back_to_the_prefix():
+    text = NAVIGATION + "\n" + WELCOME
+    assert select_salient_text(text, 50) == text[:50]
+
+
+def test_rank_keeps_positions():
+    assert [position for _, position, _ in rank_clauses(f"{WELCOME}\n{SHARING}")] == [0, 1]
@@ -0,0 +1,116 @@
+import threading
+import time
+
+from langchain_core.messages import HumanMessage
+
+from conversation_memory import (
+    ConversationSummarizer,
+    estimate_tokens,
+    format_transcript,
+    recent_messages,
+)
+from conversation_store import ConversationStore
+from llm_backends import FakeChatModel
+
+
+def wait_for(summarizer, timeout=5.0):
+    deadline = time.time() + timeout
+    while summarizer.stats()["in_flight"] and time.time() < deadline:
+        time.sleep(0.01)
+    assert summarizer.stats()["in_flight"] == 0
+
+
+def fake_summarize(summary, messages):
+    llm = FakeChatModel(model_name="fake-summary")
+    prompt = f"Update the running summary.\n{summary}\n{format_transcript(messages)}"
+    return llm.invoke([HumanMessage(content=prompt)]).content
+
+
+def test_recent_messages_fits_budget_in_order():
+    history = [{"role": "user", "content": "x" * 40}, {"role": "assistant", "content": "y" * 40},
+               {"role": "user", "content": "z" * 40}]
+    selected = recent_messages(history, budget_tokens=2 * estimate_tokens("x" * 40))
+    assert [m["content"][0] for m in selected] == ["y", "z"]
+
+
+def test_recent_messages_truncates_oversized_newest_message():
+    history = [{"role": "user", "content": "a" * 100 + "END"}]
+    selected = recent_messages(history, budget_tokens=5)
+    assert selected[0]["content"].endswith("END")
+    assert len(selected[0]["content"]) == 5 * 4
+
+
+def test_format_transcript_truncates_long_messages():
+    transcript = format_transcript([{"role": "user", "content": "Q"},
+                                    {"role": "assistant", "content": "A" * 5000}])
+    first, second = transcript.split("\n")
+    assert first == "User: Q"
+    assert second.startswith("Assistant: AAA") and second.endswith("...")
+    assert len(second) < 2000
+
+
+def test_fold_keeps_recent_turns_verbatim():
+    store = ConversationStore(max_messages=100)
+    summarizer = ConversationSummarizer(store, fake_summarize, trigger_tokens=100, keep_tokens=60)
+    for i in range(6):
+        store.append_exchange("c1", f"question {i} " + "q" * 80, f"answer {i} " + "a" * 80)
+
+    assert summarizer.maybe_schedule("c1")
+    wait_for(summarizer)
+
+    summary, messages = store.get_memory("c1")
+    assert summary
+    assert messages and len(messages) % 2 == 0
+    assert messages[-1][1]["content"].startswith("answer 5")
+    assert sum(estimate_tokens(m["content"]) for _, m in messages) <= 60
+    assert summarizer.stats() == {"scheduled": 1, "completed": 1, "failed": 0, "in_flight": 0}
+
+
+def test_short_conversation_is_not_scheduled():
+    store = ConversationStore()
+    summarizer = ConversationSummarizer(store, fake_summarize, trigger_tokens=1000)
+    store.append_exchange("c1", "hi", "hello")
+    assert not summarizer.maybe_schedule("c1")
+    assert summarizer.stats()["scheduled"] == 0
+
+
+def test_near_message_cap_triggers_fold():
+    store = ConversationStore(max_messages=6)
+    summarizer = ConversationSummarizer(store, fake_summarize, trigger_tokens=10_000)
+    for i in range(2):
+        store.append_exchange("c1", f"q{i}", f"a{i}")
+    assert summarizer.maybe_schedule("c1")
+    wait_for(summarizer)
+    _, messages = store.get_memory("c1")
+    assert len(messages) <= 6 // 2
+
+
+def test_one_fold_in_flight_per_conversation():
+    release = threading.Event()
+
+    def slow_summarize(summary, messages):
+        release.wait(5)
+        return "summary"
+
+    store = ConversationStore(max_messages=100)
+    summarizer = ConversationSummarizer(store, slow_summarize, trigger_tokens=1, keep_tokens=1)
+    store.append_exchange("c1", "question", "answer")
+    assert summarizer.maybe_schedule("c1")
+    assert not summarizer.maybe_schedule("c1")
+    release.set()
+    wait_for(summarizer)
+    assert summarizer.stats()["scheduled"] == 1
+
+
+def test_summarizer_failure_is_counted_and_history_kept():
+    def failing(summary, messages):
+        raise RuntimeError("upstream down")
+
+    store = ConversationStore(max_messages=100)
+    summarizer = ConversationSummarizer(store, failing, trigger_tokens=1, keep_tokens=1)
+    store.append_exchange("c1", "question", "answer")
+    assert summarizer.maybe_schedule("c1")
+    wait_for(summarizer)
+
+    assert summarizer.stats()["failed"] == 1
+    assert len(store.get_memory("c1")[1]) == 2
@@ -0,0 +1,83 @@
+import time
+
+from conversation_store import CONVERSATION_OVERHEAD_BYTES, ConversationStore
+
+
+def test_history_round_trip_including_compressed_messages():
+    store = ConversationStore()
+    long_answer = "The arbitration clause applies. " * 100
+    store.append_exchange("c1", "Is there arbitration? ✓", long_answer)
+    assert store.get_history("c1") == [
+        {"role": "user", "content": "Is there arbitration? ✓"},
+        {"role": "assistant", "content": long_answer},
+    ]
+    # The long answer is stored compressed
+    assert store.stats()["bytes_used"] < len(long_answer)
+
+
+def test_unknown_conversation_is_empty():
+    store = ConversationStore()
+    assert store.get_history("missing") == []
+    assert store.get_memory("missing") == ("", [])
+
+
+def test_max_messages_drops_oldest_and_advances_sequence():
+    store = ConversationStore(max_messages=4)
+    for i in range(3):
+        store.append_exchange("c1", f"q{i}", f"a{i}")
+    summary, messages = store.get_memory("c1")
+    assert [sequence for sequence, _ in messages] == [2, 3, 4, 5]
+    assert messages[0][1]["content"] == "q1"
+
+
+def test_lru_eviction_keeps_recently_used():
+    store = ConversationStore(max_conversations=2)
+    store.append_exchange("a", "q", "a")
+    store.append_exchange("b", "q", "a")
+    store.get_history("a")
+    store.append_exchange("c", "q", "a")
+    assert "a" in store and "c" in store and "b" not in store
+    assert store.stats()["evictions"]["lru"] == 1
+
+
+def test_byte_cap_eviction_and_accounting():
+    store = ConversationStore(max_bytes=3 * (CONVERSATION_OVERHEAD_BYTES + 400))
+    for name in "abcde":
+        store.append_exchange(name, "q" * 100, "a" * 100)
+    stats = store.stats()
+    assert stats["bytes_used"] <= store.max_bytes
+    assert stats["evictions"]["bytes"] > 0
+    assert "e" in store
+
+    for name in "abcde":
+        store.delete(name)
+    assert store.stats()["bytes_used"] == 0
+
+
+def test_idle_ttl_eviction():
+    store = ConversationStore(idle_ttl_seconds=0.05)
+    store.append_exchange("old", "q", "a")
+    time.sleep(0.1)
+    store.append_exchange("new", "q", "a")
+    assert "old" not in store and "new" in store
+    assert store.stats()["evictions"]["idle"] == 1
+
+
+def test_fold_replaces_summary_and_drops_covered_messages():
+    store = ConversationStore()
+    for i in range(3):
+        store.append_exchange("c1", f"q{i}", f"a{i}")
+    assert store.fold("c1", "Earlier: q0 and q1", through_sequence=3)
+    summary, messages = store.get_memory("c1")
+    assert summary == "Earlier: q0 and q1"
+    assert [sequence for sequence, _ in messages] == [4, 5]
+    assert not store.fold("missing", "x", 0)
+
+
+def test_fold_is_safe_after_messages_were_dropped():
+    store = ConversationStore(max_messages=2)
+    store.append_exchange("c1", "q0", "a0")
+    _, messages = store.get_memory("c1")
+    store.append_exchange("c1", "q1", "a1")  # drops q0/a0 while a summary of them is made
+    store.fold("c1", "summary", through_sequence=messages[-1][0])
+    assert [m["content"] for _, m in store.get_memory("c1")[1]] == ["q1", "a1"]
@@ -0,0 +1,67 @@
+from document_chunks import merge_findings, merge_summaries, split_into_chunks
+
+
+def finding(title, flag="warning", category="privacy", description="x"):
+    return {"title": title, "flag": flag, "category": category, "description": description}
+
+
+def test_split_keeps_paragraphs_and_order():
+    text = "\n\n".join(f"Paragraph {i} " + "word " * 50 for i in range(10))
+    chunks = split_into_chunks(text, chunk_size=600, max_chunks=20)
+    assert all(len(chunk) <= 600 for chunk in chunks)
+    assert " ".join(chunks).split() == text.split()
+
+
+def test_split_respects_max_chunks():
+    text = "Sentence number one. " * 2000
+    assert len(split_into_chunks(text, chunk_size=100, max_chunks=5)) <= 5
+
+
+def test_split_hard_cuts_a_block_without_sentence_breaks():
+    chunks = split_into_chunks("x" * 2500, chunk_size=1000, max_chunks=10)
+    assert [len(chunk) for chunk in chunks] == [1000, 1000, 500]
+
+
+def test_split_empty_text():
+    assert split_into_chunks("  \n ") == []
+
+
+def test_merge_findings_keeps_the_more_severe_duplicate():
+    merged = merge_findings([
+        finding("Data Sharing With Partners"),
+        finding("Data sharing with partners", flag="critical", description="longer description"),
+    ])
+    assert len(merged) == 1
+    assert merged[0]["flag"] == "critical"
+    assert merged[0]["description"] == "longer description"
+
+
+def test_merge_findings_keeps_other_categories_apart():
+    merged = merge_findings([finding("Data Retention"), finding("Data Retention", category="usage")])
+    assert len(merged) == 2
+
+
+def test_merge_findings_cap_keeps_severe_findings_in_order():
+    findings = [finding(f"Good {i}", flag="good") for i in range(5)] + [finding("Arbitration", flag="critical")]
+    merged = merge_findings(findings, max_findings=2)
+    assert [f["title"] for f in merged] == ["Good 0", "Arbitration"]
+
+
+def test_merge_findings_does_not_mutate_its_input():
+    first = finding("Data Sharing")
+    merge_findings([first, finding("Data sharing", flag="critical")])
+    assert first["flag"] == "warning"
+
+
+def test_merge_summaries_takes_first_sentences():
+    summary = merge_summaries(["Terms are broad. More detail.", "Data is shared! Details.", "Terms are broad."])
+    assert summary == "Terms are broad. Data is shared!"
+
+
+def test_merge_summaries_tolerates_null_and_non_string_values():
+    assert merge_summaries([None, 42, "Fine terms."]) == "42 Fine terms."
+    assert merge_summaries([None]) == ""
+
+
+def test_merge_summaries_truncates_a_single_long_sentence():
+    assert merge_summaries(["x" * 1000], max_chars=100) == "x" * 100
@@ -0,0 +1,59 @@
+import time
+
+import pytest
+
+from document_registry import DocumentRegistry, document_id_for
+from sqlite_store import SQLiteDatabase, SQLiteDocumentTier
+
+TERMS = "We may share your data with partners. " * 50
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = SQLiteDatabase(str(tmp_path / "state.db"), pool_size=2)
+    yield database
+    database.close()
+
+
+def test_register_deduplicates_and_round_trips():
+    registry = DocumentRegistry()
+    document_id, created = registry.register(TERMS)
+    assert created and document_id == document_id_for(TERMS)
+    assert registry.register(TERMS) == (document_id, False)
+    assert registry.get(document_id) == TERMS
+    assert registry.get("doc_unknown") is None
+
+    stats = registry.stats()
+    assert stats["registrations"] == 2 and stats["deduplicated"] == 1
+    assert stats["compression_ratio"] > 1
+
+
+def test_lru_eviction_drops_derived_values():
+    registry = DocumentRegistry(max_documents=1)
+    first, _ = registry.register("first document")
+    assert registry.derived(first, "prompt", lambda: "built") == "built"
+    registry.register("second document")
+    assert first not in registry
+    assert registry.stats()["evictions"] == 1
+
+
+def test_other_worker_reads_persistent_copy(db):
+    document_id, _ = DocumentRegistry(persistent_tier=SQLiteDocumentTier(db, 60)).register(TERMS)
+    other = DocumentRegistry(persistent_tier=SQLiteDocumentTier(db, 60))
+    assert other.get(document_id) == TERMS
+    assert other.register(TERMS) == (document_id, False)
+
+
+@pytest.mark.parametrize("warm", [True, False])
+def test_reregistering_refreshes_persistent_ttl(db, warm):
+    registry = DocumentRegistry(persistent_tier=SQLiteDocumentTier(db, ttl_seconds=0.3))
+    document_id, _ = registry.register(TERMS)
+    time.sleep(0.2)
+    if not warm:
+        # Dedup found through the persistent tier rather than in memory
+        registry = DocumentRegistry(persistent_tier=SQLiteDocumentTier(db, ttl_seconds=0.3))
+    assert registry.register(TERMS) == (document_id, False)
+    time.sleep(0.2)
+
+    other = DocumentRegistry(persistent_tier=SQLiteDocumentTier(db, ttl_seconds=0.3))
+    assert other.get(document_id) == TERMS
@@ -0,0 +1,61 @@
+import gzip
+
+import pytest
+
+from html_extract import ExtractionError, LegalTextExtractor, extract_legal_text
+
+
+def extract(html, chunk_size=7):
+    data = html.encode("utf-8")
+    return extract_legal_text(data[i:i + chunk_size] for i in range(0, len(data), chunk_size))[0]
+
+
+def test_drops_scripts_navigation_and_footers():
+    text = extract(
+        "<html><head><script>var x = 1;</script><style>p {}</style></head><body>"
+        "<nav>Home | About</nav><div class='site-footer'>Copyright</div>"
+        "<p>You agree to binding arbitration.</p><footer>Links</footer></body></html>"
+    )
+    assert text == "You agree to binding arbitration."
+
+
+def test_keeps_a_cookie_policy_container():
+    text = extract(
+        "<body><div class='cookie-policy'><h1>Cookie Policy</h1>"
+        "<p>We use cookies to remember your preferences.</p></div></body>"
+    )
+    assert "We use cookies to remember your preferences." in text
+
+
+def test_drops_cookie_banners():
+    for name in ("cookie-banner", "cookie-consent", "cookies_notice", "cookieconsent"):
+        text = extract(f"<body><div id='{name}'>Accept all cookies</div><p>Terms text.</p></body>")
+        assert text == "Terms text.", name
+
+
+def test_keeps_the_header_of_an_article():
+    text = extract(
+        "<body><header>Site name</header><main><article><header><h1>Terms of Service</h1></header>"
+        "<p>These terms govern your use of the service.</p></article></main></body>"
+    )
+    assert text.startswith("Terms of Service")
+    assert "Site name" not in text
+
+
+def test_prefers_main_content():
+    text = extract("<body><div>" + "Promo text. " * 5 + "</div><main>" + "Legal text. " * 20 + "</main></body>")
+    assert "Promo" not in text
+
+
+def test_gzip_input_and_size_limit():
+    html = b"<p>Refunds are not available.</p>"
+    assert extract_legal_text([gzip.compress(html)])[0] == "Refunds are not available."
+
+    extractor = LegalTextExtractor(max_html_bytes=100)
+    with pytest.raises(ExtractionError):
+        extractor.feed_bytes(gzip.compress(b"<p>" + b"a" * 1000 + b"</p>"))
+
+
+def test_multibyte_characters_split_across_chunks():
+    assert extract("<p>Über die Datenschutzerklärung – “Privacy”</p>", chunk_size=1) == \
+        "Über die Datenschutzerklärung – “Privacy”"
@@ -0,0 +1,36 @@
+from prometheus_client import CollectorRegistry, generate_latest
+
+from conversation_store import ConversationStore
+from metrics import StatsCollector
+
+
+def scrape(sources):
+    registry = CollectorRegistry()
+    registry.register(StatsCollector(sources))
+    return generate_latest(registry).decode()
+
+
+def test_numeric_fields_become_gauges():
+    output = scrape({"cache": lambda: {"entries": 3, "hit_rate": 0.5, "persistent": True, "backend": "sqlite"}})
+    assert "cache_entries 3.0" in output
+    assert "cache_hit_rate 0.5" in output
+    assert "persistent" not in output and "backend" not in output
+
+
+def test_nested_counters_are_flattened():
+    store = ConversationStore(max_conversations=1)
+    store.append_exchange("a", "q", "a")
+    store.append_exchange("b", "q", "a")
+    output = scrape({"conversation_store": store.stats})
+    assert "conversation_store_evictions_lru 1.0" in output
+    assert "conversation_store_evictions_idle 0.0" in output
+    assert "conversation_store_evictions_bytes 0.0" in output
+
+
+def test_nested_keys_are_sanitized_and_failures_skipped():
+    def broken():
+        raise RuntimeError("database is locked")
+
+    output = scrape({"clients": lambda: {"by_model": {"meta/llama-3.1": 2}}, "broken": broken})
+    assert "clients_by_model_meta_llama_3_1 2.0" in output
+    assert "broken" not in output
@@ -0,0 +1,112 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from llm_backends import FAKE_CHAT_ANSWER, FakeChatModel
+from model_router import (
+    LOW_CONFIDENCE_MARKER,
+    analysis_rejection,
+    chat_rejection,
+    is_low_confidence,
+    with_escalation_instruction,
+)
+
+CRITICAL = {"title": "Arbitration", "description": "d", "flag": "critical", "category": "legal"}
+WARNING = {"title": "Changes", "description": "d", "flag": "warning", "category": "usage"}
+ARBITRATION_CLAUSE = "All disputes are resolved by binding arbitration."
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("ESCALATE", True),
+    ("  ESCALATE.", True),
+    ("ESCALATE\nThe terms do not say.", True),
+    ("ESCALATED complaints are handled by support.", False),
+    ("Escalation procedures are described in section 4.", False),
+    ("Escalate your complaint to the ombudsman.", False),
+    ("ESCALAT", False),
+    ("", False),
+])
+def test_low_confidence_marker_is_a_whole_word(text, expected):
+    assert is_low_confidence(text) is expected
+
+
+def test_chat_rejection():
+    assert chat_rejection("  ") == "empty"
+    assert chat_rejection(LOW_CONFIDENCE_MARKER) == "low_confidence"
+    assert chat_rejection(FAKE_CHAT_ANSWER) is None
+
+
+def test_escalation_instruction_extends_system_prompt():
+    messages = with_escalation_instruction([SystemMessage(content="You are helpful."), HumanMessage(content="q")])
+    assert messages[0].content.startswith("You are helpful.")
+    assert LOW_CONFIDENCE_MARKER in messages[0].content
+    assert len(messages) == 2
+
+    messages = with_escalation_instruction([HumanMessage(content="q")])
+    assert isinstance(messages[0], SystemMessage) and len(messages) == 2
+
+
+def test_analysis_rejection_reasons():
+    assert analysis_rejection(None, "", 3) == "invalid"
+    assert analysis_rejection({"items": [CRITICAL]}, ARBITRATION_CLAUSE, 3) == "few_findings"
+    assert analysis_rejection({"items": [WARNING] * 3}, ARBITRATION_CLAUSE, 3) == "missed_critical"
+    assert analysis_rejection({"items": [WARNING] * 3}, "We may change these terms.", 3) is None
+
+
+def test_analysis_rejection_without_findings_minimum():
+    # Chunks and segments are checked with min_findings=0
+    assert analysis_rejection({"items": []}, "1. Definitions. 'Service' means the website.", 0) is None
+    assert analysis_rejection({"items": [CRITICAL]}, ARBITRATION_CLAUSE, 0) is None
+    assert analysis_rejection({"items": []}, ARBITRATION_CLAUSE, 0) == "missed_critical"
+
+
+@pytest.fixture
+def server(monkeypatch):
+    import langchain_server
+
+    monkeypatch.setattr(langchain_server, "llm", FakeChatModel(model_name="large"))
+    monkeypatch.setattr(langchain_server, "small_llm", FakeChatModel(model_name="small"))
+    return langchain_server
+
+
+def test_segment_with_one_finding_is_not_escalated(server):
+    messages = [server.build_analysis_messages(ARBITRATION_CLAUSE)]
+    assert server.small_model_analyses(messages, [ARBITRATION_CLAUSE], 1, 0)[0] is not None
+    assert server.small_model_analyses(messages, [ARBITRATION_CLAUSE], 1, 3)[0] is None
+
+
+def test_small_model_failure_is_not_a_server_error(server, monkeypatch):
+    class Broken:
+        def batch(self, *args, **kwargs):
+            raise RuntimeError("connection pool closed")
+
+    monkeypatch.setattr(server, "small_llm", Broken())
+    result = server.analyze_terms_and_conditions(ARBITRATION_CLAUSE)
+    assert result["degraded"] is True
+    assert result["items"]
+
+
+def test_stream_escalates_on_marker(server, monkeypatch):
+    monkeypatch.setattr(server, "small_llm", FakeChatModel(model_name="small", low_confidence_rate=1.0))
+    answer = "".join(server.stream_chat_answer([HumanMessage(content="Can I get a refund?")]))
+    assert answer == FAKE_CHAT_ANSWER
+
+
+def test_stream_answer_starting_like_marker_is_kept(server, monkeypatch):
+    responses = [{"contains": "refund", "response": "ESCALATED disputes go to arbitration."}]
+    monkeypatch.setattr(server, "small_llm", FakeChatModel(model_name="small", responses=responses))
+    answer = "".join(server.stream_chat_answer([HumanMessage(content="Can I get a refund?")]))
+    assert answer == "ESCALATED disputes go to arbitration."
+
+
+def test_routing_is_off_by_default():
+    env = {key: value for key, value in os.environ.items() if key != "ROUTER_ENABLED"}
+    output = subprocess.run(
+        [sys.executable, "-c", "import langchain_server as s; print(s.ROUTER_ENABLED, s.small_llm)"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    assert output.splitlines()[-1] == "False None"
@@ -0,0 +1,134 @@
+import pytest
+
+from policy_versions import PolicyVersionStore, UpdatePlan, clause_hash, is_boilerplate
+
+CLAUSES = [f"Section {i}. The company may process your data for purpose number {i} as described here."
+           for i in range(12)]
+TERMS = "Last updated in July 2020\n" + "\n".join(CLAUSES)
+
+
+def analyzed(plan):
+    return [{"summary": f"segment {n}", "items": [{"title": f"finding {n}"}]} for n in range(len(plan.groups))]
+
+
+def store_version(store, url, terms, segment_chars=200):
+    plan = store.plan(url, terms, segment_chars)
+    record, _ = plan.complete(analyzed(plan))
+    store.update(url, plan, record)
+    return plan
+
+
+def test_hash_ignores_whitespace():
+    assert clause_hash("We may  share\nyour data.") == clause_hash("We may share your data.")
+    assert is_boilerplate("Last updated in July 2020")
+    assert not is_boilerplate(CLAUSES[0])
+
+
+def test_first_version_analyzes_every_clause():
+    plan = UpdatePlan(TERMS, None, 200)
+    assert not plan.kept
+    assert plan.analyzed_clauses == len(CLAUSES)
+    assert all(len(text) <= 200 for text in plan.texts())
+
+
+def test_unchanged_clauses_are_reused_and_changed_clause_reanalyzed():
+    store = PolicyVersionStore()
+    first = store_version(store, "https://example.com/terms", TERMS)
+
+    edited = CLAUSES[5].replace("purpose number 5", "advertising by our partners")
+    revised = TERMS.replace(CLAUSES[5], edited).replace("July 2020", "January 2025")
+    plan = store.plan("https://example.com/terms", revised, 200)
+
+    assert plan.analyzed_clauses < len(CLAUSES)
+    assert plan.reused_clauses + plan.analyzed_clauses == len(CLAUSES)
+    assert any(edited in text for text in plan.texts())
+    assert not any(CLAUSES[0] in text for text in plan.texts())
+
+    # Reused findings are merged back with the new ones in document order
+    record, segment_results = plan.complete(
+        [{"summary": "new", "items": [{"title": "new finding"}]} for _ in plan.groups]
+    )
+    assert len(segment_results) == len(first.groups)
+    titles = [item["title"] for result in segment_results for item in result["items"]]
+    assert "new finding" in titles and "finding 0" in titles
+    assert len(record["segments"]) == len(segment_results)
+
+
+def test_date_bump_alone_needs_no_model_call():
+    store = PolicyVersionStore()
+    store_version(store, "u", TERMS)
+    plan = store.plan("u", TERMS.replace("July 2020", "March 2026"), 200)
+    assert plan.groups == [] and plan.reused_clauses == len(CLAUSES)
+
+
+def test_failed_segments_are_not_stored():
+    store = PolicyVersionStore()
+    plan = store.plan("u", TERMS, 200)
+    record, _ = plan.complete([None] * len(plan.groups))
+    store.update("u", plan, record)
+    assert store.plan("u", TERMS, 200).analyzed_clauses == len(CLAUSES)
+
+
+def test_stats_and_lru():
+    store = PolicyVersionStore(max_urls=1)
+    store_version(store, "a", TERMS)
+    store_version(store, "a", TERMS)
+    store_version(store, "b", TERMS)
+    stats = store.stats()
+    assert stats["urls"] == 1
+    assert stats["full_analyses"] == 2 and stats["incremental_analyses"] == 1
+    assert store.get("a") is None
+
+
+@pytest.fixture
+def server(monkeypatch, tmp_path):
+    import langchain_server
+    from analysis_cache import AnalysisCache
+
+    monkeypatch.setattr(langchain_server, "analysis_cache", AnalysisCache(disk_dir=str(tmp_path)))
+    monkeypatch.setattr(langchain_server, "policy_versions", PolicyVersionStore())
+    monkeypatch.setattr(langchain_server, "small_llm", None)
+    monkeypatch.setattr(langchain_server, "ANALYSIS_CHUNK_SIZE", 300)
+
+    calls = []
+    original = langchain_server.analyze_texts_batched
+
+    def counting(texts, *args, **kwargs):
+        calls.append(list(texts))
+        return original(texts, *args, **kwargs)
+
+    monkeypatch.setattr(langchain_server, "analyze_texts_batched", counting)
+    monkeypatch.setattr(langchain_server, "calls", calls, raising=False)
+    return langchain_server
+
+
+def test_server_reanalyzes_only_the_changed_segment(server):
+    url = "https://example.com/terms"
+    result, cache_hit = server.cached_analysis(TERMS, "chunked", url)
+    assert not cache_hit and result["items"]
+    first_texts = server.calls[-1]
+
+    edited = CLAUSES[7].replace("purpose number 7", "sale to data brokers")
+    server.cached_analysis(TERMS.replace(CLAUSES[7], edited), "chunked", url)
+    texts = server.calls[-1]
+    assert len(texts) < len(first_texts)
+    assert any(edited in text for text in texts)
+    assert server.policy_versions.stats()["clauses_reused"] > 0
+
+
+def test_identical_text_at_new_url_misses_once(server):
+    _, cache_hit = server.cached_analysis(TERMS, "chunked", "https://a.example/terms")
+    assert not cache_hit
+    _, cache_hit = server.cached_analysis(TERMS, "chunked", "https://a.example/terms")
+    assert cache_hit
+
+    _, cache_hit = server.cached_analysis(TERMS, "chunked", "https://b.example/terms")
+    assert not cache_hit
+    assert server.policy_versions.get("https://b.example/terms") is not None
+    _, cache_hit = server.cached_analysis(TERMS, "chunked", "https://b.example/terms")
+    assert cache_hit
+
+
+def test_url_alone_keeps_default_mode(server):
+    assert server.analysis_mode({"url": "https://a.example"}) == server.ANALYSIS_MODE
+    assert server.analysis_mode({"url": "https://a.example", "mode": "chunked"}) == "chunked"
@@ -0,0 +1,71 @@
+import pytest
+from langchain_core.messages import HumanMessage
+
+from llm_backends import FakeChatModel
+from reasoning import ThinkFilter, reasoning_kwargs, strip_think
+
+
+def chunks(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def filtered(pieces):
+    think_filter = ThinkFilter()
+    return "".join(think_filter.feed(piece) for piece in pieces) + think_filter.flush(), think_filter
+
+
+@pytest.fixture(scope="module")
+def thinking_output():
+    llm = FakeChatModel(think_chars=300)
+    text = llm.invoke([HumanMessage(content="Can I get a refund?")]).content
+    assert text.startswith("<think>")
+    return text
+
+
+def test_strip_think_removes_blocks():
+    assert strip_think("a<think>x</think>b<think>y</think>c") == "abc"
+    assert strip_think("reasoning</think>answer") == "answer"
+    assert strip_think("answer<think>never closed") == "answer"
+    assert strip_think("no reasoning") == "no reasoning"
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7, 8, 64, 10_000])
+def test_filter_matches_strip_think_for_any_chunking(thinking_output, size):
+    visible, think_filter = filtered(chunks(thinking_output, size))
+    assert visible == strip_think(thinking_output)
+    assert "think>" not in visible
+    assert think_filter.dropped_chars > 0
+
+
+def test_tags_split_across_chunks():
+    visible, think_filter = filtered(["Hi <th", "ink>secret</th", "in", "k> there"])
+    assert visible == "Hi  there"
+    assert think_filter.dropped_chars == len("secret")
+
+
+def test_partial_tag_prefix_is_released_when_not_a_tag():
+    think_filter = ThinkFilter()
+    assert think_filter.feed("a <thi") == "a "
+    assert think_filter.feed("ng>") == "<thing>"
+    assert think_filter.feed("x <t") == "x "
+    assert think_filter.flush() == "<t"
+
+
+def test_unterminated_block_is_dropped_at_flush():
+    visible, _ = filtered(["answer", "<think>still thinking </thi"])
+    assert visible == "answer"
+
+
+def test_thinking_mode_off_has_no_reasoning():
+    llm = FakeChatModel(think_chars=300)
+    text = llm.invoke([HumanMessage(content="Can I get a refund?")], **reasoning_kwargs("off")).content
+    assert "<think>" not in text
+    assert reasoning_kwargs("on") == {"thinking_mode": True}
+    assert reasoning_kwargs("default") == {}
+
+
+def test_streamed_fake_output_is_filtered(thinking_output):
+    llm = FakeChatModel(think_chars=300)
+    pieces = [chunk.content for chunk in llm.stream([HumanMessage(content="Can I get a refund?")])]
+    visible, _ = filtered(pieces)
+    assert visible == strip_think(thinking_output)
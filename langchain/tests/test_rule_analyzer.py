@@ -0,0 +1,112 @@
+import time
+
+import pytest
+
+from rule_analyzer import PhraseMatcher, detect_findings, normalize_text, summarize_findings
+
+
+def titles(text):
+    return [finding["title"] for finding in detect_findings(text)]
+
+
+def test_matcher_finds_overlapping_phrases():
+    matcher = PhraseMatcher([("he", 1), ("she", 2), ("hers", 3), ("his", 4)])
+    matches = {(start, end, value) for start, end, value in matcher.find_all("ushers")}
+    assert matches == {(1, 4, 2), (2, 4, 1), (2, 6, 3)}
+    assert matcher.find_all("nothing here") == [(8, 10, 1)]
+
+
+def test_normalize_text():
+    assert normalize_text("We  DON’T\nSell") == "we don't sell"
+
+
+def test_phrases_are_matched_on_word_boundaries():
+    assert "Mandatory Arbitration" in titles("All disputes go to Binding\n  Arbitration.")
+    assert "No Refunds" not in titles("There are no refundsmith fees.")
+
+
+def test_negated_phrases_are_skipped():
+    assert "Sale of Personal Data" in titles("We may sell your personal data to partners.")
+    negated = titles("We do not sell your personal data to anyone.")
+    assert "Sale of Personal Data" not in negated
+    assert "No Sale of Personal Data" in negated
+
+
+def test_negation_outside_window_does_not_apply():
+    far = "We do not share passwords. " + "x" * 40 + " We may sell your data."
+    assert "Sale of Personal Data" in titles(far)
+
+
+def test_refund_phrases_do_not_cancel_each_other():
+    found = titles("You are not entitled to a refund.")
+    assert "No Refunds" in found
+    assert "Clear Refund Policy" not in found
+
+
+def test_findings_are_ranked_by_flag_and_deduplicated():
+    text = ("You can cancel anytime. We may sell your data. Our liability is limited. "
+            "We may sell your data again. All disputes are resolved by binding arbitration.")
+    findings = detect_findings(text)
+    assert [f["flag"] for f in findings] == sorted(
+        (f["flag"] for f in findings), key=["critical", "warning", "good"].index
+    )
+    assert len({f["title"] for f in findings}) == len(findings)
+    # Library order among equal flags
+    assert [f["title"] for f in findings][:2] == ["Mandatory Arbitration", "Sale of Personal Data"]
+
+
+def test_summary_counts():
+    assert "none" in summarize_findings([])
+    summary = summarize_findings(detect_findings("We may sell your data. You can cancel anytime."))
+    assert summary.startswith("Rule-based scan found 1 critical, 0 warning and 1 positive")
+
+
+MODEL_ITEMS = [
+    {"title": "Sale of Personal Data", "description": "The company sells your data to advertisers and brokers.",
+     "flag": "critical", "category": "privacy"},
+    {"title": "Account Deletion", "description": "Accounts can be deleted on request.",
+     "flag": "good", "category": "privacy"},
+]
+TERMS = "We may sell your data. In no event shall the company be liable for lost profits."
+
+
+@pytest.fixture
+def server(monkeypatch, tmp_path):
+    import langchain_server
+    from analysis_cache import AnalysisCache
+    from llm_backends import FakeChatModel
+
+    monkeypatch.setattr(langchain_server, "analysis_cache", AnalysisCache(disk_dir=str(tmp_path)))
+    monkeypatch.setattr(langchain_server, "llm", FakeChatModel())
+    monkeypatch.setattr(langchain_server, "small_llm", None)
+    return langchain_server
+
+
+def test_refine_merges_model_and_rule_findings(server):
+    rule_result = server.rule_analysis(TERMS)
+    refined = server.refine_rule_result(rule_result, {"summary": "Model summary", "items": MODEL_ITEMS})
+
+    assert refined["refined"] is True and refined["summary"] == "Model summary"
+    found = [item["title"] for item in refined["items"]]
+    assert found.count("Sale of Personal Data") == 1
+    assert "Account Deletion" in found and "Limited Liability" in found
+    assert refined["score"] == server.calculate_score(refined["items"])
+
+
+def test_refine_ignores_failed_model_results(server):
+    rule_result = server.rule_analysis(TERMS)
+    assert server.refine_rule_result(rule_result, server.analysis_error_result()) is None
+    assert server.refine_rule_result(rule_result, {**rule_result, "degraded": True}) is None
+
+
+def test_hybrid_answers_at_once_then_serves_refined_result(server):
+    result, cache_hit = server.hybrid_analysis(TERMS)
+    assert result["refined"] is False and not cache_hit
+    assert result["items"] == server.rule_analysis(TERMS)["items"]
+
+    deadline = time.time() + 5
+    while server.pending_refinements and time.time() < deadline:
+        time.sleep(0.01)
+
+    result, cache_hit = server.hybrid_analysis(TERMS)
+    assert cache_hit and result["refined"] is True
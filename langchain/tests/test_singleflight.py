@@ -0,0 +1,109 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from singleflight import AsyncSingleFlight, SingleFlight
+
+
+def run_concurrently(flight, key, fn, callers=5):
+    results, errors = [], []
+    barrier = threading.Barrier(callers)
+
+    def call():
+        barrier.wait()
+        try:
+            results.append(flight.do(key, fn))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    def work():
+        calls.append(1)
+        time.sleep(0.2)
+        return "result"
+
+    results, errors = run_concurrently(flight, "doc", work)
+    assert not errors and len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert {result for result, _ in results} == {"result"}
+    assert flight.stats() == {"executions": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_coalesced_callers_get_the_leaders_exception():
+    flight = SingleFlight()
+
+    def fail():
+        time.sleep(0.2)
+        raise RuntimeError("upstream down")
+
+    results, errors = run_concurrently(flight, "doc", fail)
+    assert not results and len(errors) == 5
+    assert all(str(e) == "upstream down" for e in errors)
+
+    # The failed call is not remembered: the next call runs again
+    assert flight.do("doc", lambda: "ok") == ("ok", False)
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+    assert flight.do("a", lambda: 1) == (1, False)
+    assert flight.do("b", lambda: 2) == (2, False)
+    assert flight.stats()["executions"] == 2
+
+
+def test_async_calls_share_one_execution_and_exceptions():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def fail():
+        await asyncio.sleep(0.05)
+        raise RuntimeError("upstream down")
+
+    async def main():
+        results = await asyncio.gather(*(flight.do("doc", work) for _ in range(4)))
+        errors = await asyncio.gather(*(flight.do("bad", fail) for _ in range(3)), return_exceptions=True)
+        return results, errors
+
+    results, errors = asyncio.run(main())
+    assert len(calls) == 1
+    assert [shared for _, shared in results] == [False, True, True, True]
+    assert all(isinstance(e, RuntimeError) for e in errors)
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_async_cancelled_caller_does_not_cancel_the_shared_work():
+    flight = AsyncSingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.1)
+        return "result"
+
+    async def main():
+        first = asyncio.ensure_future(flight.do("doc", work))
+        await asyncio.sleep(0.01)
+        second = asyncio.ensure_future(flight.do("doc", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == ("result", True)
@@ -0,0 +1,106 @@
+import threading
+import time
+
+import pytest
+
+from sqlite_store import (
+    SQLiteAnalysisTier,
+    SQLiteConversationStore,
+    SQLiteDatabase,
+    SQLiteDocumentTier,
+)
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = SQLiteDatabase(str(tmp_path / "state.db"), pool_size=2)
+    yield database
+    database.close()
+
+
+def test_conversation_round_trip_and_trim(db):
+    store = SQLiteConversationStore(db, max_messages=4)
+    long_answer = "Data is shared with advertisers. " * 50
+    for i in range(3):
+        store.append_exchange("c1", f"q{i}", long_answer if i == 2 else f"a{i}")
+
+    history = store.get_history("c1")
+    assert [m["content"] for m in history] == ["q1", "a1", "q2", long_answer]
+    assert "c1" in store and len(store) == 1
+
+
+def test_conversation_fold_and_delete(db):
+    store = SQLiteConversationStore(db)
+    store.append_exchange("c1", "q0", "a0")
+    store.append_exchange("c1", "q1", "a1")
+    _, messages = store.get_memory("c1")
+    assert store.fold("c1", "Earlier: q0", through_sequence=messages[1][0])
+
+    summary, messages = store.get_memory("c1")
+    assert summary == "Earlier: q0"
+    assert [m["content"] for _, m in messages] == ["q1", "a1"]
+
+    assert store.delete("c1")
+    assert not store.delete("c1")
+    assert store.get_memory("c1") == ("", [])
+    assert not store.fold("c1", "x", 0)
+
+
+def test_conversation_idle_ttl_and_prune(db):
+    store = SQLiteConversationStore(db, idle_ttl_seconds=0.05, prune_interval_seconds=3600)
+    store.append_exchange("old", "q", "a")
+    time.sleep(0.1)
+    assert "old" not in store
+    assert store.get_history("old") == []
+
+    assert store.prune_idle() == 1
+    assert store.stats()["evictions"]["idle"] == 1
+    assert store.stats()["conversations"] == 0
+
+
+def test_conversation_persists_across_connections(tmp_path):
+    path = str(tmp_path / "state.db")
+    first = SQLiteDatabase(path)
+    SQLiteConversationStore(first).append_exchange("c1", "q", "a")
+    first.close()
+
+    second = SQLiteDatabase(path)
+    assert SQLiteConversationStore(second).get_history("c1")[0]["content"] == "q"
+    second.close()
+
+
+def test_concurrent_batched_writes(db):
+    store = SQLiteConversationStore(db, max_messages=100)
+
+    def writer(n):
+        store.append_exchanges([(f"c{n}", f"q{i}", f"a{i}") for i in range(10)])
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert store.stats()["messages"] == 4 * 20
+
+
+def test_analysis_tier_ttl(db):
+    tier = SQLiteAnalysisTier(db, ttl_seconds=60)
+    tier.set("hash", {"summary": "ok"})
+    result, expires_at = tier.get_entry("hash")
+    assert result == {"summary": "ok"}
+    assert expires_at > time.time()
+    assert tier.get("missing") is None
+
+    expired = SQLiteAnalysisTier(db, ttl_seconds=-1)
+    assert expired.get("hash") is None
+    # Expired rows are deleted on read
+    assert tier.get("hash") is None
+
+
+def test_document_tier_ttl(db):
+    tier = SQLiteDocumentTier(db, ttl_seconds=60)
+    tier.set("doc", b"\x00compressed")
+    assert tier.get("doc") == b"\x00compressed"
+    assert SQLiteDocumentTier(db, ttl_seconds=-1).get("doc") is None
+    assert tier.get("doc") is None
@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from llm_backends import FakeChatModel, split_tokens
+from stream_parser import IncrementalAnalysisParser
+
+ANALYSIS_PROMPT = (
+    'Output format: {"summary": "...", "findings": [...]}\n'
+    "TERMS: You agree to binding arbitration. We may share your data with third parties.\n"
+    "Output format"
+)
+
+
+def parse(chunks):
+    parser = IncrementalAnalysisParser()
+    events = []
+    for chunk in chunks:
+        events.extend(parser.feed(chunk))
+    return parser, events
+
+
+def fake_output():
+    return FakeChatModel(model_name="fake").respond(ANALYSIS_PROMPT)
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64])
+def test_events_are_the_same_for_any_chunking(size):
+    text = fake_output()
+    expected = json.loads(text)
+    parser, events = parse(text[i:i + size] for i in range(0, len(text), size))
+    assert events[0] == ("summary", expected["summary"])
+    assert [value for kind, value in events[1:]] == expected["findings"]
+    assert parser.done
+
+
+def test_fake_model_stream_chunks():
+    chunks = [chunk.content for chunk in FakeChatModel(model_name="fake").stream(ANALYSIS_PROMPT)]
+    assert len(chunks) > 1
+    _, events = parse(chunks)
+    assert len([kind for kind, _ in events if kind == "finding"]) == len(json.loads("".join(chunks))["findings"])
+
+
+def test_skips_preamble_and_code_fence():
+    text = 'Sure, here it is:\n```json\n{"summary": "Broad {terms}", "findings": [{"title": "A [b]"}]}\n```'
+    parser, events = parse(split_tokens(text))
+    assert events == [("summary", "Broad {terms}"), ("finding", {"title": "A [b]"})]
+    assert parser.done
+
+
+def test_escaped_quotes_and_backslashes_split_across_chunks():
+    text = json.dumps({"summary": 'He said "no" \\ yes', "findings": [{"title": 'Quote "x"'}]})
+    _, events = parse(text)  # one character per chunk
+    assert events == [("summary", 'He said "no" \\ yes'), ("finding", {"title": 'Quote "x"'})]
+
+
+def test_nested_objects_inside_findings_are_not_reported():
+    text = '{"findings": [{"title": "A", "meta": {"page": 1}}], "summary": "Late summary"}'
+    _, events = parse([text])
+    assert events == [("finding", {"title": "A", "meta": {"page": 1}}), ("summary", "Late summary")]
+
+
+def test_truncated_output_reports_only_complete_findings():
+    text = '{"summary": "S", "findings": [{"title": "Done"}, {"title": "Cut o'
+    parser, events = parse([text])
+    assert events == [("summary", "S"), ("finding", {"title": "Done"})]
+    assert not parser.done
+
+
+def test_summary_key_inside_a_finding_is_not_the_summary():
+    _, events = parse(['{"findings": [{"summary": "inner"}]}'])
+    assert events == [("finding", {"summary": "inner"})]
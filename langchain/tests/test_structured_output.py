@@ -0,0 +1,110 @@
+import json
+
+import pytest
+
+from structured_output import ANALYSIS_SCHEMA, analysis_response_format, repair_json
+
+FINDING = {"title": "Arbitration", "description": "Disputes go to arbitration", "flag": "critical",
+           "category": "legal"}
+COMPLETE = json.dumps({"summary": "Strict terms.", "findings": [FINDING, {**FINDING, "title": "Refunds"}]})
+
+
+def test_valid_json_is_parsed_as_is():
+    assert repair_json(COMPLETE) == json.loads(COMPLETE)
+
+
+def test_leading_prose_code_fence_and_trailing_text():
+    text = f"Here is the analysis:\n```json\n{COMPLETE}\n```\nLet me know if you need more."
+    assert repair_json(text) == json.loads(COMPLETE)
+
+
+def test_trailing_commas_are_dropped():
+    text = '{"summary": "s", "findings": [{"title": "t", "description": "d", "flag": "good", "category": "usage",},],}'
+    assert repair_json(text)["findings"][0]["title"] == "t"
+
+
+def test_commas_inside_strings_are_kept():
+    text = '{"summary": "a, b,}", "findings": [],}'
+    assert repair_json(text) == {"summary": "a, b,}", "findings": []}
+
+
+@pytest.mark.parametrize("cut", range(len('{"summary": "Strict terms.", "findings": [') + 1, len(COMPLETE) - 1))
+def test_truncated_output_keeps_complete_findings(cut):
+    repaired = repair_json(COMPLETE[:cut])
+    assert repaired is not None
+    for finding in repaired.get("findings", []):
+        # A partial finding may keep its complete fields, but never a cut-off value
+        assert set(finding.items()) <= set(FINDING.items()) | {("title", "Refunds")}
+
+
+def test_truncated_output_drops_partial_finding():
+    cut = COMPLETE.index('"Refunds"') + 4
+    repaired = repair_json(COMPLETE[:cut])
+    assert repaired["summary"] == "Strict terms."
+    assert repaired["findings"][0] == FINDING
+
+
+def test_escaped_quotes_survive_truncation():
+    text = '{"summary": "They say \\"we may\\" change", "findings": [{"title": "x\\"'
+    assert repair_json(text)["summary"] == 'They say "we may" change'
+
+
+@pytest.mark.parametrize("text", ["", "no json here", "}{", "[1, 2]"])
+def test_unrecoverable_output(text):
+    assert repair_json(text) is None
+
+
+def test_response_format_wraps_schema():
+    response_format = analysis_response_format()
+    assert response_format["type"] == "json_schema"
+    assert response_format["json_schema"]["schema"] is ANALYSIS_SCHEMA
+
+
+@pytest.fixture
+def server(monkeypatch, tmp_path):
+    import langchain_server
+    from analysis_cache import AnalysisCache
+
+    monkeypatch.setattr(langchain_server, "analysis_cache", AnalysisCache(disk_dir=str(tmp_path)))
+    monkeypatch.setattr(langchain_server, "small_llm", None)
+    monkeypatch.setattr(langchain_server, "STRUCTURED_OUTPUT_ENABLED", True)
+    return langchain_server
+
+
+def test_failed_model_call_is_degraded_and_not_cached(server, monkeypatch):
+    from llm_backends import FakeChatModel
+
+    monkeypatch.setattr(server, "llm", FakeChatModel(error_rate=1.0))
+    terms = "We may sell your personal data. Disputes are resolved by binding arbitration."
+
+    result, cache_hit = server.cached_analysis(terms, "single")
+    assert result["degraded"] is True
+    assert result["items"]
+    assert not cache_hit
+
+    _, cache_hit = server.cached_analysis(terms, "single")
+    assert not cache_hit
+    assert server.analysis_cache.get(server.analysis_cache_key(terms, "single")) is None
+
+
+def test_failed_stream_is_degraded_and_not_cached(server, monkeypatch):
+    from llm_backends import FakeChatModel
+
+    monkeypatch.setattr(server, "llm", FakeChatModel(error_rate=1.0))
+    terms = "We may sell your personal data."
+
+    events = list(server.stream_analysis(terms))
+    assert events[-1]["type"] == "result" and events[-1]["degraded"] is True
+    assert server.analysis_cache.get(server.analysis_cache_key(terms, "single")) is None
+
+
+def test_malformed_output_recovery_is_cached(server, monkeypatch):
+    from llm_backends import FakeChatModel
+
+    monkeypatch.setattr(server, "llm", FakeChatModel(malformed_rate=1.0))
+    terms = "We may sell your personal data."
+
+    result, _ = server.cached_analysis(terms, "single")
+    assert "degraded" not in result
+    _, cache_hit = server.cached_analysis(terms, "single")
+    assert cache_hit
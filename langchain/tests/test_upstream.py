@@ -0,0 +1,244 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from llm_backends import BackendError, FakeChatModel
+from upstream import (
+    CircuitBreaker,
+    CircuitOpenError,
+    DeadlineExceeded,
+    ResilientChatModel,
+    UpstreamPolicy,
+    error_status,
+    is_retryable,
+)
+
+MESSAGES = [HumanMessage(content="Can I get a refund?")]
+UNAVAILABLE = "Simulated transient upstream error (503 Service Unavailable)"
+
+
+def policy(**overrides):
+    settings = dict(max_retries=2, backoff_base=0.001, backoff_max=0.001, breaker_failures=3,
+                    breaker_reset=0.05, deadline=5.0, max_workers=4)
+    settings.update(overrides)
+    return UpstreamPolicy(**settings)
+
+
+class Scripted:
+    """Inner model failing or stalling on chosen calls, answering otherwise"""
+
+    def __init__(self, failures=0, error=UNAVAILABLE, slow_calls=(), slow_seconds=1.0):
+        self.failures = failures
+        self.error = error
+        self.slow_calls = set(slow_calls)
+        self.slow_seconds = slow_seconds
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _next(self):
+        with self._lock:
+            self.calls += 1
+            return self.calls
+
+    def invoke(self, input, config=None, **kwargs):
+        call = self._next()
+        if call <= self.failures:
+            raise BackendError(self.error)
+        if call in self.slow_calls:
+            time.sleep(self.slow_seconds)
+        return f"answer {call}"
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        call = self._next()
+        if call <= self.failures:
+            raise BackendError(self.error)
+        if call in self.slow_calls:
+            await asyncio.sleep(self.slow_seconds)
+        return f"answer {call}"
+
+    async def astream(self, input, config=None, **kwargs):
+        call = self._next()
+        if call in self.slow_calls:
+            await asyncio.sleep(self.slow_seconds)
+        yield f"chunk {call}"
+
+
+def test_error_classification():
+    assert error_status(BackendError(UNAVAILABLE)) == 503
+    assert error_status(RuntimeError("[429] Too Many Requests")) == 429
+    assert is_retryable(BackendError(UNAVAILABLE))
+    assert is_retryable(ConnectionResetError())
+    assert not is_retryable(RuntimeError("[401] Unauthorized"))
+    assert not is_retryable(CircuitOpenError("open"))
+    assert not is_retryable(DeadlineExceeded("late"))
+
+
+def test_breaker_open_half_open_close():
+    breaker = CircuitBreaker("test", failures=2, reset_seconds=0.05)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    time.sleep(0.06)
+    breaker.before_call()
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # only one trial at a time
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.before_call()
+
+
+def test_breaker_failed_trial_reopens():
+    breaker = CircuitBreaker("test", failures=1, reset_seconds=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_breaker_neutral_trial_frees_the_slot():
+    breaker = CircuitBreaker("test", failures=1, reset_seconds=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record_neutral()
+    assert breaker.state == "half_open"
+    breaker.before_call()
+
+
+def test_transient_errors_are_retried():
+    inner = Scripted(failures=2)
+    model = ResilientChatModel(inner, "test", policy())
+    assert model.invoke(MESSAGES) == "answer 3"
+    assert model.breaker.state == "closed"
+
+
+def test_retries_are_bounded():
+    inner = Scripted(failures=10)
+    model = ResilientChatModel(inner, "test", policy(breaker_failures=10))
+    with pytest.raises(BackendError):
+        model.invoke(MESSAGES)
+    assert inner.calls == 3
+
+
+def test_client_errors_are_not_retried_and_keep_the_circuit_closed():
+    inner = Scripted(failures=10, error="[400] Bad Request")
+    model = ResilientChatModel(inner, "test", policy(breaker_failures=1))
+    with pytest.raises(BackendError):
+        model.invoke(MESSAGES)
+    assert inner.calls == 1
+    assert model.breaker.state == "closed"
+
+
+def test_failing_fake_backend_opens_the_circuit_then_recovers():
+    model = ResilientChatModel(FakeChatModel(flaky_rate=1.0), "fake", policy(max_retries=0, breaker_failures=2))
+    for _ in range(2):
+        with pytest.raises(BackendError):
+            model.invoke(MESSAGES)
+    with pytest.raises(CircuitOpenError):
+        model.invoke(MESSAGES)
+
+    model.inner.flaky_rate = 0.0
+    time.sleep(0.06)
+    assert model.invoke(MESSAGES).content
+    assert model.breaker.state == "closed"
+
+
+def test_deadline():
+    model = ResilientChatModel(Scripted(slow_calls={1}, slow_seconds=0.5), "test", policy(max_retries=0))
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        model.invoke(MESSAGES, deadline=0.05)
+    assert time.monotonic() - started < 0.4
+    model.close()
+
+
+def test_slow_call_is_hedged():
+    inner = Scripted(slow_calls={4}, slow_seconds=2.0)
+    model = ResilientChatModel(inner, "test", policy(hedge=True, hedge_min_samples=3))
+    for _ in range(3):
+        model.invoke(MESSAGES)
+    started = time.monotonic()
+    assert model.invoke(MESSAGES) == "answer 5"
+    assert time.monotonic() - started < 1.0
+    model.close()
+
+
+def test_async_retry_and_breaker():
+    async def run():
+        model = ResilientChatModel(Scripted(failures=2), "test", policy())
+        assert await model.ainvoke(MESSAGES) == "answer 3"
+
+        failing = ResilientChatModel(Scripted(failures=10), "test", policy(max_retries=0, breaker_failures=1))
+        with pytest.raises(BackendError):
+            await failing.ainvoke(MESSAGES)
+        with pytest.raises(CircuitOpenError):
+            await failing.ainvoke(MESSAGES)
+
+    asyncio.run(run())
+
+
+async def open_then_half_open(model):
+    model.breaker.record_failure()
+    assert model.breaker.state == "open"
+    await asyncio.sleep(0.06)
+
+
+def test_cancelled_half_open_trial_releases_the_breaker():
+    async def run():
+        inner = Scripted(slow_calls={1}, slow_seconds=5.0)
+        model = ResilientChatModel(inner, "test", policy(breaker_failures=1))
+        await open_then_half_open(model)
+
+        trial = asyncio.ensure_future(model.ainvoke(MESSAGES))
+        await asyncio.sleep(0.02)
+        assert model.breaker.state == "half_open"
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+        # The next call becomes the trial, and its success closes the circuit
+        assert await model.ainvoke(MESSAGES) == "answer 2"
+        assert model.breaker.state == "closed"
+
+    asyncio.run(run())
+
+
+def test_cancelled_half_open_stream_releases_the_breaker():
+    async def run():
+        inner = Scripted(slow_calls={1}, slow_seconds=5.0)
+        model = ResilientChatModel(inner, "test", policy(breaker_failures=1))
+        await open_then_half_open(model)
+
+        async def consume():
+            return [chunk async for chunk in model.astream(MESSAGES)]
+
+        trial = asyncio.ensure_future(consume())
+        await asyncio.sleep(0.02)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+        assert await consume() == ["chunk 2"]
+        assert model.breaker.state == "closed"
+
+    asyncio.run(run())
+
+
+def test_stream_retries_before_first_chunk():
+    model = ResilientChatModel(FakeChatModel(), "fake", policy(breaker_failures=10))
+    model.inner.flaky_rate = 1.0
+    with pytest.raises(BackendError):
+        list(model.stream(MESSAGES))
+    model.inner.flaky_rate = 0.0
+    assert "".join(chunk.content for chunk in model.stream(MESSAGES))
@@ -0,0 +1,551 @@
+"""
+Resilient upstream model calls
+ChatNVIDIA opens a new HTTP session (TCP and TLS handshake) for every call.
+pool_connections() gives a client one shared keep-alive pool instead. Every
+model client from model_clients.get_llm() is also wrapped in a
+ResilientChatModel, which adds:
+- a deadline per call (UPSTREAM_DEADLINE seconds, all attempts included)
+- retries of transient errors (connection errors, timeouts, 408/425/429 and
+  5xx responses) with jittered exponential backoff
+- a circuit breaker that fails calls fast while the upstream keeps failing
+- optional hedging: a call still running after the p95 latency of recent
+  similar calls gets a second, parallel attempt; the first answer wins
+Retries, hedges, deadline misses and breaker transitions are counted on
+/metrics (llm_upstream_events_total).
+"""
+
+import asyncio
+import contextvars
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterator, Optional
+
+from langchain_core.runnables import Runnable
+
+from metrics import record_upstream, set_circuit_open
+
+# HTTP statuses worth retrying: timeouts, rate limits and server errors
+RETRYABLE_STATUSES = (408, 425, 429, 500, 502, 503, 504)
+
+# "[503] Service Unavailable" (ChatNVIDIA) or "(503 Service Unavailable)"
+_STATUS_RE = re.compile(r"(?:^\[|\()(\d{3})[\] ]")
+
+
+def _env_bool(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+class UpstreamPolicy:
+    """
+    Pool, deadline, retry, breaker and hedging settings (UPSTREAM_* variables)
+
+    Args:
+        pool_size: Keep-alive connections per client
+        deadline: Seconds a call may take, retries included
+        max_retries: Retries after the first attempt
+        backoff_base: First backoff ceiling in seconds, doubled per retry
+        backoff_max: Largest backoff ceiling in seconds
+        breaker_failures: Consecutive failures that open the circuit
+        breaker_reset: Seconds the circuit stays open before a trial call
+        hedge: Whether slow calls get a second attempt
+        hedge_percentile: Latency percentile after which a call is hedged
+        hedge_min_samples: Calls observed before hedging starts
+        max_workers: Threads running the attempts of synchronous calls
+    """
+
+    def __init__(self, pool_size: int = 32, deadline: float = 120.0, max_retries: int = 2,
+                 backoff_base: float = 0.5, backoff_max: float = 8.0, breaker_failures: int = 5,
+                 breaker_reset: float = 30.0, hedge: bool = False, hedge_percentile: float = 95.0,
+                 hedge_min_samples: int = 20, max_workers: int = 64):
+        self.pool_size = pool_size
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker_failures = breaker_failures
+        self.breaker_reset = breaker_reset
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.max_workers = max_workers
+
+    @classmethod
+    def from_env(cls) -> "UpstreamPolicy":
+        return cls(
+            pool_size=int(os.getenv("UPSTREAM_POOL_SIZE", "32")),
+            deadline=float(os.getenv("UPSTREAM_DEADLINE", "120")),
+            max_retries=int(os.getenv("UPSTREAM_MAX_RETRIES", "2")),
+            backoff_base=float(os.getenv("UPSTREAM_BACKOFF_BASE", "0.5")),
+            backoff_max=float(os.getenv("UPSTREAM_BACKOFF_MAX", "8")),
+            breaker_failures=int(os.getenv("UPSTREAM_BREAKER_FAILURES", "5")),
+            breaker_reset=float(os.getenv("UPSTREAM_BREAKER_RESET", "30")),
+            hedge=_env_bool("UPSTREAM_HEDGE", "false"),
+            hedge_percentile=float(os.getenv("UPSTREAM_HEDGE_PERCENTILE", "95")),
+            hedge_min_samples=int(os.getenv("UPSTREAM_HEDGE_MIN_SAMPLES", "20")),
+            max_workers=int(os.getenv("UPSTREAM_MAX_WORKERS", "64")),
+        )
+
+    def backoff(self, retry: int) -> float:
+        """Seconds to wait before a retry: full jitter up to an exponential ceiling"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** retry))
+
+
+def resilience_enabled(backend: str) -> bool:
+    """
+    Whether model clients are wrapped in ResilientChatModel (UPSTREAM_RESILIENCE)
+
+    "auto" (the default) wraps the backends that call the network; "true"
+    also wraps the local ones, e.g. to benchmark against the fake backend's
+    simulated upstream errors and slow calls.
+    """
+    setting = os.getenv("UPSTREAM_RESILIENCE", "auto").lower()
+    if setting == "auto":
+        return backend in ("nvidia", "record")
+    return setting in ("1", "true", "yes")
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an upstream whose circuit is open"""
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a call has no answer by its deadline"""
+
+
+def error_status(error: BaseException) -> Optional[int]:
+    """HTTP status of an upstream error, from its response or its message"""
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    if isinstance(status, int):
+        return status
+    match = _STATUS_RE.search(str(error))
+    return int(match.group(1)) if match else None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    True for transient upstream errors
+
+    Connection errors and timeouts (requests' and aiohttp's included) and
+    RETRYABLE_STATUSES responses are; bad requests, authentication errors
+    and an open circuit are not.
+    """
+    if isinstance(error, (CircuitOpenError, DeadlineExceeded)):
+        return False
+    if isinstance(error, OSError) or type(error).__module__.startswith("aiohttp"):
+        return True
+    return error_status(error) in RETRYABLE_STATUSES
+
+
+class CircuitBreaker:
+    """
+    Fails calls fast while the upstream keeps failing
+
+    Closed: calls go through; `failures` consecutive transient failures open
+    the circuit. Open: calls raise CircuitOpenError. After `reset_seconds`
+    one trial call is let through (half-open); its success closes the
+    circuit, its failure opens it again. Every admitted call must end in
+    one of the record_* methods, cancelled calls included (record_neutral),
+    or the half-open circuit waits forever for its trial.
+
+    Args:
+        model: Model label for the recorded metrics
+        failures: Consecutive failures that open the circuit
+        reset_seconds: Seconds before the trial call
+    """
+
+    def __init__(self, model: str, failures: int = 5, reset_seconds: float = 30.0):
+        self.model = model
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """
+        Admit a call
+
+        Raises:
+            CircuitOpenError: While the circuit is open, or a trial call runs
+        """
+        with self._lock:
+            if self.state == "closed":
+                return
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return
+        record_upstream(self.model, "circuit_rejected")
+        raise CircuitOpenError(f"Upstream circuit for {self.model} is open after repeated failures")
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._consecutive = 0
+            self._trial_running = False
+            if self.state == "closed":
+                return
+            self.state = "closed"
+        record_upstream(self.model, "circuit_closed")
+        set_circuit_open(self.model, False)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._consecutive += 1
+            self._trial_running = False
+            if self.state == "open" or (self.state == "closed" and self._consecutive < self.failures):
+                return
+            self.state = "open"
+            self._opened_at = time.monotonic()
+        record_upstream(self.model, "circuit_opened")
+        set_circuit_open(self.model, True)
+
+    def record_neutral(self) -> None:
+        """A call that ended without telling whether the upstream is healthy"""
+        with self._lock:
+            self._trial_running = False
+
+
+class LatencyTracker:
+    """
+    Recent successful call latencies, per kind of call
+
+    Calls with the same max_tokens (the servers set it per kind of call,
+    see call_options) share a window, so a short chat answer is not
+    compared with a long analysis.
+
+    Args:
+        percentile: Percentile returned by hedge_delay()
+        min_samples: Latencies needed before there is a hedge delay
+        window: Latencies kept per kind
+    """
+
+    def __init__(self, percentile: float = 95.0, min_samples: int = 20, window: int = 200):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.window = window
+        self._samples: Dict[Any, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: Any, seconds: float) -> None:
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def hedge_delay(self, key: Any) -> Optional[float]:
+        """The percentile latency of the kind of call, None until min_samples are seen"""
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * self.percentile / 100))]
+
+
+def pool_connections(llm: Any, pool_size: int) -> Any:
+    """
+    Give a ChatNVIDIA client keep-alive connection pools
+
+    ChatNVIDIA creates a requests.Session (sync calls) or an aiohttp session
+    (async calls) per call, so every call pays for a new connection. The
+    sync client gets one shared session instead; the async client gets
+    sessions on one shared connector per event loop, which it may close
+    after each call without closing the pooled connections. Other models
+    are returned unchanged.
+
+    Args:
+        llm: A chat model
+        pool_size: Connections kept per upstream host
+
+    Returns:
+        The same chat model
+    """
+    sync_client = getattr(llm, "_client", None)
+    async_client = getattr(llm, "_async_client", None)
+    if sync_client is None or not hasattr(sync_client, "get_session_fn"):
+        return llm
+
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    session.verify = sync_client.verify_ssl
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    sync_client.get_session_fn = lambda: session
+
+    if async_client is not None and hasattr(async_client, "get_async_session_fn"):
+        import aiohttp
+
+        connectors: Dict[int, Any] = {}
+
+        def pooled_async_session() -> Any:
+            loop = asyncio.get_running_loop()
+            connector = connectors.get(id(loop))
+            if connector is None or connector.closed:
+                connector = connectors[id(loop)] = aiohttp.TCPConnector(
+                    ssl=async_client._build_ssl_context(), limit=pool_size
+                )
+            timeout = aiohttp.ClientTimeout(
+                connect=async_client.timeout, sock_connect=async_client.timeout, sock_read=async_client.timeout
+            )
+            return aiohttp.ClientSession(connector=connector, connector_owner=False, timeout=timeout)
+
+        async_client.get_async_session_fn = pooled_async_session
+    return llm
+
+
+class ResilientChatModel(Runnable):
+    """
+    Chat model wrapper adding deadlines, retries, a circuit breaker and hedging
+
+    invoke/ainvoke (and so batch/abatch) get all four. stream/astream are
+    retried only until the first chunk arrives, as a half-sent answer cannot
+    be taken back, and are neither hedged nor bounded by the deadline (the
+    client's inactivity timeout still applies). Other attributes, e.g. a
+    fake backend's settings, are those of the wrapped model.
+
+    A call may pass deadline=<seconds> to override the policy's deadline.
+    Synchronous attempts run on a thread pool so the caller can stop
+    waiting at the deadline or on a hedge's answer; the abandoned attempt
+    finishes in the background. Async attempts are cancelled instead.
+
+    Args:
+        inner: The chat model
+        model: Model label for the recorded metrics
+        policy: Settings (default: UpstreamPolicy.from_env())
+    """
+
+    def __init__(self, inner: Any, model: str, policy: Optional[UpstreamPolicy] = None):
+        policy = policy or UpstreamPolicy.from_env()
+        object.__setattr__(self, "inner", inner)
+        object.__setattr__(self, "model", model)
+        object.__setattr__(self, "policy", policy)
+        object.__setattr__(self, "breaker", CircuitBreaker(model, policy.breaker_failures, policy.breaker_reset))
+        object.__setattr__(self, "latencies", LatencyTracker(policy.hedge_percentile, policy.hedge_min_samples))
+        object.__setattr__(self, "_executor", None)
+        object.__setattr__(self, "_executor_lock", threading.Lock())
+
+    def __getattr__(self, name: str) -> Any:
+        if name == "inner":
+            raise AttributeError(name)
+        return getattr(self.inner, name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self.inner, name, value)
+
+    def __repr__(self) -> str:
+        return f"ResilientChatModel({self.inner!r})"
+
+    def close(self) -> None:
+        """Stop the attempt threads once the running attempts finish"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        # Created on first use, so a gunicorn master that never calls the model starts no threads
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    object.__setattr__(self, "_executor", ThreadPoolExecutor(
+                        max_workers=self.policy.max_workers, thread_name_prefix=f"upstream-{self.model}"
+                    ))
+        return self._executor
+
+    def _retry_delay(self, error: BaseException, retry: int, deadline: float) -> Optional[float]:
+        """Backoff before the next attempt, None if the call must fail with error"""
+        if isinstance(error, DeadlineExceeded):
+            record_upstream(self.model, "deadline_exceeded")
+        if not is_retryable(error) or retry >= self.policy.max_retries:
+            return None
+        delay = self.policy.backoff(retry)
+        if time.monotonic() + delay >= deadline:
+            return None
+        record_upstream(self.model, "retry")
+        return delay
+
+    def _record_outcome(self, error: Optional[BaseException]) -> None:
+        if error is None:
+            self.breaker.record_success()
+        elif is_retryable(error) or isinstance(error, DeadlineExceeded):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_neutral()
+
+    # ------------------------------------------------------------------ sync
+
+    def invoke(self, input: Any, config: Optional[Dict[str, Any]] = None, **kwargs: Any) -> Any:
+        deadline = time.monotonic() + kwargs.pop("deadline", self.policy.deadline)
+        key = kwargs.get("max_tokens")
+        retry = 0
+        while True:
+            self.breaker.before_call()
+            try:
+                result = self._attempt(lambda: self.inner.invoke(input, config, **kwargs), key, deadline)
+            except Exception as e:
+                self._record_outcome(e)
+                delay = self._retry_delay(e, retry, deadline)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                retry += 1
+                continue
+            except BaseException:
+                self.breaker.record_neutral()
+                raise
+            self._record_outcome(None)
+            return result
+
+    def _submit(self, call: Callable[[], Any]) -> Future:
+        # Attempts keep the caller's context (LangChain tracing and callbacks)
+        return self.executor.submit(contextvars.copy_context().run, call)
+
+    def _attempt(self, call: Callable[[], Any], key: Any, deadline: float) -> Any:
+        """One attempt, hedged after the p95 latency, bounded by the deadline"""
+        started = time.monotonic()
+        primary = self._submit(call)
+        pending = {primary}
+        hedge_at = self.latencies.hedge_delay(key) if self.policy.hedge else None
+        while True:
+            wake_at = deadline if hedge_at is None else min(deadline, started + hedge_at)
+            done, _ = wait(pending, timeout=max(0.0, wake_at - time.monotonic()), return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.discard(future)
+                if future.exception() is None:
+                    self.latencies.record(key, time.monotonic() - started)
+                    if future is not primary:
+                        record_upstream(self.model, "hedge_won")
+                    return future.result()
+                if not pending:
+                    raise future.exception()
+            if done:
+                continue
+            if time.monotonic() >= deadline:
+                raise DeadlineExceeded(f"No answer from {self.model} by the call's deadline")
+            if hedge_at is not None:
+                hedge_at = None
+                record_upstream(self.model, "hedge")
+                pending.add(self._submit(call))
+
+    def stream(self, input: Any, config: Optional[Dict[str, Any]] = None, **kwargs: Any) -> Iterator[Any]:
+        kwargs.pop("deadline", None)
+        retry = 0
+        while True:
+            self.breaker.before_call()
+            try:
+                chunks = self.inner.stream(input, config, **kwargs)
+                first = next(chunks, None)
+            except Exception as e:
+                self._record_outcome(e)
+                delay = self._retry_delay(e, retry, float("inf"))
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                retry += 1
+                continue
+            except BaseException:
+                self.breaker.record_neutral()
+                raise
+            self._record_outcome(None)
+            break
+        if first is not None:
+            yield first
+        yield from chunks
+
+    # ----------------------------------------------------------------- async
+
+    async def ainvoke(self, input: Any, config: Optional[Dict[str, Any]] = None, **kwargs: Any) -> Any:
+        deadline = time.monotonic() + kwargs.pop("deadline", self.policy.deadline)
+        key = kwargs.get("max_tokens")
+        retry = 0
+        while True:
+            self.breaker.before_call()
+            try:
+                result = await self._aattempt(lambda: self.inner.ainvoke(input, config, **kwargs), key, deadline)
+            except Exception as e:
+                self._record_outcome(e)
+                delay = self._retry_delay(e, retry, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                retry += 1
+                continue
+            except BaseException:
+                # Cancelled: free the half-open trial slot, or the circuit never closes
+                self.breaker.record_neutral()
+                raise
+            self._record_outcome(None)
+            return result
+
+    async def _aattempt(self, call: Callable[[], Any], key: Any, deadline: float) -> Any:
+        """Async version of _attempt; the losing or late attempt is cancelled"""
+        started = time.monotonic()
+        primary = asyncio.ensure_future(call())
+        pending = {primary}
+        hedge_at = self.latencies.hedge_delay(key) if self.policy.hedge else None
+        try:
+            while True:
+                wake_at = deadline if hedge_at is None else min(deadline, started + hedge_at)
+                done, _ = await asyncio.wait(
+                    pending, timeout=max(0.0, wake_at - time.monotonic()), return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    pending.discard(task)
+                    if task.exception() is None:
+                        self.latencies.record(key, time.monotonic() - started)
+                        if task is not primary:
+                            record_upstream(self.model, "hedge_won")
+                        return task.result()
+                    if not pending:
+                        raise task.exception()
+                if done:
+                    continue
+                if time.monotonic() >= deadline:
+                    raise DeadlineExceeded(f"No answer from {self.model} by the call's deadline")
+                if hedge_at is not None:
+                    hedge_at = None
+                    record_upstream(self.model, "hedge")
+                    pending.add(asyncio.ensure_future(call()))
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def astream(self, input: Any, config: Optional[Dict[str, Any]] = None,
+                      **kwargs: Any) -> AsyncIterator[Any]:
+        kwargs.pop("deadline", None)
+        retry = 0
+        while True:
+            self.breaker.before_call()
+            try:
+                chunks = self.inner.astream(input, config, **kwargs)
+                first = await chunks.__anext__()
+            except StopAsyncIteration:
+                first = None
+            except Exception as e:
+                self._record_outcome(e)
+                delay = self._retry_delay(e, retry, float("inf"))
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                retry += 1
+                continue
+            except BaseException:
+                self.breaker.record_neutral()
+                raise
+            self._record_outcome(None)
+            break
+        if first is not None:
+            yield first
+        async for chunk in chunks:
+            yield chunk